@@ -4,4 +4,12 @@ set -e
 python manage.py migrate --noinput
 python manage.py collectstatic --noinput
 
-exec gunicorn memorial.wsgi:application --bind 0.0.0.0:8000 --workers 3
+# Metrics from every gunicorn worker, and from the job worker sharing the
+# directory, are aggregated through it; it must be emptied on start so stale
+# samples from old workers are dropped. It may be a mounted volume, so only
+# its contents are removed.
+export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus}"
+mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+find "$PROMETHEUS_MULTIPROC_DIR" -mindepth 1 -delete
+
+exec gunicorn memorial.wsgi:application --config docker/gunicorn.conf.py
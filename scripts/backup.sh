@@ -6,12 +6,6 @@ if [ -z "$DATABASE_URL" ]; then
   exit 1
 fi
 
-BACKUP_DIR="${BACKUP_DIR:-backups}"
-TIMESTAMP=$(date +"%Y%m%d_%H%M%S")
-FILE="$BACKUP_DIR/memorial_$TIMESTAMP.sql"
-
-mkdir -p "$BACKUP_DIR"
-
-pg_dump "$DATABASE_URL" > "$FILE"
-
-echo "Backup written to $FILE"
+# Parallel directory-format dump plus incremental photo media, with rotation.
+# Extra arguments are passed through, e.g. --verify or --keep 14.
+exec python manage.py backup --dir "${BACKUP_DIR:-backups}" "$@"
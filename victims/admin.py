@@ -1,7 +1,24 @@
 from django.contrib import admin
 from django.forms import model_to_dict
 
-from .models import AuditLog, Photo, Source, Submission, Tag, Victim, VictimTag
+from . import jobs
+from .admin_utils import (
+    CachedValuesListFilter,
+    EstimatedCountPaginator,
+    SearchVectorSearchMixin,
+)
+from .models import (
+    AuditLog,
+    Job,
+    Photo,
+    Revision,
+    Source,
+    Submission,
+    Tag,
+    Victim,
+    VictimTag,
+)
+from .permissions import is_moderator
 
 
 def log_action(user, action, obj, changes=None):
@@ -18,7 +35,7 @@ class NoDeleteForModerator:
     def has_delete_permission(self, request, obj=None):
         if request.user.is_superuser:
             return True
-        if request.user.groups.filter(name="Moderator").exists():
+        if is_moderator(request.user):
             return False
         return super().has_delete_permission(request, obj)
 
@@ -38,10 +55,11 @@ class SourceInline(admin.TabularInline):
 class VictimTagInline(admin.TabularInline):
     model = VictimTag
     extra = 1
+    autocomplete_fields = ("tag",)
 
 
 @admin.register(Victim)
-class VictimAdmin(NoDeleteForModerator, admin.ModelAdmin):
+class VictimAdmin(SearchVectorSearchMixin, NoDeleteForModerator, admin.ModelAdmin):
     list_display = (
         "full_name",
         "verification_status",
@@ -51,7 +69,13 @@ class VictimAdmin(NoDeleteForModerator, admin.ModelAdmin):
         "confidence_score",
     )
     search_fields = ("full_name", "native_name", "biography")
-    list_filter = ("verification_status", "country", "province_or_state")
+    list_filter = (
+        "verification_status",
+        ("country", CachedValuesListFilter),
+        ("province_or_state", CachedValuesListFilter),
+    )
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     readonly_fields = ("created_at", "updated_at")
     prepopulated_fields = {"slug": ("full_name",)}
     inlines = [PhotoInline, SourceInline, VictimTagInline]
@@ -109,27 +133,39 @@ class VictimAdmin(NoDeleteForModerator, admin.ModelAdmin):
 
     def save_model(self, request, obj, form, change):
         super().save_model(request, obj, form, change)
-        changes = {field: form.cleaned_data.get(field) for field in form.changed_data}
+        # Values live in the object's revisions (victims.revisions).
+        changes = {"fields": form.changed_data}
         log_action(request.user, "update" if change else "create", obj, changes)
 
     def delete_model(self, request, obj):
-        log_action(request.user, "delete", obj, model_to_dict(obj))
+        log_action(request.user, "delete", obj)
         super().delete_model(request, obj)
 
 
 @admin.register(Photo)
 class PhotoAdmin(NoDeleteForModerator, admin.ModelAdmin):
-    list_display = ("victim", "caption", "order_index", "created_at")
-    search_fields = ("victim__full_name", "caption")
-    list_filter = ("created_at",)
+    list_display = (
+        "victim",
+        "caption",
+        "order_index",
+        "near_duplicate_of",
+        "created_at",
+    )
+    search_fields = ("victim__full_name", "caption", "content_hash")
+    list_filter = (("near_duplicate_of", admin.EmptyFieldListFilter), "created_at")
+    list_select_related = ("victim", "near_duplicate_of__victim")
+    readonly_fields = ("content_hash", "near_duplicate_of")
+    autocomplete_fields = ("victim",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     def save_model(self, request, obj, form, change):
         super().save_model(request, obj, form, change)
-        changes = {field: form.cleaned_data.get(field) for field in form.changed_data}
+        changes = {"fields": form.changed_data}
         log_action(request.user, "update" if change else "create", obj, changes)
 
     def delete_model(self, request, obj):
-        log_action(request.user, "delete", obj, model_to_dict(obj))
+        log_action(request.user, "delete", obj)
         super().delete_model(request, obj)
 
 
@@ -137,15 +173,19 @@ class PhotoAdmin(NoDeleteForModerator, admin.ModelAdmin):
 class SourceAdmin(NoDeleteForModerator, admin.ModelAdmin):
     list_display = ("victim", "publisher_name", "title", "publication_date")
     search_fields = ("victim__full_name", "title", "publisher_name")
-    list_filter = ("publisher_name", "publication_date")
+    list_filter = (("publisher_name", CachedValuesListFilter), "publication_date")
+    list_select_related = ("victim",)
+    autocomplete_fields = ("victim",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     def save_model(self, request, obj, form, change):
         super().save_model(request, obj, form, change)
-        changes = {field: form.cleaned_data.get(field) for field in form.changed_data}
+        changes = {"fields": form.changed_data}
         log_action(request.user, "update" if change else "create", obj, changes)
 
     def delete_model(self, request, obj):
-        log_action(request.user, "delete", obj, model_to_dict(obj))
+        log_action(request.user, "delete", obj)
         super().delete_model(request, obj)
 
 
@@ -188,8 +228,34 @@ class SubmissionAdmin(NoDeleteForModerator, admin.ModelAdmin):
 @admin.register(AuditLog)
 class AuditLogAdmin(admin.ModelAdmin):
     list_display = ("timestamp", "user", "action", "target_model", "target_id")
-    list_filter = ("action", "target_model", "timestamp")
-    readonly_fields = ("timestamp", "user", "action", "target_model", "target_id", "changes")
+    list_filter = ("action", ("target_model", CachedValuesListFilter), "timestamp")
+    list_select_related = ("user",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    readonly_fields = (
+        "timestamp",
+        "user",
+        "action",
+        "target_model",
+        "target_id",
+        "changes",
+    )
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return request.user.is_superuser
+
+
+@admin.register(Revision)
+class RevisionAdmin(admin.ModelAdmin):
+    list_display = ("created_at", "model", "object_id", "kind", "user")
+    list_filter = ("model", "kind", "created_at")
+    list_select_related = ("user",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    readonly_fields = ("model", "object_id", "kind", "data", "user", "created_at")
 
     def has_add_permission(self, request):
         return False
@@ -198,7 +264,37 @@ class AuditLogAdmin(admin.ModelAdmin):
         return request.user.is_superuser
 
 
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("name", "status", "priority", "attempts", "run_at", "locked_by")
+    list_filter = ("status", "name")
+    readonly_fields = (
+        "name",
+        "payload",
+        "status",
+        "attempts",
+        "max_attempts",
+        "unique_key",
+        "locked_by",
+        "locked_at",
+        "last_error",
+        "created_at",
+    )
+    actions = ["retry_jobs"]
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description="Retry selected dead jobs")
+    def retry_jobs(self, request, queryset):
+        self.message_user(request, f"Requeued {jobs.retry(queryset)} jobs.")
+
+
 @admin.register(VictimTag)
 class VictimTagAdmin(NoDeleteForModerator, admin.ModelAdmin):
     list_display = ("victim", "tag")
     search_fields = ("victim__full_name", "tag__name")
+    list_select_related = ("victim", "tag")
+    autocomplete_fields = ("victim", "tag")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
@@ -0,0 +1,69 @@
+import re
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.postgres.search import SearchQuery
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+ESTIMATE_THRESHOLD = 10_000
+
+
+class EstimatedCountPaginator(Paginator):
+    # Unfiltered changelists of large tables use the planner's row estimate
+    # instead of an exact COUNT(*) over the whole table.
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, "query", None)
+        if query is not None and not query.where:
+            estimate = estimated_row_count(self.object_list.model, self.object_list.db)
+            if estimate is not None and estimate > ESTIMATE_THRESHOLD:
+                return estimate
+        return super().count
+
+
+def estimated_row_count(model, using="default"):
+    connection = connections[using]
+    if connection.vendor != "postgresql":
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+            [model._meta.db_table],
+        )
+        row = cursor.fetchone()
+    # reltuples is -1 for tables that have never been vacuumed or analyzed.
+    if row is None or row[0] < 0:
+        return None
+    return row[0]
+
+
+class CachedValuesListFilter(admin.AllValuesFieldListFilter):
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        super().__init__(field, request, params, model, model_admin, field_path)
+        key = f"admin-filter-choices:{model._meta.label_lower}:{field_path}"
+        choices = self.lookup_choices
+        self.lookup_choices = cache.get_or_set(
+            key, lambda: list(choices), settings.ADMIN_FILTER_CHOICES_TTL
+        )
+
+
+def prefix_search_query(term):
+    words = re.findall(r"\w+", term)
+    if not words:
+        return None
+    return SearchQuery(" & ".join(f"{word}:*" for word in words), search_type="raw")
+
+
+class SearchVectorSearchMixin:
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        connection = connections[queryset.db]
+        if not search_term or connection.vendor != "postgresql":
+            return super().get_search_results(request, queryset, search_term)
+        search_query = prefix_search_query(search_term)
+        if search_query is None:
+            return queryset.none(), False
+        return queryset.filter(search_vector=search_query), False
@@ -1,19 +1,191 @@
-from rest_framework import viewsets
-from rest_framework.permissions import DjangoModelPermissionsOrAnonReadOnly
+import datetime
+import hashlib
+import io
+import json
 
-from .filters import VictimFilter
-from .models import Photo, Source, Tag, Victim
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Prefetch
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.dateparse import parse_datetime
+from rest_framework import mixins, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.permissions import (
+    SAFE_METHODS,
+    AllowAny,
+    BasePermission,
+    DjangoModelPermissionsOrAnonReadOnly,
+)
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from . import changes, revisions, rollups
+from .batch import BatchWriteMixin
+from .filters import VictimFilter, tag_counts
+from .models import (
+    Photo,
+    RelatedVictim,
+    Revision,
+    Source,
+    Tag,
+    UploadSession,
+    Victim,
+)
+from .permissions import is_moderator
 from .serializers import (
     PhotoSerializer,
     SourceSerializer,
     TagSerializer,
+    UploadSessionSerializer,
     VictimDetailSerializer,
     VictimListSerializer,
 )
+from .uploads import ChunkError, append_chunk, attach_uploads
+
+
+class SparseFieldsetViewSetMixin:
+    # ?fields=a,b limits the serialized fields and the selected columns;
+    # ?expand=x adds optional nested relations. Relations are only prefetched
+    # when the serializer will actually render them.
+    prefetchable_fields = ()
+    # Prefetch lookups for relations that are only rendered on ?expand=.
+    expand_prefetches = {}
+
+    def requested(self, param):
+        value = self.request.query_params.get(param, "")
+        return [name.strip() for name in value.split(",") if name.strip()] or None
+
+    def get_serializer(self, *args, **kwargs):
+        if self.request is not None and self.request.method in SAFE_METHODS:
+            kwargs.setdefault("fields", self.requested("fields"))
+            kwargs.setdefault("expand", self.requested("expand"))
+        return super().get_serializer(*args, **kwargs)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request is None or self.request.method not in SAFE_METHODS:
+            return queryset.prefetch_related(*self.prefetchable_fields)
+        model = queryset.model
+        columns, prefetch = {model._meta.pk.name}, []
+        for field in self.get_serializer().fields.values():
+            name = field.source.split(".")[0]
+            if name in self.expand_prefetches:
+                prefetch.append(self.expand_prefetches[name])
+                continue
+            if name in self.prefetchable_fields:
+                prefetch.append(name)
+                continue
+            try:
+                model_field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                continue
+            if model_field.concrete and not model_field.many_to_many:
+                columns.add(name)
+        return queryset.only(*columns).prefetch_related(*prefetch)
+
+
+class CanReviewHistory(BasePermission):
+    def has_permission(self, request, view):
+        return request.user.is_staff or is_moderator(request.user)
 
 
-class VictimViewSet(viewsets.ModelViewSet):
-    queryset = Victim.objects.all().prefetch_related("photos", "sources", "tags")
+class RevisionHistoryMixin:
+    # Moderator-only history of an object, which may since have been deleted.
+    # GET .../history/ lists its revisions, newest first (?before=<revision>
+    # pages back), or with ?at=<ISO datetime> returns its state at that time;
+    # GET .../diff/?from=<revision>&to=<revision> compares two of its
+    # revisions, `to` defaulting to the latest.
+    history_page_size = 100
+
+    def revision_target(self, pk):
+        try:
+            return revisions.TRACKED_MODELS[self.queryset.model], int(pk)
+        except ValueError:
+            raise NotFound()
+
+    @staticmethod
+    def revision_param(params, name):
+        value = params.get(name)
+        try:
+            return int(value) if value else None
+        except ValueError:
+            raise ValidationError({name: "Must be a revision id."})
+
+    @action(detail=True, methods=["get"], permission_classes=[CanReviewHistory])
+    def history(self, request, pk=None):
+        model_name, object_id = self.revision_target(pk)
+        if request.query_params.get("at"):
+            at = parse_datetime(request.query_params["at"])
+            if at is None:
+                raise ValidationError({"at": "Use an ISO 8601 date and time."})
+            if timezone.is_naive(at):
+                at = timezone.make_aware(at)
+            state, revision = revisions.state_at(model_name, object_id, at=at)
+            return Response({"revision": revision and revision.pk, "data": state})
+        history = Revision.objects.filter(model=model_name, object_id=object_id)
+        before = self.revision_param(request.query_params, "before")
+        if before:
+            history = history.filter(pk__lt=before)
+        page = list(
+            history.select_related("user").order_by("-pk")[: self.history_page_size]
+        )
+        results = [
+            {
+                "id": revision.pk,
+                "kind": revision.kind,
+                "created_at": revision.created_at,
+                "user": revision.user and revision.user.get_username(),
+                "fields": sorted(revision.data),
+            }
+            for revision in page
+        ]
+        more = len(page) == self.history_page_size
+        return Response(
+            {"results": results, "next_before": page[-1].pk if more else None}
+        )
+
+    @action(detail=True, methods=["get"], permission_classes=[CanReviewHistory])
+    def diff(self, request, pk=None):
+        model_name, object_id = self.revision_target(pk)
+        start = self.revision_param(request.query_params, "from")
+        end = self.revision_param(request.query_params, "to")
+        if start is None:
+            raise ValidationError({"from": "A revision id is required."})
+        old, old_revision = revisions.state_at(model_name, object_id, start)
+        new, new_revision = revisions.state_at(model_name, object_id, end)
+        for name, wanted, revision in (
+            ("from", start, old_revision),
+            ("to", end, new_revision),
+        ):
+            if revision is None or (wanted is not None and revision.pk != wanted):
+                raise ValidationError({name: "Not a revision of this object."})
+        return Response(
+            {
+                "from": old_revision.pk,
+                "to": new_revision.pk,
+                "changes": revisions.diff(old, new),
+            }
+        )
+
+
+class VictimViewSet(
+    RevisionHistoryMixin,
+    BatchWriteMixin,
+    SparseFieldsetViewSetMixin,
+    viewsets.ModelViewSet,
+):
+    queryset = Victim.objects.all()
+    batch_lookup = ("slug",)
+    batch_lookup_unique = True
+    prefetchable_fields = ("photos", "sources", "tags")
+    expand_prefetches = {
+        "related_profiles": Prefetch(
+            "related_profiles", queryset=RelatedVictim.objects.select_related("related")
+        )
+    }
     permission_classes = [DjangoModelPermissionsOrAnonReadOnly]
     filterset_class = VictimFilter
     search_fields = ["full_name", "native_name", "biography", "short_summary"]
@@ -25,19 +197,215 @@ class VictimViewSet(viewsets.ModelViewSet):
         return VictimDetailSerializer
 
 
-class PhotoViewSet(viewsets.ModelViewSet):
-    queryset = Photo.objects.select_related("victim")
+class PhotoViewSet(
+    RevisionHistoryMixin,
+    BatchWriteMixin,
+    SparseFieldsetViewSetMixin,
+    viewsets.ModelViewSet,
+):
+    queryset = Photo.objects.all()
     serializer_class = PhotoSerializer
+    # New image files go through the uploads API; batches edit metadata only.
+    batch_modes = ("update",)
+    batch_exclude = ("image",)
     permission_classes = [DjangoModelPermissionsOrAnonReadOnly]
 
 
-class SourceViewSet(viewsets.ModelViewSet):
-    queryset = Source.objects.select_related("victim")
+class SourceViewSet(
+    RevisionHistoryMixin,
+    BatchWriteMixin,
+    SparseFieldsetViewSetMixin,
+    viewsets.ModelViewSet,
+):
+    queryset = Source.objects.all()
     serializer_class = SourceSerializer
+    batch_lookup = ("victim", "url")
+    batch_lookup_unique = True
     permission_classes = [DjangoModelPermissionsOrAnonReadOnly]
 
 
-class TagViewSet(viewsets.ModelViewSet):
+class TagViewSet(SparseFieldsetViewSetMixin, viewsets.ModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = [DjangoModelPermissionsOrAnonReadOnly]
+
+    @action(detail=False, methods=["get"])
+    def counts(self, request):
+        # Facet counts: how many victims matching the VictimFilter parameters
+        # carry each tag, e.g. ?tag=a,b&tag_mode=all.
+        filterset = VictimFilter(request.query_params, queryset=Victim.objects.all())
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+        counts = tag_counts(filterset.qs)
+        return Response(
+            [
+                {"slug": tag.slug, "name": tag.name, "count": counts.get(tag.slug, 0)}
+                for tag in Tag.objects.order_by("name")
+            ]
+        )
+
+
+class ChangeFeedView(APIView):
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        try:
+            since = changes.parse_cursor(request.query_params.get("since"))
+            limit = int(
+                request.query_params.get("limit") or settings.CHANGE_FEED_PAGE_SIZE
+            )
+        except ValueError:
+            raise ValidationError(
+                "since must be a next_cursor value and limit an integer."
+            )
+        limit = max(1, min(limit, settings.CHANGE_FEED_MAX_PAGE_SIZE))
+        return Response(changes.feed(since, limit, request))
+
+
+class StatsView(APIView):
+    # Read from the rollup materialized views; public and cacheable, with an
+    # ETag so revalidation is cheap between refreshes.
+    permission_classes = [AllowAny]
+
+    def get_results(self, params):
+        raise NotImplementedError
+
+    def get(self, request):
+        payload = self.get_results(request.query_params)
+        body = json.dumps(payload, sort_keys=True, default=str).encode()
+        etag = '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+        response = get_conditional_response(request, etag=etag) or Response(payload)
+        response["ETag"] = etag
+        patch_cache_control(response, public=True, max_age=settings.STATS_CACHE_SECONDS)
+        return response
+
+    @staticmethod
+    def parse_date(params, name):
+        value = params.get(name)
+        if not value:
+            return None
+        try:
+            return datetime.date.fromisoformat(value)
+        except ValueError:
+            raise ValidationError({name: "Use YYYY-MM-DD."})
+
+
+class TimelineStatsView(StatsView):
+    # Victims per day, week or month of death, by verification status.
+    def get_results(self, params):
+        interval = params.get("interval", "month")
+        if interval not in rollups.INTERVALS:
+            raise ValidationError(
+                {"interval": f"Must be one of: {', '.join(rollups.INTERVALS)}."}
+            )
+        start = self.parse_date(params, "from")
+        end = self.parse_date(params, "to")
+        return {
+            "interval": interval,
+            "results": rollups.timeline(interval, start, end),
+        }
+
+
+class GeoStatsView(StatsView):
+    # Victims per country, province or city of death, by verification status.
+    def get_results(self, params):
+        level = params.get("level", "country")
+        if level not in rollups.GEO_LEVELS:
+            raise ValidationError(
+                {"level": f"Must be one of: {', '.join(rollups.GEO_LEVELS)}."}
+            )
+        return {
+            "level": level,
+            "results": rollups.geo(
+                level, country=params.get("country"), province=params.get("province")
+            ),
+        }
+
+
+class MapClusterView(StatsView):
+    # ?zoom=0-N&bbox=west,south,east,north -> [[lat, lon, count], ...] for the
+    # precomputed clusters at that zoom level.
+    def get_results(self, params):
+        try:
+            zoom = max(0, int(params.get("zoom", 5)))
+        except ValueError:
+            raise ValidationError({"zoom": "Must be an integer."})
+        bbox = None
+        if params.get("bbox"):
+            try:
+                bbox = [float(value) for value in params["bbox"].split(",")]
+            except ValueError:
+                bbox = []
+            if len(bbox) != 4:
+                raise ValidationError({"bbox": "Use west,south,east,north."})
+        return {
+            "zoom": min(zoom, settings.MAP_MAX_ZOOM),
+            "clusters": rollups.map_clusters(zoom, bbox),
+        }
+
+
+class CanAddPhotos(BasePermission):
+    def has_permission(self, request, view):
+        return request.user.is_authenticated and request.user.has_perm(
+            "victims.add_photo"
+        )
+
+
+class UploadSessionViewSet(
+    mixins.CreateModelMixin,
+    mixins.RetrieveModelMixin,
+    mixins.ListModelMixin,
+    viewsets.GenericViewSet,
+):
+    # Resumable uploads: POST declares a file, PUT .../chunk/ appends byte
+    # ranges (Content-Range) streamed to disk, GET reports the offset to resume
+    # from, and POST complete/ turns finished uploads into Photo rows.
+    serializer_class = UploadSessionSerializer
+    permission_classes = [CanAddPhotos]
+
+    def get_queryset(self):
+        return UploadSession.objects.filter(user=self.request.user)
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+    @action(detail=True, methods=["put"])
+    def chunk(self, request, pk=None):
+        session = self.get_object()
+        try:
+            append_chunk(
+                session,
+                request.stream or io.BytesIO(),
+                request.META.get("HTTP_CONTENT_RANGE"),
+            )
+        except ChunkError as exc:
+            return Response(
+                {"detail": str(exc), "received": session.received}, status=exc.status
+            )
+        return Response(self.get_serializer(session).data)
+
+    @action(detail=False, methods=["post"])
+    def complete(self, request):
+        ids = request.data.get("ids")
+        if not isinstance(ids, list) or not ids:
+            raise ValidationError({"ids": "A list of upload ids is required."})
+        if len(ids) > settings.UPLOAD_BATCH_MAX:
+            raise ValidationError(
+                {"ids": f"At most {settings.UPLOAD_BATCH_MAX} uploads per batch."}
+            )
+        try:
+            sessions = list(self.get_queryset().filter(pk__in=ids))
+        except DjangoValidationError:
+            raise ValidationError({"ids": "Upload ids must be UUIDs."})
+        errors = {str(pk): message for pk, message in attach_uploads(sessions).items()}
+        found = {str(session.pk) for session in sessions}
+        errors.update({str(pk): "Not found." for pk in ids if str(pk) not in found})
+        attached = [
+            {"id": str(session.pk), "photo": session.photo_id}
+            for session in sessions
+            if session.status == UploadSession.Status.ATTACHED
+        ]
+        return Response(
+            {"attached": attached, "errors": errors},
+            status=status.HTTP_200_OK if attached else status.HTTP_400_BAD_REQUEST,
+        )
@@ -1,7 +1,17 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .api import PhotoViewSet, SourceViewSet, TagViewSet, VictimViewSet
+from .api import (
+    ChangeFeedView,
+    GeoStatsView,
+    MapClusterView,
+    PhotoViewSet,
+    SourceViewSet,
+    TagViewSet,
+    TimelineStatsView,
+    UploadSessionViewSet,
+    VictimViewSet,
+)
 from .views import name_suggest
 
 router = DefaultRouter()
@@ -9,8 +19,13 @@ router.register(r"victims", VictimViewSet, basename="victim")
 router.register(r"photos", PhotoViewSet, basename="photo")
 router.register(r"sources", SourceViewSet, basename="source")
 router.register(r"tags", TagViewSet, basename="tag")
+router.register(r"uploads", UploadSessionViewSet, basename="upload")
 
 urlpatterns = [
     path("v1/", include(router.urls)),
     path("v1/suggest/", name_suggest, name="name_suggest"),
+    path("v1/changes/", ChangeFeedView.as_view(), name="change_feed"),
+    path("v1/stats/timeline/", TimelineStatsView.as_view(), name="stats_timeline"),
+    path("v1/stats/geo/", GeoStatsView.as_view(), name="stats_geo"),
+    path("v1/map/", MapClusterView.as_view(), name="map_clusters"),
 ]
@@ -5,3 +5,6 @@ class VictimsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "victims"
     verbose_name = "Memorial Victims"
+
+    def ready(self):
+        from . import signals, tasks  # noqa: F401
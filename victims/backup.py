@@ -0,0 +1,275 @@
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+PHOTO_DIR = Path("victims") / "photos"
+STORE_DIR = "media-store"
+MANIFEST = "manifest.json"
+HASH_CHUNK = 1024 * 1024
+
+
+class BackupError(Exception):
+    pass
+
+
+class Timer:
+    def __init__(self):
+        self.steps = {}
+
+    @contextmanager
+    def step(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.steps[name] = round(time.perf_counter() - start, 3)
+
+
+def _binary(name):
+    bin_dir = settings.BACKUP_PG_BIN_DIR
+    return str(Path(bin_dir) / name) if bin_dir else name
+
+
+def _pg_env():
+    env = os.environ.copy()
+    db = settings.DATABASES["default"]
+    if db.get("PASSWORD"):
+        env["PGPASSWORD"] = db["PASSWORD"]
+    return env
+
+
+def _pg_args(dbname=None):
+    db = settings.DATABASES["default"]
+    args = ["--dbname", dbname or db["NAME"]]
+    if db.get("HOST"):
+        args += ["--host", db["HOST"]]
+    if db.get("PORT"):
+        args += ["--port", str(db["PORT"])]
+    if db.get("USER"):
+        args += ["--username", db["USER"]]
+    return args
+
+
+def _run(args):
+    result = subprocess.run(args, env=_pg_env(), capture_output=True, text=True)
+    if result.returncode != 0:
+        raise BackupError(f"{Path(args[0]).name} failed: {result.stderr.strip()}")
+    return result.stdout
+
+
+def tracked_tables():
+    return sorted(
+        model._meta.db_table
+        for model in apps.get_models(include_auto_created=True)
+        if model._meta.managed and not model._meta.proxy
+    )
+
+
+def _count_rows(cursor, tables):
+    counts = {}
+    for table in tables:
+        cursor.execute(f'SELECT COUNT(*) FROM "{table}"')
+        counts[table] = cursor.fetchone()[0]
+    return counts
+
+
+def dump_database(target, jobs, compression):
+    # Row counts are taken inside the same exported snapshot that pg_dump
+    # uses, so verification compares against exactly what was dumped.
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+        cursor.execute("SELECT pg_export_snapshot()")
+        snapshot_id = cursor.fetchone()[0]
+        counts = _count_rows(cursor, tracked_tables())
+        _run(
+            [
+                _binary("pg_dump"),
+                *_pg_args(),
+                "--format=directory",
+                f"--jobs={jobs}",
+                f"--compress={compression}",
+                f"--snapshot={snapshot_id}",
+                "--no-owner",
+                f"--file={target}",
+            ]
+        )
+    return counts
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _blob_path(root, digest):
+    return Path(root) / STORE_DIR / digest[:2] / digest
+
+
+def _latest_manifest(root):
+    for backup in reversed(list_backups(root)):
+        path = backup / MANIFEST
+        if path.exists():
+            return json.loads(path.read_text())["media"]
+    return {}
+
+
+def backup_media(root, media_root):
+    # Files are stored once under media-store/ by SHA-256; each backup only
+    # records a path -> hash manifest. Hashes are reused from the previous
+    # manifest when a file's size and mtime are unchanged.
+    previous = _latest_manifest(root)
+    manifest, copied, copied_bytes = {}, 0, 0
+    source_dir = Path(media_root) / PHOTO_DIR
+    if not source_dir.exists():
+        return manifest, copied, copied_bytes
+    for path in sorted(source_dir.rglob("*")):
+        if not path.is_file():
+            continue
+        name = path.relative_to(media_root).as_posix()
+        stat = path.stat()
+        known = previous.get(name)
+        if known and known["size"] == stat.st_size and known["mtime"] == stat.st_mtime:
+            digest = known["sha256"]
+        else:
+            digest = file_hash(path)
+        blob = _blob_path(root, digest)
+        if not blob.exists():
+            blob.parent.mkdir(parents=True, exist_ok=True)
+            tmp = blob.with_suffix(".tmp")
+            shutil.copyfile(path, tmp)
+            os.replace(tmp, blob)
+            copied += 1
+            copied_bytes += stat.st_size
+        manifest[name] = {
+            "sha256": digest,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+        }
+    return manifest, copied, copied_bytes
+
+
+def list_backups(root):
+    root = Path(root)
+    if not root.exists():
+        return []
+    return sorted(
+        path for path in root.iterdir() if path.is_dir() and (path / MANIFEST).exists()
+    )
+
+
+def rotate(root, keep):
+    backups = list_backups(root)
+    removed = backups[:-keep] if keep and len(backups) > keep else []
+    for backup in removed:
+        shutil.rmtree(backup)
+    referenced = set()
+    for backup in list_backups(root):
+        media = json.loads((backup / MANIFEST).read_text())["media"]
+        referenced.update(entry["sha256"] for entry in media.values())
+    orphaned = 0
+    store = Path(root) / STORE_DIR
+    if store.exists():
+        for blob in store.glob("*/*"):
+            if blob.name not in referenced:
+                blob.unlink()
+                orphaned += 1
+    return [backup.name for backup in removed], orphaned
+
+
+def create_backup(root, jobs, compression, media_root, timer):
+    root = Path(root)
+    target = root / timezone.now().strftime("%Y%m%d_%H%M%S")
+    target.mkdir(parents=True)
+    try:
+        with timer.step("database"):
+            counts = dump_database(target / "db", jobs, compression)
+        with timer.step("media"):
+            media, copied, copied_bytes = backup_media(root, media_root)
+    except Exception:
+        shutil.rmtree(target, ignore_errors=True)
+        raise
+    manifest = {
+        "created_at": timezone.now().isoformat(),
+        "row_counts": counts,
+        "media": media,
+        "media_copied": copied,
+        "media_copied_bytes": copied_bytes,
+        "timings": timer.steps,
+    }
+    # Written last: a directory without a manifest is an incomplete backup.
+    (target / MANIFEST).write_text(json.dumps(manifest, indent=2))
+    return target, manifest
+
+
+def verify_backup(root, backup, jobs):
+    # Restores the dump into a throwaway database and compares row counts
+    # with the ones recorded at dump time, then re-hashes the media blobs.
+    backup = Path(backup)
+    manifest = json.loads((backup / MANIFEST).read_text())
+    scratch = f"{settings.DATABASES['default']['NAME']}_verify"
+    problems = []
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP DATABASE IF EXISTS "{scratch}"')
+        cursor.execute(f'CREATE DATABASE "{scratch}"')
+    try:
+        _run(
+            [
+                _binary("pg_restore"),
+                *_pg_args(scratch),
+                f"--jobs={jobs}",
+                "--no-owner",
+                "--exit-on-error",
+                str(backup / "db"),
+            ]
+        )
+        restored = _restored_counts(scratch, manifest["row_counts"])
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP DATABASE IF EXISTS "{scratch}"')
+    for table, expected in manifest["row_counts"].items():
+        if restored.get(table) != expected:
+            problems.append(
+                f"{table}: expected {expected}, restored {restored.get(table)}"
+            )
+    for name, entry in manifest["media"].items():
+        blob = _blob_path(root, entry["sha256"])
+        if not blob.exists():
+            problems.append(f"{name}: missing blob {entry['sha256']}")
+        elif file_hash(blob) != entry["sha256"]:
+            problems.append(f"{name}: blob {entry['sha256']} is corrupt")
+    return problems
+
+
+def _restored_counts(dbname, tables):
+    query = " UNION ALL ".join(
+        f"SELECT '{table}', COUNT(*) FROM \"{table}\"" for table in tables
+    )
+    output = _run(
+        [
+            _binary("psql"),
+            *_pg_args(dbname),
+            "--no-align",
+            "--tuples-only",
+            "--field-separator=,",
+            "--command",
+            query,
+        ]
+    )
+    counts = {}
+    for line in output.splitlines():
+        table, _, count = line.partition(",")
+        counts[table] = int(count)
+    return counts
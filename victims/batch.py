@@ -0,0 +1,389 @@
+import re
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import BooleanField, F
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+from django.utils.text import slugify
+from rest_framework import serializers, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.response import Response
+from rest_framework.validators import UniqueTogetherValidator, UniqueValidator
+
+from . import changes, revisions
+from .models import Victim, bump_cache_versions
+from .tasks import queue_search_vectors, queue_stats_refresh
+
+MODES = ("create", "update", "upsert")
+LOCATION_FIELDS = {"city_of_death", "province_or_state", "country"}
+
+
+class BatchListSerializer(serializers.ListSerializer):
+    # Validates every item in one pass but keeps going past invalid ones, so
+    # the caller gets per-item errors. self.instance, when given, is a list
+    # aligned with the items.
+    def to_internal_value(self, data):
+        self.item_errors, validated = [], []
+        for index, item in enumerate(data):
+            self.child.instance = self.instance[index] if self.instance else None
+            self.child.initial_data = item
+            try:
+                validated.append(self.child.run_validation(item))
+                self.item_errors.append(None)
+            except ValidationError as exc:
+                validated.append(None)
+                self.item_errors.append(exc.detail)
+        return validated
+
+
+class PreloadedRelatedField(serializers.PrimaryKeyRelatedField):
+    # Resolves primary keys from objects fetched once for the whole batch
+    # instead of one query per item.
+    def __init__(self, objects, **kwargs):
+        self.objects = objects
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        try:
+            return self.objects[int(data)]
+        except (KeyError, TypeError, ValueError):
+            self.fail("does_not_exist", pk_value=data)
+
+
+def _as_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _prepare_child(serializer, items, exclude):
+    for name in exclude:
+        serializer.fields.pop(name, None)
+    # Uniqueness of the lookup key is checked in bulk by the caller.
+    serializer.validators = [
+        v for v in serializer.validators if not isinstance(v, UniqueTogetherValidator)
+    ]
+    for name, field in serializer.fields.items():
+        field.validators = [
+            v for v in field.validators if not isinstance(v, UniqueValidator)
+        ]
+        if isinstance(field, serializers.PrimaryKeyRelatedField) and not (
+            field.read_only
+        ):
+            pks = {_as_int(item.get(name)) for item in items if isinstance(item, dict)}
+            objects = field.get_queryset().in_bulk(pks - {None})
+            serializer.fields[name] = PreloadedRelatedField(
+                objects, queryset=field.get_queryset(), required=field.required
+            )
+    return serializer
+
+
+def _key_value(field, value):
+    # A lookup value as the serializer would store it, so that "5" and 5, or
+    # a URL with stray whitespace, name the same row. Related objects are
+    # keyed by primary key without loading them.
+    if value in (None, ""):
+        return None
+    if isinstance(field, serializers.PrimaryKeyRelatedField):
+        return _as_int(value)
+    try:
+        value = field.to_internal_value(value)
+    except ValidationError:
+        return None
+    return None if value in (None, "") else value
+
+
+def _item_key(item, lookup, fields):
+    if not isinstance(item, dict):
+        return None
+    if item.get("id") is not None:
+        return ("id", _as_int(item["id"]))
+    values = tuple(_key_value(fields[name], item.get(name)) for name in lookup)
+    if lookup and all(value is not None for value in values):
+        return (lookup, values)
+    return None
+
+
+def _existing(model, keys, lookup):
+    # One query for ids and one for the natural key; composite keys are
+    # narrowed with __in per column and matched exactly in Python.
+    found = {}
+    ids = [value for kind, value in keys if kind == "id" and value is not None]
+    if ids:
+        for obj in model.objects.filter(pk__in=ids):
+            found["id", obj.pk] = obj
+    natural = [value for kind, value in keys if kind != "id"]
+    if natural and lookup:
+        attnames = [model._meta.get_field(name).attname for name in lookup]
+        filters = {
+            f"{attname}__in": {values[index] for values in natural}
+            for index, attname in enumerate(attnames)
+        }
+        for obj in model.objects.filter(**filters).order_by("-pk"):
+            values = tuple(getattr(obj, attname) for attname in attnames)
+            found[lookup, values] = obj
+    return found
+
+
+def _conflicted(model, objs):
+    # Of rows just written with ON CONFLICT DO UPDATE, the pks of those that
+    # updated an existing row: until the transaction ends their new version
+    # still carries the conflict's row lock in xmax, where an insert has none.
+    inserted = RawSQL(
+        f'"{model._meta.db_table}".xmax = 0', [], output_field=BooleanField()
+    )
+    return set(
+        model.objects.filter(pk__in=[obj.pk for obj in objs])
+        .alias(inserted=inserted)
+        .filter(inserted=False)
+        .order_by()
+        .values_list("pk", flat=True)
+    )
+
+
+def assign_slugs(victims):
+    # Same scheme as Victim.save() (name, name-2, name-3, ...), resolved with
+    # one query per 500 base slugs instead of one query per candidate.
+    pending = [
+        (victim, slugify(victim.full_name) or "victim")
+        for victim in victims
+        if not victim.slug
+    ]
+    unique_bases = sorted({base for _, base in pending})
+    taken = {victim.slug for victim in victims if victim.slug}
+    for start in range(0, len(unique_bases), 500):
+        chunk = unique_bases[start : start + 500]
+        pattern = "^(%s)(-[0-9]+)?$" % "|".join(re.escape(base) for base in chunk)
+        taken.update(
+            Victim.objects.filter(slug__regex=pattern).values_list("slug", flat=True)
+        )
+    for victim, base in pending:
+        slug = base
+        counter = 1
+        while slug in taken:
+            counter += 1
+            slug = f"{base}-{counter}"
+        victim.slug = slug
+        taken.add(slug)
+
+
+class BatchWriteMixin:
+    # POST .../batch/ {"mode": "create"|"update"|"upsert", "items": [...],
+    # "atomic": false}. Items are matched on "id" or on batch_lookup, written
+    # with bulk_create/bulk_update in one transaction, and reported per item.
+    batch_lookup = ()
+    # Set when a unique constraint covers batch_lookup: upserts then insert
+    # with ON CONFLICT DO UPDATE, so concurrent batches creating the same
+    # row update it instead of failing or duplicating it.
+    batch_lookup_unique = False
+    batch_modes = MODES
+    batch_exclude = ()
+
+    def get_batch_serializer(self, items, instances=None, partial=False):
+        child = self.get_serializer_class()(
+            context=self.get_serializer_context(), partial=partial
+        )
+        _prepare_child(child, items, self.batch_exclude)
+        return BatchListSerializer(
+            child=child, instance=instances, data=items, partial=partial
+        )
+
+    def _check_batch_permissions(self, mode):
+        model = self.get_queryset().model
+        opts = model._meta
+        needed = {"create": ["add"], "update": ["change"], "upsert": ["add", "change"]}
+        perms = [
+            f"{opts.app_label}.{action}_{opts.model_name}" for action in needed[mode]
+        ]
+        if not self.request.user.has_perms(perms):
+            raise PermissionDenied()
+
+    @action(detail=False, methods=["post"])
+    def batch(self, request):
+        mode = request.data.get("mode")
+        items = request.data.get("items")
+        if mode not in self.batch_modes:
+            raise ValidationError(
+                {"mode": f"Must be one of: {', '.join(self.batch_modes)}."}
+            )
+        if not isinstance(items, list) or not items:
+            raise ValidationError({"items": "A non-empty list is required."})
+        if len(items) > settings.API_BATCH_MAX_ITEMS:
+            raise ValidationError(
+                {"items": f"At most {settings.API_BATCH_MAX_ITEMS} items per batch."}
+            )
+        self._check_batch_permissions(mode)
+        model = self.get_queryset().model
+        lookup = tuple(self.batch_lookup)
+
+        results = [None] * len(items)
+        fields = self.get_serializer_class()(
+            context=self.get_serializer_context()
+        ).fields
+        keys = [_item_key(item, lookup, fields) for item in items]
+        existing = _existing(model, [key for key in keys if key], lookup)
+        creates, updates, seen = [], [], set()
+        for index, (item, key) in enumerate(zip(items, keys)):
+            if not isinstance(item, dict):
+                results[index] = {"status": "error", "errors": "Expected an object."}
+                continue
+            if key is not None and key in seen:
+                results[index] = {
+                    "status": "error",
+                    "errors": "Duplicate of an earlier item in this batch.",
+                }
+                continue
+            if key is not None:
+                seen.add(key)
+            instance = existing.get(key) if key else None
+            if mode == "create" and instance is not None:
+                results[index] = {"status": "error", "errors": "Already exists."}
+            elif mode == "update" and instance is None:
+                results[index] = {"status": "error", "errors": "Not found."}
+            elif instance is not None:
+                updates.append((index, instance))
+            elif key is not None and key[0] == "id":
+                results[index] = {"status": "error", "errors": "Not found."}
+            else:
+                creates.append(index)
+
+        to_create, to_update, create_fields = [], [], set()
+        if creates:
+            serializer = self.get_batch_serializer([items[i] for i in creates])
+            serializer.is_valid()
+            for index, data, errors in zip(
+                creates, serializer.validated_data, serializer.item_errors
+            ):
+                if errors:
+                    results[index] = {"status": "error", "errors": errors}
+                else:
+                    to_create.append((index, model(**data)))
+                    create_fields.update(data)
+        if updates:
+            serializer = self.get_batch_serializer(
+                [items[i] for i, _ in updates],
+                instances=[instance for _, instance in updates],
+                partial=True,
+            )
+            serializer.is_valid()
+            for (index, instance), data, errors in zip(
+                updates, serializer.validated_data, serializer.item_errors
+            ):
+                if errors:
+                    results[index] = {"status": "error", "errors": errors}
+                else:
+                    for name, value in data.items():
+                        setattr(instance, name, value)
+                    to_update.append((index, instance, set(data)))
+
+        failed = any(result and result["status"] == "error" for result in results)
+        if failed and request.data.get("atomic"):
+            return Response(
+                {"results": results, "written": False},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        conflict_fields = None
+        if mode == "upsert" and self.batch_lookup_unique:
+            conflict_fields = sorted(create_fields - set(lookup))
+        merged = self.perform_batch_write(model, to_create, to_update, conflict_fields)
+        for index, obj in to_create:
+            results[index] = {
+                "status": "updated" if obj.pk in merged else "created",
+                "id": obj.pk,
+            }
+        for index, obj, _ in to_update:
+            results[index] = {"status": "updated", "id": obj.pk}
+        return Response(
+            {
+                "results": results,
+                "created": len(to_create) - len(merged),
+                "updated": len(to_update) + len(merged),
+                "errors": sum(result["status"] == "error" for result in results),
+            },
+            status=status.HTTP_200_OK,
+        )
+
+    def perform_batch_write(self, model, to_create, to_update, conflict_fields=None):
+        # conflict_fields, when given, are the columns a create overwrites if
+        # its batch_lookup row was inserted since the existing rows were read.
+        # Returns the pks of creates that updated such a row instead.
+        created = [obj for _, obj in to_create]
+        updated = [obj for _, obj, _ in to_update]
+        fields = set().union(*(names for _, _, names in to_update))
+        auto_now = [
+            field.name
+            for field in model._meta.concrete_fields
+            if getattr(field, "auto_now", False)
+        ]
+        now = timezone.now()
+        for obj in updated:
+            for name in auto_now:
+                setattr(obj, name, now)
+        # Only creates that name their row by batch_lookup may take over an
+        # existing one; a generated slug must never overwrite another victim.
+        attnames = [model._meta.get_field(name).attname for name in self.batch_lookup]
+        keyed, plain = [], []
+        for obj in created:
+            named = all(getattr(obj, name) not in (None, "") for name in attnames)
+            (keyed if conflict_fields and named else plain).append(obj)
+        if keyed:
+            conflict_fields = set(conflict_fields) | set(auto_now)
+        if model is Victim:
+            assign_slugs(created)
+            for obj in created + updated:
+                obj.locate()
+            if fields & LOCATION_FIELDS:
+                fields |= {"latitude", "longitude", "location_precision"}
+            if fields:
+                for obj in updated:
+                    obj.cache_version = F("cache_version") + 1
+                fields.add("cache_version")
+            if keyed and conflict_fields & LOCATION_FIELDS:
+                conflict_fields |= {"latitude", "longitude", "location_precision"}
+        change_name = changes.TRACKED_MODELS.get(model)
+        merged, merged_objs = set(), []
+        with transaction.atomic():
+            if keyed:
+                model.objects.bulk_create(
+                    keyed,
+                    batch_size=1000,
+                    update_conflicts=True,
+                    unique_fields=self.batch_lookup,
+                    update_fields=sorted(conflict_fields),
+                )
+                merged = _conflicted(model, keyed)
+            if plain:
+                model.objects.bulk_create(plain, batch_size=1000)
+            if updated and fields:
+                model.objects.bulk_update(
+                    updated, sorted(fields | set(auto_now)), batch_size=1000
+                )
+            if merged:
+                if model is Victim:
+                    model.objects.filter(pk__in=merged).update(
+                        cache_version=F("cache_version") + 1
+                    )
+                # Revisions and the change log describe the row as it now is,
+                # not as the create would have left it.
+                merged_objs = list(model.objects.filter(pk__in=merged))
+            inserted = [obj for obj in created if obj.pk not in merged]
+            if model is Victim:
+                queue_search_vectors([obj.pk for obj in created + updated])
+                queue_stats_refresh()
+            else:
+                bump_cache_versions({obj.victim_id for obj in created + updated})
+            if model in revisions.TRACKED_MODELS:
+                revisions.record(updated + merged_objs, created=inserted)
+            if change_name:
+                changes.record_many(
+                    change_name, [obj.pk for obj in inserted], changes.Action.CREATED
+                )
+                changes.record_many(
+                    change_name,
+                    [obj.pk for obj in updated + merged_objs],
+                    changes.Action.UPDATED,
+                )
+        return merged
@@ -0,0 +1,170 @@
+import statistics
+import time
+from dataclasses import asdict, dataclass
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+
+from .middleware import compress
+from .models import Source, Tag, Victim
+from .renderers import MessagePackRenderer
+
+
+@dataclass
+class Measurement:
+    status: int
+    queries: int
+    median_ms: float
+    p95_ms: float
+    min_ms: float
+    runs: int
+
+
+def scenarios():
+    victim = Victim.objects.order_by("pk").only("pk", "slug", "full_name").first()
+    tag = Tag.objects.order_by("pk").first()
+    source = Source.objects.order_by("pk").only("pk").first()
+    name = victim.full_name.split()[0]
+    tag_slug = tag.slug if tag else "student"
+    victim_list = reverse("victim_list")
+    changelist = "admin:victims_{}_changelist"
+    items = {
+        "victim_list": victim_list,
+        "victim_list.q": f"{victim_list}?q={name}",
+        "victim_list.city": f"{victim_list}?city={victim.city_of_death}",
+        "victim_list.status": f"{victim_list}?verification_status=verified",
+        "victim_list.age": f"{victim_list}?age_min=20&age_max=40",
+        "victim_list.tag": f"{victim_list}?tag={tag_slug}",
+        "victim_list.sort_alpha": f"{victim_list}?sort=alpha",
+        "victim_list.sort_age": f"{victim_list}?sort=age",
+        "victim_list.sort_date": f"{victim_list}?sort=date",
+        "victim_list.deep_page": f"{victim_list}?sort=alpha&page=500",
+        "victim_detail": reverse("victim_detail", args=[victim.slug]),
+        "name_suggest": f"{reverse('name_suggest')}?q={name[:3]}",
+        "api.victim_list": reverse("victim-list"),
+        "api.victim_list.search": f"{reverse('victim-list')}?search={name}",
+        "api.victim_list.tag": f"{reverse('victim-list')}?tag={tag_slug}",
+        "api.victim_retrieve": reverse("victim-detail", args=[victim.pk]),
+        "admin.victim_changelist": reverse(changelist.format("victim")),
+        "admin.victim_changelist.search": (
+            f"{reverse(changelist.format('victim'))}?q={name}"
+        ),
+        "admin.photo_changelist": reverse(changelist.format("photo")),
+        "admin.source_changelist": reverse(changelist.format("source")),
+        "admin.auditlog_changelist": reverse(changelist.format("auditlog")),
+        "admin.victim_change": reverse("admin:victims_victim_change", args=[victim.pk]),
+    }
+    if source is not None:
+        items["admin.source_change"] = reverse(
+            "admin:victims_source_change", args=[source.pk]
+        )
+    return items
+
+
+def benchmark_client():
+    user, _ = get_user_model().objects.get_or_create(
+        username="benchmark-admin",
+        defaults={"is_staff": True, "is_superuser": True},
+    )
+    client = Client()
+    client.force_login(user)
+    return client
+
+
+def measure(client, url, repeat=5, warm_cache=False):
+    timings = []
+    queries = 0
+    status = 0
+    client.get(url, secure=True)
+    for _ in range(repeat):
+        if not warm_cache:
+            # Every configured cache, so fragments and cached searches are
+            # rebuilt too.
+            for cache in caches.all():
+                cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = client.get(url, secure=True)
+            timings.append((time.perf_counter() - start) * 1000)
+        queries = len(captured.captured_queries)
+        status = response.status_code
+    timings.sort()
+    p95_index = min(len(timings) - 1, int(round(0.95 * (len(timings) - 1))))
+    return Measurement(
+        status=status,
+        queries=queries,
+        median_ms=round(statistics.median(timings), 3),
+        p95_ms=round(timings[p95_index], 3),
+        min_ms=round(timings[0], 3),
+        runs=len(timings),
+    )
+
+
+def run_scenarios(repeat=5, only=None, warm_cache=False):
+    client = benchmark_client()
+    results = {}
+    for name, url in scenarios().items():
+        if only and not any(pattern in name for pattern in only):
+            continue
+        results[name] = asdict(measure(client, url, repeat, warm_cache))
+    return results
+
+
+def compare(current, baseline, max_slowdown=1.25, max_extra_queries=0, min_ms=5.0):
+    regressions = []
+    for size, scenario_results in current.get("results", {}).items():
+        baseline_results = baseline.get("results", {}).get(size, {})
+        for name, result in scenario_results.items():
+            previous = baseline_results.get(name)
+            if previous is None:
+                continue
+            if result["queries"] > previous["queries"] + max_extra_queries:
+                regressions.append(
+                    f"{size}/{name}: queries "
+                    f"{previous['queries']} -> {result['queries']}"
+                )
+            # Ignore jitter on paths that are fast in absolute terms.
+            allowed = max(previous["median_ms"] * max_slowdown, min_ms)
+            if result["median_ms"] > allowed:
+                regressions.append(
+                    f"{size}/{name}: median {previous['median_ms']}ms -> "
+                    f"{result['median_ms']}ms (limit {allowed:.1f}ms)"
+                )
+    return regressions
+
+
+def _timed(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return result, round(statistics.median(timings), 3)
+
+
+def payload_report(repeat=5):
+    client = benchmark_client()
+    renderers = {"json": JSONRenderer(), "msgpack": MessagePackRenderer()}
+    pages = {
+        "api.victim_list": reverse("victim-list"),
+        "api.victim_list.expanded": f"{reverse('victim-list')}?expand=photos,sources",
+    }
+    report = {}
+    for page_name, url in pages.items():
+        data = client.get(url, secure=True).data
+        for format_name, renderer in renderers.items():
+            body, encode_ms = _timed(lambda: renderer.render(data), repeat)
+            row = {"identity": {"bytes": len(body), "encode_ms": encode_ms}}
+            for coding in ("gzip", "br"):
+                compressed, compress_ms = _timed(lambda: compress(body, coding), repeat)
+                row[coding] = {
+                    "bytes": len(compressed),
+                    "encode_ms": round(encode_ms + compress_ms, 3),
+                }
+            report[f"{page_name}.{format_name}"] = row
+    return report
@@ -0,0 +1,165 @@
+from django.db.models import BigIntegerField, Q
+from django.db.models.expressions import RawSQL
+
+from .models import ChangeLogEntry, Photo, Source, Tag, Victim
+from .serializers import (
+    PhotoSerializer,
+    SourceSerializer,
+    TagSerializer,
+    VictimDetailSerializer,
+)
+
+Action = ChangeLogEntry.Action
+
+TRACKED_MODELS = {
+    Victim: "victim",
+    Photo: "photo",
+    Source: "source",
+    Tag: "tag",
+}
+TAG_LINK = "victimtag"
+VICTIM_FEED_FIELDS = [
+    name
+    for name in VictimDetailSerializer.Meta.fields
+    if name not in ("tags", "photos", "sources")
+]
+SERIALIZERS = {
+    "victim": (Victim, VictimDetailSerializer, {"fields": VICTIM_FEED_FIELDS}),
+    "photo": (Photo, PhotoSerializer, {}),
+    "source": (Source, SourceSerializer, {}),
+    "tag": (Tag, TagSerializer, {}),
+}
+# The oldest transaction id other sessions still have in flight (or the
+# largest bigint when there is none). Those transactions may yet commit
+# entries with sequence numbers below ones already visible.
+IN_FLIGHT_HORIZON = (
+    "(SELECT coalesce(min(xip::text::bigint), 9223372036854775807) "
+    "FROM pg_snapshot_xip(pg_current_snapshot()) AS xip)"
+)
+
+
+def record(model_name, object_id, action, data=None):
+    ChangeLogEntry.objects.create(
+        model=model_name, object_id=object_id, action=action, data=data or {}
+    )
+
+
+def record_many(model_name, object_ids, action):
+    ChangeLogEntry.objects.bulk_create(
+        ChangeLogEntry(model=model_name, object_id=object_id, action=action)
+        for object_id in object_ids
+    )
+
+
+def record_tag_links(pairs, action):
+    # Tag links are identified by (victim, tag) rather than the VictimTag id,
+    # which m2m add()/remove() never expose.
+    ChangeLogEntry.objects.bulk_create(
+        ChangeLogEntry(
+            model=TAG_LINK,
+            object_id=victim_id,
+            action=action,
+            data={"victim": victim_id, "tag": tag_id},
+        )
+        for victim_id, tag_id in pairs
+    )
+
+
+def parse_cursor(value):
+    # "<xid>-<seq>" as returned in next_cursor. A bare sequence number is a
+    # cursor from before entries carried their transaction id.
+    value = (value or "").strip()
+    if not value:
+        return 0, 0
+    if "-" in value:
+        xid, seq = value.split("-", 1)
+        return int(xid), int(seq)
+    seq = int(value)
+    xid = ChangeLogEntry.objects.filter(seq=seq).values_list("xid", flat=True).first()
+    return xid or 0, seq
+
+
+def format_cursor(xid, seq):
+    return f"{xid}-{seq}"
+
+
+def committed_after(cursor):
+    # Entries past cursor in (xid, seq) order, stopping short of transactions
+    # still in flight: anything they commit later sorts after every entry
+    # served here, so a cursor never skips it.
+    xid, seq = cursor
+    horizon = RawSQL(IN_FLIGHT_HORIZON, [], output_field=BigIntegerField())
+    return ChangeLogEntry.objects.filter(
+        Q(xid__gt=xid) | Q(xid=xid, seq__gt=seq), xid__lt=horizon
+    ).order_by("xid", "seq")
+
+
+def committed_mark():
+    # The (xid, seq) of the newest entry committed_after() would serve now.
+    # Everything at or before it has committed, and anything still in flight
+    # sorts after it, so it is a safe cursor to resume from.
+    horizon = RawSQL(IN_FLIGHT_HORIZON, [], output_field=BigIntegerField())
+    last = (
+        ChangeLogEntry.objects.filter(xid__lt=horizon)
+        .order_by("-xid", "-seq")
+        .values_list("xid", "seq")
+        .first()
+    )
+    return last or (0, 0)
+
+
+def _key(entry):
+    return entry.model, entry.object_id, entry.data.get("tag")
+
+
+def feed(since, limit, request=None):
+    entries = list(committed_after(since)[: limit + 1])
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    next_cursor = (entries[-1].xid, entries[-1].seq) if entries else since
+
+    # Only the last change to each object in the page matters: upserts carry
+    # the object's current state, not the state at the time of the change.
+    latest = {}
+    for entry in entries:
+        latest.pop(_key(entry), None)
+        latest[_key(entry)] = entry
+
+    wanted = {}
+    for entry in latest.values():
+        if entry.action != Action.DELETED and entry.model in SERIALIZERS:
+            wanted.setdefault(entry.model, set()).add(entry.object_id)
+    current = {}
+    for model_name, ids in wanted.items():
+        model, serializer_class, options = SERIALIZERS[model_name]
+        objects = model.objects.filter(pk__in=ids)
+        serializer = serializer_class(
+            objects, many=True, context={"request": request}, **options
+        )
+        for data in serializer.data:
+            current[model_name, data["id"]] = data
+
+    results = []
+    for entry in latest.values():
+        item = {
+            "seq": entry.seq,
+            "model": entry.model,
+            "id": entry.object_id,
+            "action": entry.action,
+            "changed_at": entry.changed_at,
+        }
+        if entry.model == TAG_LINK:
+            item["data"] = entry.data
+        elif entry.action == Action.DELETED:
+            item["data"] = None
+        elif (entry.model, entry.object_id) in current:
+            item["data"] = current[entry.model, entry.object_id]
+        else:
+            # Deleted later on; its tombstone follows in a later page.
+            continue
+        results.append(item)
+    return {
+        "results": results,
+        "next_cursor": format_cursor(*next_cursor),
+        "has_more": has_more,
+    }
@@ -1,10 +1,55 @@
 import django_filters
+from django.db import connection
 
 from .models import Victim
 
+TAG_MODES = [("all", "All of the tags"), ("any", "Any of the tags")]
+
+
+def split_slugs(values):
+    # Accepts "a,b" and/or repeated values; returns unique slugs in order.
+    if isinstance(values, str):
+        values = [values]
+    slugs = []
+    for value in values or ():
+        for slug in value.split(","):
+            slug = slug.strip().lower()
+            if slug and slug not in slugs:
+                slugs.append(slug)
+    return slugs
+
+
+def filter_tags(queryset, tags=(), mode="all", exclude=()):
+    # @> / && / NOT && on Victim.tag_slugs: one GIN index scan however many
+    # tags are given, and no join to multiply rows.
+    if tags:
+        lookup = "tag_slugs__overlap" if mode == "any" else "tag_slugs__contains"
+        queryset = queryset.filter(**{lookup: list(tags)})
+    if exclude:
+        queryset = queryset.exclude(tag_slugs__overlap=list(exclude))
+    return queryset
+
+
+def tag_counts_sql(queryset):
+    sql, params = queryset.order_by().values("tag_slugs").query.sql_with_params()
+    return (
+        f"SELECT slug, count(*) FROM ({sql}) AS victims, "
+        "unnest(victims.tag_slugs) AS slug GROUP BY slug",
+        params,
+    )
+
+
+def tag_counts(queryset):
+    # {slug: number of victims in queryset with that tag}.
+    with connection.cursor() as cursor:
+        cursor.execute(*tag_counts_sql(queryset))
+        return dict(cursor.fetchall())
+
 
 class VictimFilter(django_filters.FilterSet):
-    city = django_filters.CharFilter(field_name="city_of_death", lookup_expr="icontains")
+    city = django_filters.CharFilter(
+        field_name="city_of_death", lookup_expr="icontains"
+    )
     province = django_filters.CharFilter(
         field_name="province_or_state", lookup_expr="icontains"
     )
@@ -14,7 +59,11 @@ class VictimFilter(django_filters.FilterSet):
     )
     age_min = django_filters.NumberFilter(field_name="age", lookup_expr="gte")
     age_max = django_filters.NumberFilter(field_name="age", lookup_expr="lte")
-    tag = django_filters.CharFilter(field_name="tags__slug", lookup_expr="iexact")
+    tag = django_filters.CharFilter(method="filter_tag", help_text="Comma-separated.")
+    tag_mode = django_filters.ChoiceFilter(choices=TAG_MODES, method="filter_tag_mode")
+    exclude_tag = django_filters.CharFilter(
+        method="filter_exclude_tag", help_text="Comma-separated."
+    )
 
     class Meta:
         model = Victim
@@ -26,4 +75,17 @@ class VictimFilter(django_filters.FilterSet):
             "age_min",
             "age_max",
             "tag",
+            "tag_mode",
+            "exclude_tag",
         ]
+
+    def filter_tag(self, queryset, name, value):
+        mode = self.form.cleaned_data.get("tag_mode") or "all"
+        return filter_tags(queryset, split_slugs(value), mode)
+
+    def filter_tag_mode(self, queryset, name, value):
+        # Read by filter_tag.
+        return queryset
+
+    def filter_exclude_tag(self, queryset, name, value):
+        return filter_tags(queryset, exclude=split_slugs(value))
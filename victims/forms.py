@@ -1,8 +1,17 @@
 from django import forms
 
+from .filters import TAG_MODES, split_slugs
 from .models import Submission, Victim
 
 
+class SlugListField(forms.Field):
+    # Takes repeated parameters (?tag=a&tag=b) as well as ?tag=a,b.
+    widget = forms.MultipleHiddenInput
+
+    def to_python(self, value):
+        return split_slugs(value)
+
+
 class SubmissionForm(forms.ModelForm):
     details = forms.CharField(
         widget=forms.Textarea(attrs={"rows": 6, "class": "form-control"}),
@@ -54,7 +63,13 @@ class VictimFilterForm(forms.Form):
     age_max = forms.IntegerField(
         required=False, min_value=0, widget=forms.NumberInput(attrs={"class": "form-control"})
     )
-    tag = forms.CharField(required=False)
+    tag = SlugListField(required=False)
+    tag_mode = forms.ChoiceField(
+        required=False,
+        choices=TAG_MODES,
+        widget=forms.Select(attrs={"class": "form-select"}),
+    )
+    exclude_tag = SlugListField(required=False)
     sort = forms.ChoiceField(
         required=False,
         choices=[
@@ -65,3 +80,22 @@ class VictimFilterForm(forms.Form):
         ],
         widget=forms.Select(attrs={"class": "form-select"}),
     )
+
+
+class QueuedSubmissionForm(forms.Form):
+    # SubmissionForm without database lookups, for read-only mode; the
+    # victim is kept as a slug and resolved when the queue is replayed.
+    victim = forms.SlugField(
+        required=False,
+        widget=forms.TextInput(attrs={"class": "form-control", "readonly": True}),
+    )
+    submitter_name = forms.CharField(
+        required=False,
+        max_length=120,
+        widget=forms.TextInput(attrs={"class": "form-control"}),
+    )
+    submitter_email = forms.EmailField(
+        required=False, widget=forms.EmailInput(attrs={"class": "form-control"})
+    )
+    details = SubmissionForm.base_fields["details"]
+    source_urls = SubmissionForm.base_fields["source_urls"]
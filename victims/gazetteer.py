@@ -0,0 +1,61 @@
+import csv
+import functools
+import re
+from pathlib import Path
+
+DATA_FILE = Path(__file__).resolve().parent / "data" / "gazetteer.csv"
+COUNTRY_NAMES = {"", "iran", "ایران", "islamic republic of iran"}
+# Words that don't distinguish one place from another ("Bandar-e Abbas",
+# "Tehran Province", "استان تهران").
+NOISE_WORDS = {"e", "province", "ostan", "استان"}
+PERSIAN_FORMS = str.maketrans({"ي": "ی", "ك": "ک", "ى": "ی", "ة": "ه", "‌": " "})
+
+
+def normalize(name):
+    name = (name or "").translate(PERSIAN_FORMS).casefold()
+    words = re.split(r"[\s\-_'’.,]+", name)
+    return " ".join(word for word in words if word and word not in NOISE_WORDS)
+
+
+@functools.lru_cache(maxsize=1)
+def load():
+    # Returns {city: [(province, lat, lon), ...]} and {province: (lat, lon)},
+    # keyed by every normalized name and alias; cities refer to provinces by
+    # canonical name, and `canonical` maps province aliases to it.
+    with open(DATA_FILE, encoding="utf-8") as handle:
+        rows = list(csv.DictReader(handle))
+    cities, provinces, canonical = {}, {}, {}
+    for row in rows:
+        names = [row["name"], *filter(None, row["aliases"].split("|"))]
+        point = (float(row["latitude"]), float(row["longitude"]))
+        for name in names:
+            if row["kind"] == "province":
+                provinces[normalize(name)] = point
+                canonical[normalize(name)] = normalize(row["name"])
+            else:
+                entry = (normalize(row["province"]), *point)
+                matches = cities.setdefault(normalize(name), [])
+                if entry not in matches:
+                    matches.append(entry)
+    return cities, provinces, canonical
+
+
+def resolve(city, province, country):
+    # Returns (latitude, longitude, precision) with precision "city" or
+    # "province", or None when the place is not in the gazetteer.
+    if normalize(country) not in COUNTRY_NAMES:
+        return None
+    cities, provinces, canonical = load()
+    province_key = normalize(province)
+    province_key = canonical.get(province_key, province_key)
+    matches = cities.get(normalize(city), [])
+    for match_province, lat, lon in matches:
+        if match_province == province_key:
+            return lat, lon, "city"
+    # A unique city name is trusted even if the province is missing or
+    # misspelled; an ambiguous one falls back to the province.
+    if len(matches) == 1:
+        return matches[0][1], matches[0][2], "city"
+    if province_key in provinces:
+        return (*provinces[province_key], "province")
+    return None
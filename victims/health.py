@@ -0,0 +1,56 @@
+import logging
+import time
+
+from django.conf import settings
+from django.db import Error, connection
+
+logger = logging.getLogger(__name__)
+
+# Per-process circuit breaker for PostgreSQL. A healthy database costs
+# nothing: the breaker opens when a public view fails with a connection or
+# operational error, and is then probed at most every
+# SNAPSHOT_FALLBACK_RETRY seconds until the database answers in time again.
+_state = {"down_since": None, "checked": 0.0}
+
+
+def check():
+    # A slow answer counts as down, so an overloaded database is left alone
+    # rather than handed more public traffic.
+    if not connection.in_atomic_block:
+        # Drop a connection broken by the outage before probing.
+        connection.close_if_unusable_or_obsolete()
+    start = time.monotonic()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+    except Error:
+        return False
+    return time.monotonic() - start <= settings.SNAPSHOT_FALLBACK_MAX_LATENCY
+
+
+def database_available():
+    if _state["down_since"] is None:
+        return True
+    now = time.monotonic()
+    if now - _state["checked"] < settings.SNAPSHOT_FALLBACK_RETRY:
+        return False
+    _state["checked"] = now
+    if not check():
+        return False
+    logger.warning(
+        "Database is back after %.0fs; leaving read-only mode",
+        now - _state["down_since"],
+    )
+    _state["down_since"] = None
+    return True
+
+
+def mark_unavailable():
+    if _state["down_since"] is None:
+        logger.error("Database unavailable; serving public pages from the snapshot")
+        _state["down_since"] = time.monotonic()
+    _state["checked"] = time.monotonic()
+
+
+def reset():
+    _state.update(down_since=None, checked=0.0)
@@ -0,0 +1,208 @@
+import datetime
+import logging
+import random
+import threading
+import traceback
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_handlers = {}
+
+
+def handler(name, *, max_attempts=None):
+    # Registers a function as the job called `name`; it is called with the
+    # job's payload as keyword arguments and should be safe to run twice.
+    def decorator(func):
+        _handlers[name] = (func, max_attempts)
+        return func
+
+    return decorator
+
+
+def _build(name, payload, priority, delay, unique_key):
+    if name not in _handlers:
+        raise ValueError(f"Unknown job {name!r}.")
+    max_attempts = _handlers[name][1] or settings.JOB_MAX_ATTEMPTS
+    return Job(
+        name=name,
+        payload=payload or {},
+        priority=priority,
+        run_at=timezone.now() + datetime.timedelta(seconds=delay),
+        unique_key=unique_key,
+        max_attempts=max_attempts,
+    )
+
+
+def enqueue(name, payload=None, *, priority=0, delay=0, unique_key=""):
+    # Written in the caller's transaction, so a job never runs for a change
+    # that was rolled back. A job with the same unique_key that is still
+    # queued absorbs this one.
+    job = _build(name, payload, priority, delay, unique_key)
+    if not unique_key:
+        job.save()
+        return job
+    if Job.objects.filter(status=Job.Status.QUEUED, unique_key=unique_key).exists():
+        return None
+    try:
+        with transaction.atomic():
+            job.save()
+    except IntegrityError:
+        return None
+    return job
+
+
+def enqueue_many(name, payloads, *, priority=0, delay=0):
+    return Job.objects.bulk_create(
+        [_build(name, payload, priority, delay, "") for payload in payloads],
+        batch_size=1000,
+    )
+
+
+def claim(worker, limit=1):
+    # SKIP LOCKED lets any number of workers poll the same table without
+    # blocking on, or double-claiming, each other's rows.
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status=Job.Status.QUEUED, run_at__lte=now)
+            .order_by("-priority", "run_at", "pk")[:limit]
+        )
+        if jobs:
+            Job.objects.filter(pk__in=[job.pk for job in jobs]).update(
+                status=Job.Status.RUNNING,
+                locked_by=worker,
+                locked_at=now,
+                attempts=F("attempts") + 1,
+            )
+    for job in jobs:
+        job.status, job.locked_by, job.locked_at = Job.Status.RUNNING, worker, now
+        job.attempts += 1
+    return jobs
+
+
+def backoff(attempts):
+    delay = min(
+        settings.JOB_RETRY_MAX_DELAY, settings.JOB_RETRY_DELAY * 2 ** (attempts - 1)
+    )
+    # Jitter keeps jobs that failed together from retrying in lockstep.
+    return delay * random.uniform(0.8, 1.2)
+
+
+@contextmanager
+def heartbeat(job):
+    # Refreshes locked_at every JOB_HEARTBEAT_INTERVAL seconds while the block
+    # runs, from a thread with its own connection, so requeue_stale() leaves a
+    # long but healthy run alone.
+    stop = threading.Event()
+
+    def beat():
+        try:
+            while not stop.wait(settings.JOB_HEARTBEAT_INTERVAL):
+                try:
+                    Job.objects.filter(
+                        pk=job.pk, status=Job.Status.RUNNING, locked_by=job.locked_by
+                    ).update(locked_at=timezone.now())
+                except Exception:
+                    logger.warning("Heartbeat for job #%s failed", job.pk)
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=beat, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def execute(job):
+    # Returns True if the job succeeded. Failures are retried with exponential
+    # backoff until max_attempts, then left in the table as dead letters.
+    func = _handlers.get(job.name, (None, None))[0]
+    try:
+        if func is None:
+            raise LookupError(f"No handler registered for {job.name!r}.")
+        with heartbeat(job), transaction.atomic():
+            func(**job.payload)
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning("Job %s #%s failed (attempt %s)", job.name, job.pk, job.attempts)
+        if func is not None and job.attempts < job.max_attempts:
+            job.status = Job.Status.QUEUED
+            job.run_at = timezone.now() + datetime.timedelta(
+                seconds=backoff(job.attempts)
+            )
+        else:
+            job.status = Job.Status.DEAD
+        # A newer copy of a unique job may have been queued meanwhile; the
+        # retry gives up its key rather than colliding with it.
+        job.unique_key = ""
+        job.last_error = error[-4000:]
+        job.locked_by, job.locked_at = "", None
+        job.save(
+            update_fields=[
+                "status",
+                "run_at",
+                "unique_key",
+                "last_error",
+                "locked_by",
+                "locked_at",
+            ]
+        )
+        return False
+    Job.objects.filter(pk=job.pk).delete()
+    return True
+
+
+def run_pending(worker="inline", limit=None):
+    # Drains jobs that are due, in this process. Used by `run_worker --once`
+    # and by tests.
+    done = 0
+    while limit is None or done < limit:
+        jobs = claim(worker)
+        if not jobs:
+            break
+        execute(jobs[0])
+        done += 1
+    return done
+
+
+def requeue_stale(timeout=None):
+    # Jobs whose worker died mid-run keep status "running"; put them back.
+    timeout = settings.JOB_LOCK_TIMEOUT if timeout is None else timeout
+    cutoff = timezone.now() - datetime.timedelta(seconds=timeout)
+    stale = Job.objects.filter(status=Job.Status.RUNNING, locked_at__lt=cutoff)
+    dead = stale.filter(attempts__gte=F("max_attempts")).update(
+        status=Job.Status.DEAD,
+        last_error="Worker stopped before the job finished.",
+        locked_by="",
+        locked_at=None,
+    )
+    requeued = stale.update(
+        status=Job.Status.QUEUED,
+        run_at=timezone.now(),
+        unique_key="",
+        locked_by="",
+        locked_at=None,
+    )
+    return requeued, dead
+
+
+def retry(queryset):
+    return queryset.filter(status=Job.Status.DEAD).update(
+        status=Job.Status.QUEUED,
+        attempts=0,
+        run_at=timezone.now(),
+        unique_key="",
+        last_error="",
+    )
@@ -0,0 +1,77 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from victims.backup import BackupError, Timer, create_backup, rotate, verify_backup
+
+
+class Command(BaseCommand):
+    help = (
+        "Back up the database (parallel directory-format pg_dump) and photo media "
+        "(content-addressed, incremental), rotate old backups and optionally verify "
+        "that the new backup restores."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dir", default=settings.BACKUP_DIR)
+        parser.add_argument("--jobs", type=int, default=settings.BACKUP_JOBS)
+        parser.add_argument(
+            "--compression", type=int, default=settings.BACKUP_COMPRESSION
+        )
+        parser.add_argument(
+            "--keep",
+            type=int,
+            default=settings.BACKUP_KEEP,
+            help="Number of backups to keep; 0 keeps everything.",
+        )
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Restore into a scratch database and compare row counts.",
+        )
+        parser.add_argument(
+            "--verify-only",
+            metavar="BACKUP",
+            help="Verify an existing backup directory instead of creating one.",
+        )
+
+    def handle(self, *args, **options):
+        root = Path(options["dir"])
+        timer = Timer()
+        try:
+            if options["verify_only"]:
+                backup = root / options["verify_only"]
+            else:
+                backup, manifest = create_backup(
+                    root,
+                    options["jobs"],
+                    options["compression"],
+                    settings.MEDIA_ROOT,
+                    timer,
+                )
+                self.stdout.write(
+                    f"Backup written to {backup} "
+                    f"({manifest['media_copied']} new media files, "
+                    f"{manifest['media_copied_bytes']} bytes)"
+                )
+                with timer.step("rotate"):
+                    removed, orphaned = rotate(root, options["keep"])
+                if removed or orphaned:
+                    self.stdout.write(
+                        f"Removed {len(removed)} old backups and {orphaned} "
+                        "unreferenced media blobs"
+                    )
+            problems = []
+            if options["verify"] or options["verify_only"]:
+                with timer.step("verify"):
+                    problems = verify_backup(root, backup, options["jobs"])
+        except BackupError as exc:
+            raise CommandError(str(exc))
+
+        for step, seconds in timer.steps.items():
+            self.stdout.write(f"  {step}: {seconds:.2f}s")
+        if problems:
+            raise CommandError("Backup verification failed:\n" + "\n".join(problems))
+        if options["verify"] or options["verify_only"]:
+            self.stdout.write(self.style.SUCCESS(f"Verified {backup.name}"))
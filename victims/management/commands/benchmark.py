@@ -0,0 +1,130 @@
+import json
+import platform
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from victims import synthetic
+from victims.benchmarking import compare, payload_report, run_scenarios
+from victims.models import Victim
+
+
+class Command(BaseCommand):
+    help = "Benchmark hot views and API endpoints against a seeded synthetic dataset."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes", nargs="+", type=int, default=[10_000, 100_000, 1_000_000]
+        )
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--workers", type=int, default=1)
+        parser.add_argument(
+            "--scenario",
+            action="append",
+            dest="scenarios",
+            help="Only run scenarios whose name contains this string (repeatable).",
+        )
+        parser.add_argument(
+            "--warm-cache",
+            action="store_true",
+            help="Keep the cache between runs instead of measuring cold renders.",
+        )
+        parser.add_argument(
+            "--payloads",
+            action="store_true",
+            help="Also report API list payload sizes and encode cost per format.",
+        )
+        parser.add_argument("--output", help="Write machine-readable results here.")
+        parser.add_argument(
+            "--baseline", help="Compare against a previous results file."
+        )
+        parser.add_argument("--max-slowdown", type=float, default=1.25)
+        parser.add_argument("--max-extra-queries", type=int, default=0)
+        parser.add_argument(
+            "--keepdb",
+            action="store_true",
+            help="Reuse the benchmark database between invocations.",
+        )
+
+    def handle(self, *args, **options):
+        sizes = sorted(options["sizes"])
+        report = {
+            "meta": {
+                "started_at": timezone.now().isoformat(),
+                "python": platform.python_version(),
+                "database": connection.vendor,
+                "repeat": options["repeat"],
+                "seed": options["seed"],
+                "warm_cache": options["warm_cache"],
+            },
+            "results": {},
+            "payloads": {},
+        }
+
+        setup_test_environment()
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, keepdb=options["keepdb"]
+        )
+        try:
+            for size in sizes:
+                existing = Victim.objects.count()
+                if existing < size:
+                    self.stdout.write(f"Seeding {size - existing} victims...")
+                    synthetic.generate(
+                        size - existing,
+                        seed=options["seed"],
+                        start=existing,
+                        workers=options["workers"],
+                    )
+                    with connection.cursor() as cursor:
+                        cursor.execute("ANALYZE")
+                self.stdout.write(f"Running scenarios at {size} victims...")
+                results = run_scenarios(
+                    repeat=options["repeat"],
+                    only=options["scenarios"],
+                    warm_cache=options["warm_cache"],
+                )
+                report["results"][str(size)] = results
+                for name, result in results.items():
+                    self.stdout.write(
+                        f"  {name:<36} {result['median_ms']:>10.2f} ms "
+                        f"p95 {result['p95_ms']:>10.2f} ms "
+                        f"{result['queries']:>4} queries [{result['status']}]"
+                    )
+                if options["payloads"]:
+                    payloads = payload_report(repeat=options["repeat"])
+                    report["payloads"][str(size)] = payloads
+                    for name, row in payloads.items():
+                        cells = "  ".join(
+                            f"{coding} {cell['bytes']:>9}B {cell['encode_ms']:>7.2f}ms"
+                            for coding, cell in row.items()
+                        )
+                        self.stdout.write(f"  {name:<36} {cells}")
+        finally:
+            connection.creation.destroy_test_db(
+                old_name, verbosity=0, keepdb=options["keepdb"]
+            )
+            teardown_test_environment()
+
+        if options["output"]:
+            Path(options["output"]).write_text(json.dumps(report, indent=2))
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if options["baseline"]:
+            baseline = json.loads(Path(options["baseline"]).read_text())
+            regressions = compare(
+                report,
+                baseline,
+                max_slowdown=options["max_slowdown"],
+                max_extra_queries=options["max_extra_queries"],
+            )
+            if regressions:
+                for line in regressions:
+                    self.stderr.write(line)
+                raise CommandError(f"{len(regressions)} benchmark regression(s).")
+            self.stdout.write(self.style.SUCCESS("No regressions against baseline."))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from victims import related
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the related profiles of every victim. Edits refresh them "
+        "incrementally; run this after a bulk import or a change of weights."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        done = related.rebuild(options["batch_size"], log=self.stdout.write)
+        self.stdout.write(f"Computed related profiles for {done} victims.")
@@ -0,0 +1,32 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from victims import sitemaps
+
+
+class Command(BaseCommand):
+    help = (
+        "Write the profile sitemap chunks to SITEMAP_DIR ahead of crawlers. "
+        "Chunks whose profiles have not changed are left as they are."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--site-url",
+            default=settings.SITE_URL,
+            help="Origin for absolute URLs (defaults to SITE_URL).",
+        )
+
+    def handle(self, *args, **options):
+        site_url = options["site_url"].rstrip("/")
+        if not site_url:
+            raise CommandError("Set SITE_URL or pass --site-url.")
+        start = time.perf_counter()
+        chunks = [chunk for chunk, _, _ in sitemaps.chunks()]
+        written = sum(sitemaps.chunk_path(chunk, site_url)[1] for chunk in chunks)
+        self.stdout.write(
+            f"Wrote {written} of {len(chunks)} sitemap chunks "
+            f"in {time.perf_counter() - start:.1f}s"
+        )
@@ -0,0 +1,62 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from victims import query_plans
+from victims.models import Victim
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN the hot victim querysets against a seeded test database and "
+        "check their index usage, query counts and cost ceilings."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size", type=int, default=query_plans.SEED_SIZE)
+        parser.add_argument(
+            "--update",
+            action="store_true",
+            help=f"Record the current plan shapes in {query_plans.PLANS_PATH.name}.",
+        )
+        parser.add_argument(
+            "--keepdb",
+            action="store_true",
+            help="Reuse the seeded database between invocations.",
+        )
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, keepdb=options["keepdb"]
+        )
+        try:
+            if not Victim.objects.exists():
+                self.stdout.write(f"Seeding {options['size']} victims...")
+                query_plans.seed(options["size"])
+            results = query_plans.run_checks()
+        finally:
+            connection.creation.destroy_test_db(
+                old_name, verbosity=0, keepdb=options["keepdb"]
+            )
+            teardown_test_environment()
+
+        recorded = query_plans.recorded_shapes()
+        for name, (problems, shape) in results.items():
+            status = "; ".join(problems) or "ok"
+            self.stdout.write(f"  {name:<28} {status}")
+            changed = query_plans.diff(name, recorded.get(name, []), shape)
+            if changed and not options["update"]:
+                self.stdout.write(changed)
+
+        if options["update"]:
+            shapes = {name: shape for name, (_, shape) in results.items()}
+            query_plans.PLANS_PATH.write_text(json.dumps(shapes, indent=2) + "\n")
+            self.stdout.write(f"Plan shapes written to {query_plans.PLANS_PATH}")
+        failing = [name for name, (problems, _) in results.items() if problems]
+        if failing:
+            raise CommandError(f"{len(failing)} query plan check(s) failed.")
+        self.stdout.write(self.style.SUCCESS("All query plans as expected."))
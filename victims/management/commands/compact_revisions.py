@@ -0,0 +1,29 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from victims import revisions
+
+
+class Command(BaseCommand):
+    help = (
+        "Collapse revisions older than REVISION_RETENTION_DAYS into one snapshot "
+        "per object."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.REVISION_RETENTION_DAYS,
+            help="Keep the full history of this many days.",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - datetime.timedelta(days=options["days"])
+        removed = 0
+        while batch := revisions.compact(cutoff):
+            removed += batch
+        self.stdout.write(f"Removed {removed} revisions.")
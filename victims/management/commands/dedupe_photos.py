@@ -0,0 +1,105 @@
+import io
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+from PIL import Image, UnidentifiedImageError
+
+from victims.models import Photo
+from victims.storage import (
+    content_address,
+    find_near_duplicates,
+    perceptual_hash,
+    sha256,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Move existing photos to content-addressed names so identical files are "
+        "stored once, and flag near-duplicates for moderators."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report what would be merged without changing anything.",
+        )
+        parser.add_argument(
+            "--rehash",
+            action="store_true",
+            help="Also re-check photos that already have a content hash.",
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        storage = Photo._meta.get_field("image").storage
+        photos = Photo.objects.order_by("pk")
+        if not options["rehash"]:
+            photos = photos.filter(content_hash="")
+
+        moved, missing, reclaimed = {}, 0, 0
+        seen_hashes = set(
+            Photo.objects.exclude(content_hash="").values_list(
+                "content_hash", flat=True
+            )
+        )
+        for photo in photos.only("pk", "image").iterator(chunk_size=2000):
+            old_name = photo.image.name
+            if old_name not in moved:
+                try:
+                    with storage.open(old_name) as handle:
+                        data = handle.read()
+                    phash = perceptual_hash(Image.open(io.BytesIO(data)))
+                except (OSError, UnidentifiedImageError) as exc:
+                    # Missing, truncated or otherwise unreadable files are
+                    # left for a moderator.
+                    self.stderr.write(f"Skipped {old_name}: {exc}")
+                    missing += 1
+                    continue
+                digest = sha256(data)
+                extension = os.path.splitext(old_name)[1].lower()
+                new_name = content_address(digest, extension)
+                if digest in seen_hashes and old_name != new_name:
+                    reclaimed += len(data)
+                seen_hashes.add(digest)
+                if not dry_run:
+                    storage.save(new_name, ContentFile(data))
+                moved[old_name] = (new_name, digest, phash)
+            new_name, digest, phash = moved[old_name]
+            if not dry_run:
+                Photo.objects.filter(pk=photo.pk).update(
+                    image=new_name, content_hash=digest, perceptual_hash=phash
+                )
+
+        if not dry_run:
+            for old_name, (new_name, _, _) in moved.items():
+                if old_name != new_name:
+                    Photo.release_file(old_name)
+
+        matches = find_near_duplicates(
+            Photo.objects.filter(perceptual_hash__isnull=False).values_list(
+                "pk", "perceptual_hash"
+            ),
+            settings.PHOTO_NEAR_DUPLICATE_DISTANCE,
+        )
+        unflagged = Photo.objects.filter(
+            perceptual_hash__isnull=False, near_duplicate_of__isnull=True
+        ).values_list("pk", flat=True)
+        updates = [
+            Photo(pk=pk, near_duplicate_of_id=matches[pk])
+            for pk in unflagged
+            if pk in matches
+        ]
+        if not dry_run:
+            Photo.objects.bulk_update(updates, ["near_duplicate_of"], batch_size=2000)
+
+        prefix = "Would process" if dry_run else "Processed"
+        self.stdout.write(
+            f"{prefix} {len(moved)} files into "
+            f"{len({entry[1] for entry in moved.values()})} unique photos, "
+            f"reclaiming {reclaimed} bytes; {missing} missing or unreadable; "
+            f"{len(updates)} near-duplicates flagged."
+        )
@@ -0,0 +1,42 @@
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from victims import snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Export the public archive to a standalone SQLite file with full-text "
+        "search, for offline mirrors and SNAPSHOT_READ_ONLY mode."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", default=settings.SNAPSHOT_PATH)
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Update an existing snapshot with profiles changed since its export.",
+        )
+        parser.add_argument(
+            "--gzip",
+            action="store_true",
+            help="Also write a gzip-compressed copy for distribution.",
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options["output"])
+        start = time.perf_counter()
+        if options["incremental"] and path.exists():
+            result = snapshot.export_incremental(path)
+        else:
+            result = snapshot.export_full(path)
+        self.stdout.write(
+            f"{result['mode'].capitalize()} snapshot: {result['victims']} profiles "
+            f"written to {path} in {time.perf_counter() - start:.1f}s"
+        )
+        if options["gzip"]:
+            target = snapshot.compress(path)
+            self.stdout.write(f"Compressed copy: {target}")
@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from victims import changes, gazetteer, rollups
+from victims.models import Victim
+
+
+class Command(BaseCommand):
+    help = (
+        "Resolve every victim's place of death against the bundled gazetteer and "
+        "rebuild the map clusters. Run after editing victims/data/gazetteer.csv."
+    )
+
+    def handle(self, *args, **options):
+        places = (
+            Victim.objects.order_by()
+            .values_list("city_of_death", "province_or_state", "country")
+            .distinct()
+        )
+        located = unmatched = 0
+        now = timezone.now()
+        with transaction.atomic():
+            # Per distinct place rather than per victim. Only rows whose
+            # location moves are written; like a bulk edit, they get a new
+            # updated_at and cache_version and a change feed entry each.
+            for city, province, country in places:
+                location = gazetteer.resolve(city, province, country)
+                latitude, longitude, precision = location or (None, None, "")
+                ids = list(
+                    Victim.objects.filter(
+                        city_of_death=city, province_or_state=province, country=country
+                    )
+                    .exclude(
+                        latitude=latitude,
+                        longitude=longitude,
+                        location_precision=precision,
+                    )
+                    .values_list("pk", flat=True)
+                )
+                Victim.objects.filter(pk__in=ids).update(
+                    latitude=latitude,
+                    longitude=longitude,
+                    location_precision=precision,
+                    updated_at=now,
+                    cache_version=F("cache_version") + 1,
+                )
+                changes.record_many("victim", ids, changes.Action.UPDATED)
+                if location:
+                    located += len(ids)
+                else:
+                    unmatched += len(ids)
+        clusters = rollups.rebuild_map_clusters()
+        self.stdout.write(
+            f"Relocated {located} victims ({unmatched} now unmatched); "
+            f"built {clusters} map clusters."
+        )
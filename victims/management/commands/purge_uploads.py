@@ -0,0 +1,19 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from victims.uploads import purge_stale
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete upload sessions and partial files idle for UPLOAD_SESSION_TTL seconds."
+    )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - datetime.timedelta(
+            seconds=settings.UPLOAD_SESSION_TTL
+        )
+        self.stdout.write(f"Purged {purge_stale(cutoff)} upload sessions.")
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from victims import rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the timeline and geographic rollups behind /api/v1/stats/ and "
+        "the map clusters behind /api/v1/map/."
+    )
+
+    def handle(self, *args, **options):
+        rollups.refresh()
+        rollups.rebuild_map_clusters()
+        self.stdout.write("Refreshed stats rollups.")
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from victims import submission_queue
+
+
+class Command(BaseCommand):
+    help = (
+        "Save corrections that were queued to disk while the archive was in "
+        "read-only mode."
+    )
+
+    def handle(self, *args, **options):
+        saved, failed = submission_queue.replay()
+        for path, errors in failed.items():
+            self.stderr.write(f"Kept {path.name}: {errors}")
+        self.stdout.write(f"Replayed {saved} submissions, {len(failed)} kept.")
@@ -0,0 +1,100 @@
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from victims import jobs, tasks
+
+logger = logging.getLogger(__name__)
+
+# How often one of the threads looks for jobs orphaned by a dead worker.
+RECOVERY_INTERVAL = 60
+
+
+class Command(BaseCommand):
+    help = (
+        "Process queued background jobs (photo processing, search vectors). "
+        "Several workers, on one host or many, can run side by side."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=2,
+            help="Number of worker threads, each with its own connection.",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Seconds to sleep when the queue is empty.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Run every job that is due and exit.",
+        )
+
+    def handle(self, *args, **options):
+        name = f"{socket.gethostname()}:{os.getpid()}"
+        jobs.requeue_stale()
+        tasks.queue_snapshot_refresh()
+        tasks.queue_revision_compaction()
+        if options["once"]:
+            done = jobs.run_pending(worker=name)
+            self.stdout.write(f"Ran {done} jobs.")
+            return
+
+        stop = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            # Threads finish the job in hand before exiting.
+            signal.signal(signum, lambda *_: stop.set())
+        threads = [
+            threading.Thread(
+                target=self.work,
+                args=(f"{name}/{index}", stop, options["poll_interval"], index == 0),
+                daemon=True,
+            )
+            for index in range(max(1, options["concurrency"]))
+        ]
+        for thread in threads:
+            thread.start()
+        self.stdout.write(f"Worker {name} started with {len(threads)} threads.")
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(timeout=1)
+        self.stdout.write("Worker stopped.")
+
+    def work(self, name, stop, poll_interval, recovers):
+        last_recovery = time.monotonic()
+        try:
+            while not stop.is_set():
+                close_old_connections()
+                if recovers and time.monotonic() - last_recovery > RECOVERY_INTERVAL:
+                    requeued, dead = jobs.requeue_stale()
+                    if requeued or dead:
+                        logger.warning(
+                            "Recovered %s stale jobs (%s dead-lettered)",
+                            requeued + dead,
+                            dead,
+                        )
+                    last_recovery = time.monotonic()
+                try:
+                    claimed = jobs.claim(name)
+                except Exception:
+                    logger.exception("Could not claim a job")
+                    connection.close()
+                    stop.wait(poll_interval)
+                    continue
+                if not claimed:
+                    stop.wait(poll_interval)
+                    continue
+                jobs.execute(claimed[0])
+        finally:
+            connection.close()
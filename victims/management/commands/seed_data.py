@@ -1,12 +1,31 @@
+import time
+
 from django.core.management.base import BaseCommand
+from django.db.models import Max
 
+from victims import synthetic
 from victims.models import Source, Tag, Victim
 
 
 class Command(BaseCommand):
-    help = "Seed sample memorial data."
+    help = "Seed sample memorial data, or --count N synthetic profiles for load testing."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--count",
+            type=int,
+            default=0,
+            help="Generate this many synthetic victims instead of the sample profiles.",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--workers", type=int, default=1)
 
     def handle(self, *args, **options):
+        if options["count"]:
+            self.generate_synthetic(options)
+            return
+
         tag_names = ["student", "journalist", "worker"]
         tags = {name: Tag.objects.get_or_create(name=name, slug=name)[0] for name in tag_names}
 
@@ -53,3 +72,21 @@ class Command(BaseCommand):
                 self.stdout.write(self.style.SUCCESS(f"Created {victim.full_name}"))
 
         self.stdout.write(self.style.SUCCESS("Seed data complete."))
+
+    def generate_synthetic(self, options):
+        start = Victim.objects.aggregate(last=Max("pk"))["last"] or 0
+        began = time.monotonic()
+        created = synthetic.generate(
+            options["count"],
+            seed=options["seed"],
+            start=start,
+            batch_size=options["batch_size"],
+            workers=options["workers"],
+        )
+        elapsed = time.monotonic() - began
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Generated {created} synthetic victims in {elapsed:.1f}s "
+                f"({created / max(elapsed, 0.001):.0f}/s)."
+            )
+        )
@@ -0,0 +1,62 @@
+import os
+
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+REQUEST_LATENCY = Histogram(
+    "memorial_request_latency_seconds",
+    "Request latency by resolved URL name.",
+    ["url_name", "method"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUEST_COUNT = Counter(
+    "memorial_requests_total",
+    "Requests by resolved URL name and response status.",
+    ["url_name", "method", "status"],
+)
+DB_QUERIES = Histogram(
+    "memorial_db_queries_per_request",
+    "Database queries executed per request.",
+    ["url_name"],
+    buckets=QUERY_BUCKETS,
+)
+DB_QUERY_LATENCY = Histogram(
+    "memorial_db_query_seconds",
+    "Latency of individual database queries.",
+    ["url_name"],
+    buckets=LATENCY_BUCKETS,
+)
+PAGE_CACHE = Counter(
+    "memorial_page_cache_total",
+    "cache_page lookups by URL name and result (hit or miss).",
+    ["url_name", "result"],
+)
+RATELIMIT_REJECTIONS = Counter(
+    "memorial_ratelimit_rejections_total",
+    "Requests rejected by django-ratelimit.",
+    ["url_name"],
+)
+PHOTO_PROCESSING = Histogram(
+    "memorial_photo_processing_seconds",
+    "Time spent resizing and re-encoding uploaded photos.",
+    buckets=LATENCY_BUCKETS,
+)
+
+
+def render_latest() -> bytes:
+    # Under gunicorn each worker writes its samples to PROMETHEUS_MULTIPROC_DIR;
+    # aggregate them so a scrape reflects every process, not just this one.
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
@@ -0,0 +1,217 @@
+import gzip
+import re
+import time
+
+import brotli
+from django.conf import settings
+from django.db import InterfaceError, OperationalError, connection
+from django.utils.cache import patch_vary_headers
+from django.utils.dateparse import parse_datetime
+from django_ratelimit.exceptions import Ratelimited
+
+from . import health, metrics, profiling, revisions, snapshot_views
+
+
+def _url_name(request) -> str:
+    match = getattr(request, "resolver_match", None)
+    if match is None or not match.view_name:
+        return "unresolved"
+    return match.view_name
+
+
+class _QueryTimer:
+    def __init__(self):
+        self.durations = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.durations.append(time.perf_counter() - start)
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = _QueryTimer()
+        start = time.perf_counter()
+        with connection.execute_wrapper(timer):
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        url_name = _url_name(request)
+        if url_name == "metrics":
+            return response
+        metrics.REQUEST_LATENCY.labels(url_name, request.method).observe(elapsed)
+        metrics.REQUEST_COUNT.labels(
+            url_name, request.method, str(response.status_code)
+        ).inc()
+        metrics.DB_QUERIES.labels(url_name).observe(len(timer.durations))
+        for duration in timer.durations:
+            metrics.DB_QUERY_LATENCY.labels(url_name).observe(duration)
+
+        # CacheMiddleware (used by cache_page) flags GET/HEAD requests it answered
+        # from the cache with _cache_update_cache=False and misses with True.
+        update_cache = getattr(request, "_cache_update_cache", None)
+        if update_cache is not None and request.method in ("GET", "HEAD"):
+            result = "miss" if update_cache else "hit"
+            metrics.PAGE_CACHE.labels(url_name, result).inc()
+        return response
+
+    def process_exception(self, request, exception):
+        if isinstance(exception, Ratelimited):
+            metrics.RATELIMIT_REJECTIONS.labels(_url_name(request)).inc()
+        return None
+
+
+def _accepted_encodings(header):
+    accepted = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        match = re.search(r"q=([0-9.]+)", params)
+        try:
+            quality = float(match.group(1)) if match else 1.0
+        except ValueError:
+            quality = 0.0
+        if coding:
+            accepted[coding.strip().lower()] = quality
+    return accepted
+
+
+def negotiate_encoding(header):
+    accepted = _accepted_encodings(header or "")
+    wildcard = accepted.get("*", 0.0)
+    candidates = [
+        (accepted.get(coding, wildcard), preference, coding)
+        for preference, coding in enumerate(("gzip", "br"))
+    ]
+    quality, _, coding = max(candidates)
+    return coding if quality > 0 else None
+
+
+def compress(content, coding):
+    if coding == "br":
+        return brotli.compress(content, quality=settings.API_BROTLI_QUALITY)
+    return gzip.compress(content, compresslevel=settings.API_GZIP_LEVEL, mtime=0)
+
+
+# Only data renderers are compressed: the browsable API's HTML carries a CSRF
+# token next to reflected query input, which compression would expose to
+# BREACH.
+COMPRESSIBLE_TYPES = {"application/json", "application/msgpack"}
+
+
+class ApiCompressionMiddleware:
+    # Negotiates brotli or gzip for API responses. Small payloads such as
+    # name_suggest results are left alone; compressing them costs more CPU
+    # than it saves on the wire.
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not request.path.startswith(settings.API_COMPRESSION_PREFIX):
+            return response
+        patch_vary_headers(response, ("Accept-Encoding",))
+        content_type = response.get("Content-Type", "").split(";")[0].strip()
+        if (
+            content_type not in COMPRESSIBLE_TYPES
+            or response.streaming
+            or response.has_header("Content-Encoding")
+            or len(response.content) < settings.API_COMPRESSION_MIN_SIZE
+        ):
+            return response
+        coding = negotiate_encoding(request.META.get("HTTP_ACCEPT_ENCODING"))
+        if coding is None:
+            return response
+        compressed = compress(response.content, coding)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response["Content-Length"] = str(len(compressed))
+        response["Content-Encoding"] = coding
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+        return response
+
+
+class SnapshotReadOnlyMiddleware:
+    # With SNAPSHOT_READ_ONLY on, or while the database is unavailable (see
+    # health), public pages and the victim API are answered from the exported
+    # SQLite snapshot and corrections are queued to disk; anything else that
+    # needs PostgreSQL (admin, writes) gets a 503.
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        url_name = request.resolver_match.url_name
+        if url_name is None or url_name in snapshot_views.PASSTHROUGH:
+            return None
+        if settings.SNAPSHOT_READ_ONLY:
+            return self.serve(request, url_name, view_args, view_kwargs)
+        if self.can_fall_back() and not health.database_available():
+            return self.serve(request, url_name, view_args, view_kwargs)
+        return None
+
+    def process_exception(self, request, exception):
+        if not isinstance(exception, (OperationalError, InterfaceError)):
+            return None
+        if not self.can_fall_back():
+            return None
+        health.mark_unavailable()
+        match = request.resolver_match
+        return self.serve(request, match.url_name, match.args, match.kwargs)
+
+    def can_fall_back(self):
+        return settings.SNAPSHOT_FALLBACK and snapshot_views.available()
+
+    def serve(self, request, url_name, view_args, view_kwargs):
+        view = snapshot_views.VIEWS.get(url_name)
+        if view is None or (
+            request.method not in ("GET", "HEAD")
+            and url_name not in snapshot_views.WRITABLE
+        ):
+            return snapshot_views.unavailable(request)
+        # Read by base.html for the read-only banner.
+        request.read_only = True
+        exported_at = snapshot_views.exported_at()
+        request.read_only_since = exported_at and parse_datetime(exported_at)
+        return view(request, *view_args, **view_kwargs)
+
+
+class RevisionAuthorMiddleware:
+    # Credits revisions recorded during a request to the requesting user.
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = revisions.attribute_to(request)
+        try:
+            return self.get_response(request)
+        finally:
+            revisions.clear_attribution(token)
+
+
+class ProfilerMiddleware:
+    # Opt-in sampling profiler (see profiling): stack samples, the SQL
+    # timeline and template timings of the chosen requests are written to
+    # PROFILER_DIR, and the response names the capture in X-Profile-Id.
+    def __init__(self, get_response):
+        self.get_response = get_response
+        profiling.instrument_templates()
+
+    def __call__(self, request):
+        if not profiling.wanted(request):
+            return self.get_response(request)
+        with profiling.Profile(request) as profile, connection.execute_wrapper(profile):
+            response = self.get_response(request)
+        profile.save(_url_name(request), response.status_code)
+        response["X-Profile-Id"] = profile.id
+        return response
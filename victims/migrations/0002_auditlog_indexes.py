@@ -0,0 +1,28 @@
+# Generated by Django 5.1.15 on 2026-10-19 17:59
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("victims", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="auditlog",
+            index=models.Index(
+                fields=["-timestamp"], name="victims_aud_timesta_46496a_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="auditlog",
+            index=models.Index(
+                fields=["target_model", "target_id"],
+                name="victims_aud_target__79a8c1_idx",
+            ),
+        ),
+    ]
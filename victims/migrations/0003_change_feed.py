@@ -0,0 +1,45 @@
+# Generated by Django 5.1.15 on 2026-10-19 18:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("victims", "0002_auditlog_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChangeLogEntry",
+            fields=[
+                ("seq", models.BigAutoField(primary_key=True, serialize=False)),
+                ("model", models.CharField(max_length=40)),
+                ("object_id", models.BigIntegerField()),
+                (
+                    "action",
+                    models.CharField(
+                        choices=[
+                            ("created", "Created"),
+                            ("updated", "Updated"),
+                            ("deleted", "Deleted"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("data", models.JSONField(blank=True, default=dict)),
+                ("changed_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "ordering": ["seq"],
+            },
+        ),
+        migrations.AddIndex(
+            model_name="victim",
+            index=models.Index(
+                fields=["updated_at"], name="victims_vic_updated_9efac9_idx"
+            ),
+        ),
+    ]
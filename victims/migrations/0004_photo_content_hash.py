@@ -0,0 +1,57 @@
+# Generated by Django 5.1.15 on 2026-10-19 18:11
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+import victims.models
+import victims.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("victims", "0003_change_feed"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="photo",
+            name="content_hash",
+            field=models.CharField(
+                blank=True, db_index=True, editable=False, max_length=64
+            ),
+        ),
+        migrations.AddField(
+            model_name="photo",
+            name="near_duplicate_of",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                help_text="A visually similar photo already in the archive.",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="victims.photo",
+            ),
+        ),
+        migrations.AddField(
+            model_name="photo",
+            name="perceptual_hash",
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name="photo",
+            name="image",
+            field=models.ImageField(
+                storage=victims.storage.photo_storage,
+                upload_to=victims.storage.photo_upload_to,
+                validators=[
+                    django.core.validators.FileExtensionValidator(
+                        ["jpg", "jpeg", "png", "webp"]
+                    ),
+                    victims.models.validate_image_size,
+                ],
+            ),
+        ),
+    ]
@@ -0,0 +1,105 @@
+# Generated by Django 5.1.15 on 2026-10-19 18:15
+
+import uuid
+
+import django.core.validators
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+import victims.models
+import victims.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("victims", "0004_photo_content_hash"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="photo",
+            name="image",
+            field=models.ImageField(
+                storage=victims.storage.photo_storage,
+                upload_to=victims.storage.photo_upload_to,
+                validators=[
+                    django.core.validators.FileExtensionValidator(
+                        ["jpg", "jpeg", "png", "webp"]
+                    ),
+                    victims.models.validate_image_size,
+                    victims.models.validate_image_dimensions,
+                ],
+            ),
+        ),
+        migrations.CreateModel(
+            name="UploadSession",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("filename", models.CharField(max_length=255)),
+                ("size", models.PositiveBigIntegerField()),
+                ("received", models.PositiveBigIntegerField(default=0)),
+                ("caption", models.CharField(blank=True, max_length=255)),
+                ("photographer_credit", models.CharField(blank=True, max_length=255)),
+                ("order_index", models.PositiveSmallIntegerField(default=0)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("uploading", "Uploading"),
+                            ("complete", "Complete"),
+                            ("attached", "Attached"),
+                            ("rejected", "Rejected"),
+                        ],
+                        default="uploading",
+                        max_length=20,
+                    ),
+                ),
+                ("error", models.CharField(blank=True, max_length=255)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "photo",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="victims.photo",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "victim",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="victims.victim"
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["created_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["status", "updated_at"],
+                        name="victims_upl_status_d04d81_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+from django.db import migrations
+
+# Unique indexes are required by REFRESH MATERIALIZED VIEW CONCURRENTLY.
+CREATE = """
+CREATE MATERIALIZED VIEW victims_timeline_rollup AS
+    SELECT date_of_death AS day, verification_status, count(*) AS total
+    FROM victims_victim
+    WHERE date_of_death IS NOT NULL
+    GROUP BY date_of_death, verification_status;
+CREATE UNIQUE INDEX victims_timeline_rollup_key
+    ON victims_timeline_rollup (day, verification_status);
+
+CREATE MATERIALIZED VIEW victims_geo_rollup AS
+    SELECT country, province_or_state, city_of_death, verification_status,
+           count(*) AS total
+    FROM victims_victim
+    GROUP BY country, province_or_state, city_of_death, verification_status;
+CREATE UNIQUE INDEX victims_geo_rollup_key
+    ON victims_geo_rollup
+    (country, province_or_state, city_of_death, verification_status);
+"""
+
+DROP = """
+DROP MATERIALIZED VIEW IF EXISTS victims_geo_rollup;
+DROP MATERIALIZED VIEW IF EXISTS victims_timeline_rollup;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("victims", "0006_job_queue"),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE, DROP),
+    ]
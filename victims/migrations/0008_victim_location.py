@@ -0,0 +1,70 @@
+# Generated by Django 5.1.15 on 2026-10-19 18:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("victims", "0007_stats_rollups"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MapCluster",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("zoom", models.PositiveSmallIntegerField()),
+                ("cell_x", models.PositiveIntegerField()),
+                ("cell_y", models.PositiveIntegerField()),
+                ("latitude", models.FloatField()),
+                ("longitude", models.FloatField()),
+                ("count", models.PositiveIntegerField()),
+            ],
+            options={
+                "ordering": ["zoom", "cell_x", "cell_y"],
+            },
+        ),
+        migrations.AddField(
+            model_name="victim",
+            name="latitude",
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="victim",
+            name="location_precision",
+            field=models.CharField(
+                blank=True,
+                choices=[("city", "City"), ("province", "Province")],
+                editable=False,
+                max_length=10,
+            ),
+        ),
+        migrations.AddField(
+            model_name="victim",
+            name="longitude",
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="victim",
+            index=models.Index(
+                fields=["latitude", "longitude"], name="victims_vic_latitud_f1f365_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="mapcluster",
+            constraint=models.UniqueConstraint(
+                fields=("zoom", "cell_x", "cell_y"), name="map_cluster_cell"
+            ),
+        ),
+    ]
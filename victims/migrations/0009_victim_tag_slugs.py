@@ -0,0 +1,46 @@
+# Generated by Django 5.1.15 on 2026-10-19 18:32
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.conf import settings
+from django.db import migrations, models
+
+BACKFILL = """
+UPDATE victims_victim AS victim SET tag_slugs = linked.slugs
+FROM (
+    SELECT link.victim_id, array_agg(tag.slug ORDER BY tag.slug) AS slugs
+    FROM victims_victimtag AS link
+    JOIN victims_tag AS tag ON tag.id = link.tag_id
+    GROUP BY link.victim_id
+) AS linked
+WHERE linked.victim_id = victim.id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("victims", "0008_victim_location"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="victim",
+            name="tag_slugs",
+            field=django.contrib.postgres.fields.ArrayField(
+                base_field=models.CharField(max_length=90),
+                blank=True,
+                default=list,
+                editable=False,
+                size=None,
+            ),
+        ),
+        migrations.RunSQL(BACKFILL, migrations.RunSQL.noop),
+        migrations.AddIndex(
+            model_name="victim",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["tag_slugs"], name="victim_tag_slugs_gin"
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-19 18:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("victims", "0009_victim_tag_slugs"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="victim",
+            name="cache_version",
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.1.15 on 2026-10-19 18:58
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("victims", "0011_revision"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RelatedVictim",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("rank", models.PositiveSmallIntegerField()),
+                ("score", models.FloatField()),
+            ],
+            options={
+                "ordering": ["rank"],
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name="victim",
+            name="victims_vic_city_of_a55f63_idx",
+        ),
+        migrations.AddIndex(
+            model_name="victim",
+            index=models.Index(
+                fields=["city_of_death", "date_of_death"],
+                name="victims_vic_city_of_84450c_idx",
+            ),
+        ),
+        migrations.AddField(
+            model_name="relatedvictim",
+            name="related",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="victims.victim",
+            ),
+        ),
+        migrations.AddField(
+            model_name="relatedvictim",
+            name="victim",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="related_profiles",
+                to="victims.victim",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="relatedvictim",
+            constraint=models.UniqueConstraint(
+                fields=("victim", "rank"), name="related_victim_rank"
+            ),
+        ),
+    ]
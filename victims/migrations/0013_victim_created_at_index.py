@@ -0,0 +1,21 @@
+# Generated by Django 5.1.15 on 2026-10-19 19:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("victims", "0012_related_victims"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="victim",
+            index=models.Index(
+                fields=["created_at"], name="victims_vic_created_b26ddc_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.15 on 2026-10-19 19:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("victims", "0013_victim_created_at_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AuthCacheVersion",
+            fields=[
+                (
+                    "scope",
+                    models.CharField(max_length=40, primary_key=True, serialize=False),
+                ),
+                ("version", models.PositiveBigIntegerField(default=1)),
+            ],
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.15 on 2026-10-19 19:31
+
+from django.db import migrations, models
+
+import victims.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("victims", "0014_auth_cache_version"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="changelogentry",
+            name="xid",
+            field=models.BigIntegerField(
+                db_default=victims.models.CurrentTransactionId(), editable=False
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="changelogentry",
+            index=models.Index(
+                fields=["xid", "seq"], name="victims_cha_xid_a49b54_idx"
+            ),
+        ),
+    ]
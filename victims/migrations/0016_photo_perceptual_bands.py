@@ -0,0 +1,34 @@
+# Generated by Django 5.1.15 on 2026-10-19 19:36
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+import victims.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("victims", "0015_change_log_xid"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="photo",
+            name="perceptual_bands",
+            field=models.GeneratedField(
+                db_persist=True,
+                expression=victims.storage.PerceptualBands("perceptual_hash"),
+                output_field=django.contrib.postgres.fields.ArrayField(
+                    base_field=models.IntegerField(), size=None
+                ),
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="photo",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["perceptual_bands"], name="photo_perceptual_bands_gin"
+            ),
+        ),
+    ]
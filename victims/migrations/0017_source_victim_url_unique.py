@@ -0,0 +1,30 @@
+# Generated by Django 5.1.15 on 2026-10-19 19:39
+
+from django.db import migrations, models
+
+# Batch upserts already resolved a repeated (victim, url) to the newest
+# source; older copies are dropped so the constraint can be added.
+DEDUPLICATE = """
+DELETE FROM victims_source AS source
+USING victims_source AS newer
+WHERE newer.victim_id = source.victim_id
+    AND newer.url = source.url
+    AND newer.id > source.id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("victims", "0016_photo_perceptual_bands"),
+    ]
+
+    operations = [
+        migrations.RunSQL(DEDUPLICATE, migrations.RunSQL.noop),
+        migrations.AddConstraint(
+            model_name="source",
+            constraint=models.UniqueConstraint(
+                fields=("victim", "url"), name="source_victim_url_unique"
+            ),
+        ),
+    ]
@@ -1,15 +1,35 @@
 from __future__ import annotations
 
+import uuid
+
 from django.conf import settings
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.contrib.postgres.fields import ArrayField
 from django.contrib.postgres.indexes import GinIndex
 from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import FileExtensionValidator, MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import connection, models, transaction
+from django.db.models import F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from django.utils.text import slugify
 
 import bleach
-from PIL import Image
+
+from . import gazetteer
+from .storage import (
+    PERCEPTUAL_BANDS,
+    HammingDistance,
+    PerceptualBands,
+    check_image_header,
+    perceptual_bands,
+    photo_storage,
+    photo_upload_to,
+    sha256,
+)
 
 
 def sanitize_text(value: str) -> str:
@@ -22,12 +42,24 @@ def validate_image_size(image) -> None:
         raise ValidationError("Image file size must be under 5MB.")
 
 
+def validate_image_dimensions(image) -> None:
+    # Header-only check that rejects decompression bombs before decoding.
+    image.seek(0)
+    if check_image_header(image) is None:
+        raise ValidationError("File is not a readable image.")
+    image.seek(0)
+
+
 class Victim(models.Model):
     class VerificationStatus(models.TextChoices):
         UNVERIFIED = "unverified", "Unverified"
         PENDING = "pending", "Pending"
         VERIFIED = "verified", "Verified"
 
+    class LocationPrecision(models.TextChoices):
+        CITY = "city", "City"
+        PROVINCE = "province", "Province"
+
     full_name = models.CharField(max_length=255)
     slug = models.SlugField(max_length=255, unique=True, blank=True)
     native_name = models.CharField(max_length=255, blank=True)
@@ -60,6 +92,20 @@ class Victim(models.Model):
         validators=[MinValueValidator(1), MaxValueValidator(100)], default=50
     )
     search_vector = SearchVectorField(null=True, editable=False)
+    # Sorted copy of the victim's tag slugs, kept in sync from VictimTag writes
+    # by sync_tag_slugs() so multi-tag filters are a single GIN lookup.
+    tag_slugs = ArrayField(
+        models.CharField(max_length=90), default=list, blank=True, editable=False
+    )
+    # Part of the template fragment cache keys; bumped whenever the victim or
+    # one of its photos, sources or tags changes (see bump_cache_versions).
+    cache_version = models.PositiveIntegerField(default=1, editable=False)
+    # Resolved from the offline gazetteer whenever the victim is saved.
+    latitude = models.FloatField(null=True, blank=True, editable=False)
+    longitude = models.FloatField(null=True, blank=True, editable=False)
+    location_precision = models.CharField(
+        max_length=10, choices=LocationPrecision.choices, blank=True, editable=False
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     tags = models.ManyToManyField("Tag", through="VictimTag", related_name="victims")
@@ -68,10 +114,14 @@ class Victim(models.Model):
         ordering = ["full_name"]
         indexes = [
             models.Index(fields=["full_name"]),
-            models.Index(fields=["city_of_death"]),
+            models.Index(fields=["city_of_death", "date_of_death"]),
             models.Index(fields=["date_of_death"]),
             models.Index(fields=["verification_status"]),
+            models.Index(fields=["updated_at"]),
+            models.Index(fields=["created_at"]),
+            models.Index(fields=["latitude", "longitude"]),
             GinIndex(fields=["search_vector"], name="victim_search_vector_gin"),
+            GinIndex(fields=["tag_slugs"], name="victim_tag_slugs_gin"),
         ]
 
     def __str__(self) -> str:
@@ -85,7 +135,16 @@ class Victim(models.Model):
         self.verification_notes = sanitize_text(self.verification_notes)
         self.family_contact_private = sanitize_text(self.family_contact_private)
 
+    def locate(self) -> None:
+        location = gazetteer.resolve(
+            self.city_of_death, self.province_or_state, self.country
+        )
+        if location is None:
+            location = (None, None, "")
+        self.latitude, self.longitude, self.location_precision = location
+
     def save(self, *args, **kwargs) -> None:
+        self.locate()
         if not self.slug:
             base_slug = slugify(self.full_name) or "victim"
             slug = base_slug
@@ -94,45 +153,222 @@ class Victim(models.Model):
                 counter += 1
                 slug = f"{base_slug}-{counter}"
             self.slug = slug
+        bumped = not self._state.adding
+        if bumped:
+            # Incremented in the database, so a stale instance cannot reuse a
+            # version that a photo or tag change has already bumped to.
+            self.cache_version = F("cache_version") + 1
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {*kwargs["update_fields"], "cache_version"}
         super().save(*args, **kwargs)
-        Victim.objects.filter(pk=self.pk).update(
-            search_vector=SearchVector("full_name", "native_name", "biography", "short_summary")
-        )
+        if bumped:
+            self.refresh_from_db(fields=["cache_version"])
+        from .tasks import queue_search_vectors
+
+        queue_search_vectors([self.pk])
+
+
+def update_search_vectors(victim_ids) -> None:
+    Victim.objects.filter(pk__in=victim_ids).update(
+        search_vector=SearchVector("full_name", "native_name", "biography", "short_summary")
+    )
+
+
+def bump_cache_versions(victim_ids) -> None:
+    Victim.objects.filter(pk__in=victim_ids).update(
+        cache_version=F("cache_version") + 1
+    )
+
+
+def sync_tag_slugs(victim_ids) -> None:
+    # One UPDATE for any number of victims (which also bumps their
+    # cache_version); victim_ids may be a queryset.
+    slugs = (
+        VictimTag.objects.filter(victim=OuterRef("pk"))
+        .order_by()
+        .values("victim")
+        .annotate(slugs=ArrayAgg("tag__slug", ordering="tag__slug"))
+        .values("slugs")
+    )
+    Victim.objects.filter(pk__in=victim_ids).update(
+        tag_slugs=Coalesce(
+            Subquery(slugs),
+            Value([], output_field=Victim._meta.get_field("tag_slugs")),
+        ),
+        cache_version=F("cache_version") + 1,
+    )
+
+
+class RelatedVictim(models.Model):
+    # Top related profiles per victim, precomputed by victims.related; read in
+    # rank order through the (victim, rank) constraint's index.
+    victim = models.ForeignKey(
+        Victim,
+        related_name="related_profiles",
+        on_delete=models.CASCADE,
+        db_index=False,
+    )
+    related = models.ForeignKey(Victim, related_name="+", on_delete=models.CASCADE)
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ["rank"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["victim", "rank"], name="related_victim_rank"
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.victim_id} -> {self.related_id} (#{self.rank})"
 
 
 class Photo(models.Model):
     victim = models.ForeignKey(Victim, related_name="photos", on_delete=models.CASCADE)
     image = models.ImageField(
-        upload_to="victims/photos/%Y/%m/",
+        upload_to=photo_upload_to,
+        storage=photo_storage,
         validators=[
             FileExtensionValidator(["jpg", "jpeg", "png", "webp"]),
             validate_image_size,
+            validate_image_dimensions,
         ],
     )
     caption = models.CharField(max_length=255, blank=True)
     photographer_credit = models.CharField(max_length=255, blank=True)
     order_index = models.PositiveSmallIntegerField(default=0)
+    content_hash = models.CharField(
+        max_length=64, blank=True, db_index=True, editable=False
+    )
+    perceptual_hash = models.BigIntegerField(null=True, blank=True, editable=False)
+    perceptual_bands = models.GeneratedField(
+        expression=PerceptualBands("perceptual_hash"),
+        output_field=ArrayField(models.IntegerField()),
+        db_persist=True,
+    )
+    near_duplicate_of = models.ForeignKey(
+        "self",
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="+",
+        editable=False,
+        help_text="A visually similar photo already in the archive.",
+    )
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ["order_index", "created_at"]
+        indexes = [
+            GinIndex(fields=["perceptual_bands"], name="photo_perceptual_bands_gin"),
+        ]
 
     def __str__(self) -> str:
         return f"Photo for {self.victim.full_name}"
 
     def save(self, *args, **kwargs) -> None:
-        super().save(*args, **kwargs)
-        if not hasattr(self.image, "path"):
-            return
-        try:
-            img = Image.open(self.image.path)
-        except (FileNotFoundError, ValueError):
+        previous = None
+        uploaded = bool(self.image) and not self.image._committed
+        if uploaded:
+            # Stored as uploaded under the hash of its bytes; resizing, the
+            # perceptual hash and near-duplicate flagging happen in the
+            # "photos.process" job, outside the request.
+            self.image.file.seek(0)
+            data = self.image.file.read()
+            self.content_hash, self.perceptual_hash = sha256(data), None
+            self.near_duplicate_of = None
+            self.image = ContentFile(data, name=self.image.name)
+            if self.pk:
+                previous = (
+                    Photo.objects.filter(pk=self.pk)
+                    .values_list("image", flat=True)
+                    .first()
+                )
+        with transaction.atomic():
+            if uploaded:
+                lock_photo_file(photo_upload_to(self, self.image.name))
+            super().save(*args, **kwargs)
+        if uploaded:
+            from .tasks import queue_photo_processing
+
+            queue_photo_processing([self.pk])
+        if previous and previous != self.image.name:
+            Photo.release_file(previous)
+
+    def find_near_duplicate(self) -> Photo | None:
+        if self.perceptual_hash is None:
+            return None
+        candidates = Photo.objects.exclude(pk=self.pk).filter(
+            perceptual_hash__isnull=False
+        )
+        if settings.PHOTO_NEAR_DUPLICATE_DISTANCE < PERCEPTUAL_BANDS:
+            # Only photos sharing a band can be that close; the GIN index
+            # finds them without scanning every hash.
+            candidates = candidates.filter(
+                perceptual_bands__overlap=perceptual_bands(self.perceptual_hash)
+            )
+        return (
+            candidates.annotate(
+                distance=HammingDistance("perceptual_hash", self.perceptual_hash)
+            )
+            .filter(distance__lte=settings.PHOTO_NEAR_DUPLICATE_DISTANCE)
+            .order_by("distance", "pk")
+            .first()
+        )
+
+    @classmethod
+    def release_file(cls, name: str) -> None:
+        # Photos with identical bytes share one file; it is deleted only once
+        # no photo refers to it. The lock keeps a concurrent upload of the
+        # same bytes from being committed between the check and the delete.
+        if not name:
             return
-        max_width = 2000
-        if img.width > max_width:
-            ratio = max_width / img.width
-            img = img.resize((max_width, int(img.height * ratio)), Image.LANCZOS)
-            img.save(self.image.path, optimize=True, quality=85)
+        with transaction.atomic():
+            lock_photo_file(name)
+            if not cls.objects.filter(image=name).exists():
+                cls._meta.get_field("image").storage.delete(name)
+
+
+def lock_photo_file(name: str) -> None:
+    # Serializes writing and releasing one content-addressed file until the
+    # current transaction ends.
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", [name])
+
+
+class UploadSession(models.Model):
+    class Status(models.TextChoices):
+        UPLOADING = "uploading", "Uploading"
+        COMPLETE = "complete", "Complete"
+        ATTACHED = "attached", "Attached"
+        REJECTED = "rejected", "Rejected"
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    victim = models.ForeignKey(Victim, on_delete=models.CASCADE)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    received = models.PositiveBigIntegerField(default=0)
+    caption = models.CharField(max_length=255, blank=True)
+    photographer_credit = models.CharField(max_length=255, blank=True)
+    order_index = models.PositiveSmallIntegerField(default=0)
+    status = models.CharField(
+        max_length=20, choices=Status.choices, default=Status.UPLOADING
+    )
+    error = models.CharField(max_length=255, blank=True)
+    photo = models.ForeignKey(
+        Photo, null=True, blank=True, on_delete=models.SET_NULL, related_name="+"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["created_at"]
+        indexes = [models.Index(fields=["status", "updated_at"])]
+
+    def __str__(self) -> str:
+        return f"{self.filename} ({self.received}/{self.size})"
 
 
 class Source(models.Model):
@@ -148,6 +384,12 @@ class Source(models.Model):
 
     class Meta:
         ordering = ["-publication_date", "title"]
+        constraints = [
+            # The natural key batch upserts match on.
+            models.UniqueConstraint(
+                fields=["victim", "url"], name="source_victim_url_unique"
+            ),
+        ]
 
     def __str__(self) -> str:
         return f"{self.publisher_name}: {self.title}"
@@ -164,10 +406,27 @@ class Tag(models.Model):
         return self.name
 
 
+class VictimTagQuerySet(models.QuerySet):
+    # Bulk writes (including m2m add() and remove()) skip the per-row
+    # signals, so Victim.tag_slugs is resynced here in one statement.
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        sync_tag_slugs({obj.victim_id for obj in objs})
+        return objs
+
+    def delete(self):
+        victim_ids = set(self.values_list("victim_id", flat=True))
+        result = super().delete()
+        sync_tag_slugs(victim_ids)
+        return result
+
+
 class VictimTag(models.Model):
     victim = models.ForeignKey(Victim, on_delete=models.CASCADE)
     tag = models.ForeignKey(Tag, on_delete=models.CASCADE)
 
+    objects = VictimTagQuerySet.as_manager()
+
     class Meta:
         unique_together = ("victim", "tag")
 
@@ -217,6 +476,149 @@ class AuditLog(models.Model):
 
     class Meta:
         ordering = ["-timestamp"]
+        indexes = [
+            models.Index(fields=["-timestamp"]),
+            models.Index(fields=["target_model", "target_id"]),
+        ]
 
     def __str__(self) -> str:
         return f"{self.action} {self.target_model} ({self.target_id})"
+
+
+class CurrentTransactionId(models.Func):
+    template = "(pg_current_xact_id()::text::bigint)"
+    output_field = models.BigIntegerField()
+
+
+class ChangeLogEntry(models.Model):
+    class Action(models.TextChoices):
+        CREATED = "created", "Created"
+        UPDATED = "updated", "Updated"
+        DELETED = "deleted", "Deleted"
+
+    seq = models.BigAutoField(primary_key=True)
+    # Sequence numbers are taken at insert but become visible at commit, so
+    # the feed pages on (xid, seq) instead; see changes.committed_after().
+    xid = models.BigIntegerField(db_default=CurrentTransactionId(), editable=False)
+    model = models.CharField(max_length=40)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=10, choices=Action.choices)
+    data = models.JSONField(default=dict, blank=True)
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["seq"]
+        indexes = [models.Index(fields=["xid", "seq"])]
+
+    def __str__(self) -> str:
+        return f"#{self.seq} {self.action} {self.model} ({self.object_id})"
+
+
+class Revision(models.Model):
+    class Kind(models.TextChoices):
+        SNAPSHOT = "snapshot", "Snapshot"
+        DELTA = "delta", "Delta"
+        DELETED = "deleted", "Deleted"
+
+    # An object's state at a revision is its latest snapshot (or deletion) up
+    # to that revision with the later deltas applied; see victims.revisions.
+    model = models.CharField(max_length=40)
+    object_id = models.BigIntegerField()
+    kind = models.CharField(max_length=10, choices=Kind.choices)
+    # Every field for a snapshot, only the changed fields for a delta.
+    data = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="+",
+    )
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["model", "object_id", "pk"]
+        indexes = [
+            models.Index(fields=["model", "object_id", "id"]),
+            models.Index(fields=["created_at"]),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.kind} {self.model} ({self.object_id}) #{self.pk}"
+
+
+class Job(models.Model):
+    class Status(models.TextChoices):
+        QUEUED = "queued", "Queued"
+        RUNNING = "running", "Running"
+        DEAD = "dead", "Dead"
+
+    # Finished jobs are deleted, so the table only holds pending work and the
+    # dead-letter queue.
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    priority = models.SmallIntegerField(default=0)
+    status = models.CharField(
+        max_length=10, choices=Status.choices, default=Status.QUEUED
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    unique_key = models.CharField(max_length=200, blank=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-priority", "run_at", "pk"]
+        indexes = [
+            models.Index(
+                fields=["-priority", "run_at"],
+                condition=models.Q(status="queued"),
+                name="job_ready_idx",
+            ),
+            models.Index(fields=["status", "locked_at"]),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["unique_key"],
+                condition=models.Q(status="queued") & ~models.Q(unique_key=""),
+                name="job_unique_queued_key",
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.name} #{self.pk} ({self.status})"
+
+
+class MapCluster(models.Model):
+    # Victims grouped into a grid of screen-sized cells for each zoom level of
+    # the web map; rebuilt by rollups.rebuild_map_clusters().
+    zoom = models.PositiveSmallIntegerField()
+    cell_x = models.PositiveIntegerField()
+    cell_y = models.PositiveIntegerField()
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    count = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ["zoom", "cell_x", "cell_y"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["zoom", "cell_x", "cell_y"], name="map_cluster_cell"
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.count} at {self.latitude}, {self.longitude} (zoom {self.zoom})"
+
+
+class AuthCacheVersion(models.Model):
+    # Versions the cached permissions and group names of every process: "*"
+    # for all users, "user:<pk>" for one (see permissions).
+    scope = models.CharField(max_length=40, primary_key=True)
+    version = models.PositiveBigIntegerField(default=1)
+
+    def __str__(self) -> str:
+        return f"{self.scope} v{self.version}"
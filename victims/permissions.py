@@ -0,0 +1,86 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import connection
+
+from .models import AuthCacheVersion
+
+MODERATOR_GROUP = "Moderator"
+ALL_USERS = "*"
+
+
+def _scope(user_pk):
+    return f"user:{user_pk}"
+
+
+def _version(user):
+    # The cache is per process, so invalidation bumps versions in the database
+    # instead of deleting keys; each request reads them once, in one query.
+    if not hasattr(user, "_auth_cache_version"):
+        versions = dict(
+            AuthCacheVersion.objects.filter(
+                scope__in=[ALL_USERS, _scope(user.pk)]
+            ).values_list("scope", "version")
+        )
+        user._auth_cache_version = (
+            f"{versions.get(ALL_USERS, 0)}.{versions.get(_scope(user.pk), 0)}"
+        )
+    return user._auth_cache_version
+
+
+def _key(user, kind):
+    return f"auth-cache:{_version(user)}:{user.pk}:{kind}"
+
+
+def group_names(user):
+    # Cached on the user object for the rest of the request, and in the
+    # cache for PERMISSION_CACHE_TTL seconds across requests.
+    if not user.is_authenticated:
+        return frozenset()
+    if not hasattr(user, "_group_names_cache"):
+        key = _key(user, "groups")
+        names = cache.get(key)
+        if names is None:
+            names = frozenset(user.groups.values_list("name", flat=True))
+            cache.set(key, names, settings.PERMISSION_CACHE_TTL)
+        user._group_names_cache = names
+    return user._group_names_cache
+
+
+def is_moderator(user):
+    return MODERATOR_GROUP in group_names(user)
+
+
+def _bump(scope):
+    table = AuthCacheVersion._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (scope, version) VALUES (%s, 1) "
+            f"ON CONFLICT (scope) DO UPDATE SET version = {table}.version + 1",
+            [scope],
+        )
+
+
+def invalidate_user(user_pk):
+    _bump(_scope(user_pk))
+
+
+def invalidate_all():
+    _bump(ALL_USERS)
+
+
+class CachedModelBackend(ModelBackend):
+    # ModelBackend already memoizes permissions on the user object per request;
+    # this also shares them across requests, which covers admin permission
+    # checks and DRF's DjangoModelPermissions alike.
+    def get_all_permissions(self, user_obj, obj=None):
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return super().get_all_permissions(user_obj, obj)
+        if not hasattr(user_obj, "_perm_cache"):
+            key = _key(user_obj, "perms")
+            perms = cache.get(key)
+            if perms is None:
+                perms = super().get_all_permissions(user_obj)
+                cache.set(key, perms, settings.PERMISSION_CACHE_TTL)
+            user_obj._perm_cache = perms
+        return user_obj._perm_cache
@@ -0,0 +1,198 @@
+import contextvars
+import functools
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.template.base import Template
+from django.utils import timezone
+
+# Staff send "X-Profile: 1" to have a single request profiled.
+HEADER = "HTTP_X_PROFILE"
+SQL_MAX_LENGTH = 500
+
+_active = contextvars.ContextVar("profile", default=None)
+
+
+def wanted(request):
+    # Staff can ask for a profile; otherwise PROFILER_SAMPLE_RATE of requests
+    # are picked at random.
+    if request.META.get(HEADER) and request.user.is_staff:
+        return True
+    rate = settings.PROFILER_SAMPLE_RATE
+    return rate > 0 and random.random() < rate
+
+
+def _frame_label(code):
+    filename = code.co_filename
+    base = str(settings.BASE_DIR) + "/"
+    if "site-packages/" in filename:
+        filename = filename.rsplit("site-packages/", 1)[1]
+    elif filename.startswith(base):
+        filename = filename[len(base) :]
+    # ";" separates frames in the folded format.
+    return f"{filename}:{code.co_name}".replace(";", ":")
+
+
+class Sampler:
+    # Samples the stack of one thread every PROFILER_INTERVAL seconds from a
+    # helper thread, counting identical stacks.
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if labels:
+                self.stacks[";".join(reversed(labels))] += 1
+
+    def folded(self):
+        # One "root;...;leaf count" line per stack, as read by flamegraph.pl,
+        # speedscope and inferno.
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.items())
+
+
+class Profile:
+    def __init__(self, request):
+        self.id = f"{timezone.now():%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:8]}"
+        self.request = request
+        self.queries = []
+        self.templates = []
+        self.sampler = Sampler(threading.get_ident(), settings.PROFILER_INTERVAL)
+
+    def timing(self, start):
+        # (ms since the request started, ms since start) for a timeline entry.
+        end = time.perf_counter()
+        return round((start - self.start) * 1000, 3), round((end - start) * 1000, 3)
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook: the SQL timeline.
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            offset, duration = self.timing(start)
+            self.queries.append(
+                {
+                    "start_ms": offset,
+                    "duration_ms": duration,
+                    "sql": sql[:SQL_MAX_LENGTH],
+                }
+            )
+
+    def __enter__(self):
+        self.token = _active.set(self)
+        self.start = time.perf_counter()
+        self.sampler.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.sampler.stop()
+        _, self.duration_ms = self.timing(self.start)
+        _active.reset(self.token)
+
+    def save(self, view_name, status):
+        directory = Path(settings.PROFILER_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        (directory / f"{self.id}.folded").write_text(self.sampler.folded())
+        meta = {
+            "id": self.id,
+            "view": view_name,
+            "method": self.request.method,
+            "path": self.request.get_full_path()[:SQL_MAX_LENGTH],
+            "status": status,
+            "captured_at": timezone.now().isoformat(),
+            "duration_ms": self.duration_ms,
+            "samples": sum(self.sampler.stacks.values()),
+            "sql_ms": round(sum(query["duration_ms"] for query in self.queries), 3),
+            "queries": self.queries,
+            "templates": self.templates,
+        }
+        (directory / f"{self.id}.json").write_text(json.dumps(meta))
+        rotate(directory)
+
+
+def _timed_render(render):
+    @functools.wraps(render)
+    def wrapper(self, context):
+        profile = _active.get()
+        if profile is None:
+            return render(self, context)
+        start = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            offset, duration = profile.timing(start)
+            profile.templates.append(
+                {
+                    "name": self.name or "<string>",
+                    "start_ms": offset,
+                    "duration_ms": duration,
+                }
+            )
+
+    wrapper.profiled = True
+    return wrapper
+
+
+def instrument_templates():
+    # Template.render covers each page and its {% include %}s; outside a
+    # profiled request the wrapper only reads a context variable.
+    if not getattr(Template.render, "profiled", False):
+        Template.render = _timed_render(Template.render)
+
+
+def rotate(directory):
+    # Keeps the newest PROFILER_MAX_FILES captures; ids sort by time.
+    captures = sorted(directory.glob("*.json"), reverse=True)
+    for path in captures[settings.PROFILER_MAX_FILES :]:
+        path.unlink(missing_ok=True)
+        path.with_suffix(".folded").unlink(missing_ok=True)
+
+
+def captures():
+    directory = Path(settings.PROFILER_DIR)
+    found = []
+    for path in directory.glob("*.json"):
+        try:
+            found.append(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            # Rotated away or still being written.
+            continue
+    return found
+
+
+def slowest_by_view(limit):
+    # {view name: its `limit` slowest captures}, slowest views first.
+    by_view = {}
+    for capture in sorted(captures(), key=lambda c: c["duration_ms"], reverse=True):
+        slowest = by_view.setdefault(capture["view"], [])
+        if len(slowest) < limit:
+            slowest.append(capture)
+    return by_view
+
+
+def capture_path(capture_id, suffix):
+    path = Path(settings.PROFILER_DIR) / f"{capture_id}{suffix}"
+    return path if path.is_file() else None
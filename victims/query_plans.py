@@ -0,0 +1,298 @@
+import difflib
+import json
+from dataclasses import dataclass
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIRequestFactory
+
+from . import synthetic
+from .api import VictimViewSet
+from .filters import filter_tags, tag_counts, tag_counts_sql
+from .models import RelatedVictim, Tag, Victim
+
+# Plans are checked against synthetic.generate(SEED_SIZE) after ANALYZE; the
+# cost ceilings below are calibrated for that size.
+SEED_SIZE = 5000
+PLANS_PATH = Path(__file__).resolve().parent / "data" / "query_plans.json"
+
+
+@dataclass
+class HotQuery:
+    name: str
+    queryset: object
+    # (table, leading columns) pairs, from on(), that the plan must read
+    # through an index.
+    indexes: tuple = ()
+    # Tables that may be read with a sequential scan.
+    seq_scans: tuple = ()
+    max_cost: float = 100.0
+    # Queries run to evaluate the queryset, prefetches included.
+    queries: int = 1
+
+
+@dataclass
+class RawQuery:
+    # Stands in for a queryset when the hot query is raw SQL.
+    sql: str
+    params: tuple
+
+
+def seed(size=SEED_SIZE):
+    synthetic.generate(size)
+    # Plans only need RelatedVictim filled to scale; related.rebuild() would
+    # take minutes, so each victim links to the next few by primary key.
+    ids = list(Victim.objects.order_by("pk").values_list("pk", flat=True))
+    RelatedVictim.objects.bulk_create(
+        RelatedVictim(
+            victim_id=victim_id,
+            related_id=ids[(position + rank + 1) % len(ids)],
+            rank=rank,
+            score=1.0,
+        )
+        for position, victim_id in enumerate(ids)
+        for rank in range(settings.RELATED_PROFILES_COUNT)
+    )
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+
+
+def on(model, *fields):
+    columns = tuple(model._meta.get_field(name).column for name in fields)
+    return model._meta.db_table, columns
+
+
+def catalog(tables):
+    # {index name: (table, columns)} as the database has them, so checks
+    # survive index renames and accept any index with the right leading
+    # columns.
+    indexes = {}
+    with connection.cursor() as cursor:
+        for table in tables:
+            constraints = connection.introspection.get_constraints(cursor, table)
+            for name, info in constraints.items():
+                if info["index"] or info["unique"] or info["primary_key"]:
+                    indexes[name] = (table, tuple(info["columns"]))
+    return indexes
+
+
+def _api_list(params):
+    view = VictimViewSet(
+        action_map={"get": "list"}, format_kwarg=None, args=(), kwargs={}
+    )
+    view.request = view.initialize_request(
+        APIRequestFactory().get(reverse("victim-list"), params)
+    )
+    queryset = view.filter_queryset(view.get_queryset())
+    return queryset[: settings.REST_FRAMEWORK["PAGE_SIZE"]]
+
+
+def hot_queries():
+    # Mirrors the querysets behind victim_list, victim_detail, home and the
+    # victims API, filled in from the current data like benchmark scenarios.
+    victim = Victim.objects.order_by("pk").only("slug", "full_name").first()
+    # The least used tag, where an index scan should beat reading the table.
+    counts = tag_counts(Victim.objects.all())
+    tag = min(Tag.objects.order_by("pk"), key=lambda tag: counts.get(tag.slug, 0))
+    name = victim.full_name.split()[0]
+    search = SearchQuery(name)
+    by_name = on(Victim, "full_name")
+    by_date = on(Victim, "date_of_death")
+    by_created = on(Victim, "created_at")
+    by_tags = on(Victim, "tag_slugs")
+    page = slice(0, 12)
+    return [
+        HotQuery(
+            "victim_list",
+            Victim.objects.order_by("-created_at")[page],
+            indexes=(by_created,),
+        ),
+        HotQuery(
+            "victim_list.page",
+            Victim.objects.order_by("-created_at").prefetch_related("tags", "photos")[
+                page
+            ],
+            indexes=(by_created,),
+            queries=3,
+        ),
+        HotQuery(
+            "victim_list.sort_alpha",
+            Victim.objects.order_by("full_name")[page],
+            indexes=(by_name,),
+        ),
+        HotQuery(
+            "victim_list.sort_date",
+            Victim.objects.order_by("-date_of_death")[page],
+            indexes=(by_date,),
+        ),
+        HotQuery(
+            "victim_list.search",
+            Victim.objects.filter(search_vector=search)
+            .annotate(rank=SearchRank(F("search_vector"), search))
+            .order_by("-rank")
+            .values_list("pk", flat=True),
+            indexes=(on(Victim, "search_vector"),),
+            max_cost=2000.0,
+        ),
+        HotQuery(
+            "victim_list.tag_filter",
+            filter_tags(Victim.objects.all(), [tag.slug]).order_by().values("pk"),
+            indexes=(by_tags,),
+            max_cost=1000.0,
+        ),
+        HotQuery(
+            # The tag picker of an unfiltered list reads every victim; the
+            # ceiling keeps it to one pass over the table.
+            "victim_list.tag_counts",
+            RawQuery(*tag_counts_sql(Victim.objects.all())),
+            seq_scans=("victims_victim",),
+            max_cost=2500.0,
+        ),
+        HotQuery(
+            "victim_list.tag_counts.tag_filter",
+            RawQuery(*tag_counts_sql(filter_tags(Victim.objects.all(), [tag.slug]))),
+            indexes=(by_tags,),
+            max_cost=1000.0,
+        ),
+        HotQuery(
+            "victim_detail",
+            # get_object_or_404 drops the default ordering.
+            Victim.objects.filter(slug=victim.slug).order_by(),
+            indexes=(on(Victim, "slug"),),
+            max_cost=20.0,
+        ),
+        HotQuery(
+            "victim_detail.related",
+            RelatedVictim.objects.filter(victim=victim).select_related("related"),
+            indexes=(on(RelatedVictim, "victim", "rank"), on(Victim, "id")),
+            max_cost=150.0,
+        ),
+        HotQuery(
+            "home.recent",
+            Victim.objects.prefetch_related("photos").order_by("-created_at")[:6],
+            indexes=(by_created,),
+            queries=2,
+        ),
+        HotQuery("api.victim_list", _api_list({}), indexes=(by_name,), queries=2),
+        HotQuery(
+            "api.victim_list.fields",
+            _api_list({"fields": "id,slug,full_name", "ordering": "-date_of_death"}),
+            indexes=(by_date,),
+        ),
+        HotQuery(
+            "api.victim_list.tag",
+            _api_list({"tag": tag.slug, "tag_mode": "any", "fields": "id,slug"}),
+            indexes=(by_tags,),
+            max_cost=1000.0,
+        ),
+    ]
+
+
+def explain(queryset):
+    if isinstance(queryset, RawQuery):
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {queryset.sql}", queryset.params)
+            return cursor.fetchone()[0][0]["Plan"]
+    return json.loads(queryset.explain(format="json"))[0]["Plan"]
+
+
+def nodes(plan):
+    yield plan
+    for child in plan.get("Plans", ()):
+        yield from nodes(child)
+
+
+def shape(plan, depth=0):
+    # One line per node, without costs or row estimates, so it only changes
+    # when the strategy does.
+    line = "  " * depth + plan["Node Type"]
+    if "Index Name" in plan:
+        line += f" using {plan['Index Name']}"
+    if "Relation Name" in plan:
+        line += f" on {plan['Relation Name']}"
+    lines = [line]
+    for child in plan.get("Plans", ()):
+        lines.extend(shape(child, depth + 1))
+    return lines
+
+
+def count_queries(queryset):
+    with CaptureQueriesContext(connection) as captured:
+        if isinstance(queryset, RawQuery):
+            with connection.cursor() as cursor:
+                cursor.execute(queryset.sql, queryset.params)
+        else:
+            list(queryset._chain())
+    return len(captured.captured_queries)
+
+
+def check(query, plan, queries, indexes):
+    # Problems with one hot query, given its plan, evaluated query count and
+    # catalog() of the tables it reads.
+    problems = []
+    used = [
+        indexes.get(node["Index Name"], (None, ()))
+        for node in nodes(plan)
+        if "Index Name" in node
+    ]
+    for table, columns in query.indexes:
+        if not any(
+            used_table == table and used_columns[: len(columns)] == columns
+            for used_table, used_columns in used
+        ):
+            problems.append(f"no index scan on {table}({', '.join(columns)})")
+    for node in nodes(plan):
+        if node["Node Type"] == "Seq Scan" and (
+            node["Relation Name"] not in query.seq_scans
+        ):
+            problems.append(f"sequential scan on {node['Relation Name']}")
+    if plan["Total Cost"] > query.max_cost:
+        problems.append(f"cost {plan['Total Cost']:.1f} over {query.max_cost:.1f}")
+    if queries != query.queries:
+        problems.append(f"{queries} queries, expected {query.queries}")
+    return problems
+
+
+def recorded_shapes():
+    if not PLANS_PATH.exists():
+        return {}
+    return json.loads(PLANS_PATH.read_text())
+
+
+def diff(name, recorded, current):
+    return "\n".join(
+        difflib.unified_diff(
+            recorded, current, f"{name} (recorded)", f"{name} (current)", lineterm=""
+        )
+    )
+
+
+def run_checks():
+    # {name: (problems, shape)} for every hot query.
+    queries = hot_queries()
+    indexes = catalog({table for query in queries for table, _ in query.indexes})
+    results = {}
+    for query in queries:
+        plan = explain(query.queryset)
+        results[query.name] = (
+            check(query, plan, count_queries(query.queryset), indexes),
+            shape(plan),
+        )
+    return results
+
+
+def report(results, recorded):
+    # Failure text: the problems of each failing query and how its plan
+    # moved from the recorded one.
+    lines = []
+    for name, (problems, current) in results.items():
+        if not problems:
+            continue
+        lines.append(f"{name}: {'; '.join(problems)}")
+        lines.append(diff(name, recorded.get(name, []), current) or "\n".join(current))
+    return "\n".join(lines)
@@ -0,0 +1,168 @@
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import RelatedVictim, Victim
+
+# Related profiles are precomputed into RelatedVictim by the "victims.related"
+# job. Candidates come from bounded, index-ordered scans: victims of the same
+# city closest in date (city/date index), victims who died within
+# RELATED_DATE_WINDOW days (date index) and victims sharing a tag (tag GIN
+# index). Candidates are then scored on all signals, including lexeme overlap
+# of the search vectors, and the best RELATED_PROFILES_COUNT are kept.
+WEIGHTS = {"city": 3.0, "date": 2.0, "tags": 3.0, "text": 4.0}
+
+# The candidate scans for target t. Sharing a city, a date window or a tag
+# works both ways, so t's own candidates are also the lists it may belong in.
+_CANDIDATES = """
+        (SELECT id FROM victims_victim
+         WHERE city_of_death = t.city_of_death AND id <> t.id
+           AND date_of_death >= coalesce(t.date_of_death, '-infinity')
+         ORDER BY date_of_death LIMIT %(half)s)
+        UNION
+        (SELECT id FROM victims_victim
+         WHERE city_of_death = t.city_of_death AND date_of_death < t.date_of_death
+         ORDER BY date_of_death DESC LIMIT %(half)s)
+        UNION
+        (SELECT id FROM victims_victim
+         WHERE date_of_death >= t.date_of_death
+           AND date_of_death <= t.date_of_death + %(window)s AND id <> t.id
+         ORDER BY date_of_death LIMIT %(half)s)
+        UNION
+        (SELECT id FROM victims_victim
+         WHERE date_of_death < t.date_of_death
+           AND date_of_death >= t.date_of_death - %(window)s
+         ORDER BY date_of_death DESC LIMIT %(half)s)
+        UNION
+        (SELECT id FROM victims_victim
+         WHERE tag_slugs && t.tag_slugs AND id <> t.id LIMIT %(candidates)s)
+"""
+
+_SQL = (
+    """
+SELECT t.id, best.id, best.score
+FROM victims_victim t
+CROSS JOIN LATERAL (
+    SELECT coalesce(tsvector_to_array(t.search_vector), '{}') AS lexemes
+) target
+CROSS JOIN LATERAL (
+    SELECT c.id,
+        CASE WHEN c.city_of_death = t.city_of_death THEN %(city)s ELSE 0 END
+        + %(date)s * greatest(
+            0, 1 - abs(c.date_of_death - t.date_of_death)::float / (%(window)s + 1)
+        )
+        + %(tags)s * coalesce(
+            cardinality(ARRAY(
+                SELECT unnest(c.tag_slugs) INTERSECT SELECT unnest(t.tag_slugs)
+            ))::float / nullif(cardinality(t.tag_slugs), 0),
+            0
+        )
+        + %(text)s * coalesce(shared.n / nullif(
+            cardinality(target.lexemes) + cardinality(candidate.lexemes) - shared.n,
+            0
+        ), 0) AS score
+    FROM ("""
+    + _CANDIDATES
+    + """) AS candidates
+    JOIN victims_victim c ON c.id = candidates.id
+    CROSS JOIN LATERAL (
+        SELECT coalesce(tsvector_to_array(c.search_vector), '{}') AS lexemes
+    ) candidate
+    CROSS JOIN LATERAL (
+        SELECT count(*)::float AS n
+        FROM unnest(candidate.lexemes) AS lexeme
+        WHERE lexeme = ANY(target.lexemes)
+    ) shared
+    ORDER BY score DESC, c.id
+    LIMIT %(count)s
+) best
+WHERE t.id = ANY(%(ids)s)
+ORDER BY t.id, best.score DESC, best.id
+"""
+)
+
+
+_NEIGHBOURS_SQL = (
+    """
+SELECT DISTINCT candidates.id
+FROM victims_victim t
+CROSS JOIN LATERAL ("""
+    + _CANDIDATES
+    + """) AS candidates
+WHERE t.id = ANY(%(ids)s)
+"""
+)
+
+
+def _params(victim_ids):
+    return {
+        **WEIGHTS,
+        "ids": list(victim_ids),
+        "window": settings.RELATED_DATE_WINDOW,
+        "candidates": settings.RELATED_CANDIDATES,
+        "half": settings.RELATED_CANDIDATES // 2,
+        "count": settings.RELATED_PROFILES_COUNT,
+    }
+
+
+def neighbours(victim_ids):
+    # Victims the candidate scans pair with any of victim_ids.
+    with connection.cursor() as cursor:
+        cursor.execute(_NEIGHBOURS_SQL, _params(victim_ids))
+        return {row[0] for row in cursor.fetchall()}
+
+
+def compute(victim_ids):
+    # {victim id: [(related id, score), ...]} best first, in one query.
+    params = _params(victim_ids)
+    results = {victim_id: [] for victim_id in params["ids"]}
+    with connection.cursor() as cursor:
+        cursor.execute(_SQL, params)
+        for victim_id, related_id, score in cursor.fetchall():
+            results[victim_id].append((related_id, score))
+    return results
+
+
+def store(results):
+    with transaction.atomic():
+        RelatedVictim.objects.filter(victim_id__in=list(results)).delete()
+        RelatedVictim.objects.bulk_create(
+            RelatedVictim(
+                victim_id=victim_id, related_id=related_id, rank=rank, score=score
+            )
+            for victim_id, related in results.items()
+            for rank, (related_id, score) in enumerate(related)
+        )
+
+
+def refresh(victim_ids):
+    # A changed profile can also move out of the lists that already show it,
+    # or into the lists of its own candidates, so those are recomputed along
+    # with it.
+    changed = set(victim_ids)
+    victim_ids = changed | neighbours(changed)
+    victim_ids |= set(
+        RelatedVictim.objects.filter(related_id__in=changed).values_list(
+            "victim_id", flat=True
+        )
+    )
+    existing = Victim.objects.filter(pk__in=victim_ids).values_list("pk", flat=True)
+    store(compute(existing))
+
+
+def rebuild(batch_size=500, log=None):
+    # Every profile, in primary key order and batches of batch_size.
+    done, last, start = 0, 0, time.monotonic()
+    while True:
+        ids = list(
+            Victim.objects.filter(pk__gt=last)
+            .order_by("pk")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not ids:
+            return done
+        store(compute(ids))
+        done, last = done + len(ids), ids[-1]
+        if log:
+            log(f"{done} profiles in {time.monotonic() - start:.1f}s")
@@ -0,0 +1,27 @@
+import datetime
+import decimal
+import uuid
+
+import msgpack
+from django.utils.functional import Promise
+from rest_framework.renderers import BaseRenderer
+
+
+def _encode(value):
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (decimal.Decimal, uuid.UUID, Promise)):
+        return str(value)
+    raise TypeError(f"Cannot serialize {type(value).__name__} to MessagePack")
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return msgpack.packb(data, default=_encode, use_bin_type=True)
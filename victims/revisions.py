@@ -0,0 +1,192 @@
+import contextvars
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Count, Max, OuterRef, Q, Subquery
+from django.db.models.fields.files import FieldFile
+
+from .models import Photo, Revision, Source, Victim
+
+# History of the editable fields of victims, photos and sources. Each object
+# gets a full snapshot on its first revision and then every
+# REVISION_SNAPSHOT_EVERY revisions; the revisions in between only hold the
+# fields that changed. Rebuilding any past state therefore reads at most one
+# snapshot and a bounded run of deltas, in one query.
+Kind = Revision.Kind
+BASE_KINDS = (Kind.SNAPSHOT, Kind.DELETED)
+
+TRACKED_MODELS = {Victim: "victim", Photo: "photo", Source: "source"}
+
+_request = contextvars.ContextVar("revision_request", default=None)
+
+
+def attribute_to(request):
+    # Revisions recorded while handling `request` are credited to its user,
+    # read when the revision is written so DRF authentication is seen too.
+    return _request.set(request)
+
+
+def clear_attribution(token):
+    _request.reset(token)
+
+
+def _author_id():
+    request = _request.get()
+    user = getattr(request, "user", None)
+    return user.pk if user is not None and user.is_authenticated else None
+
+
+def tracked_fields(model):
+    return [
+        field
+        for field in model._meta.concrete_fields
+        if field.editable and not field.primary_key
+    ]
+
+
+def serialize(instance):
+    data = {}
+    for field in tracked_fields(type(instance)):
+        value = field.value_from_object(instance)
+        if isinstance(value, FieldFile):
+            value = value.name or ""
+        data[field.name] = value
+    # Round-tripped so dates compare equal to the strings read back.
+    return json.loads(json.dumps(data, cls=DjangoJSONEncoder))
+
+
+def _chains(model_name, object_ids, revisions=None):
+    # {object id: [revisions from the latest snapshot or deletion on]}, for
+    # all objects in one query over the (model, object_id, id) index.
+    revisions = revisions if revisions is not None else Revision.objects.all()
+    revisions = revisions.filter(model=model_name, object_id__in=object_ids)
+    base = (
+        revisions.filter(object_id=OuterRef("object_id"), kind__in=BASE_KINDS)
+        .order_by("-pk")
+        .values("pk")[:1]
+    )
+    chains = {}
+    for revision in revisions.filter(pk__gte=Subquery(base)).order_by("pk"):
+        chains.setdefault(revision.object_id, []).append(revision)
+    return chains
+
+
+def fold(chain):
+    state = None
+    for revision in chain:
+        if revision.kind == Kind.SNAPSHOT:
+            state = dict(revision.data)
+        elif revision.kind == Kind.DELETED:
+            state = None
+        else:
+            state.update(revision.data)
+    return state
+
+
+def record(instances, created=()):
+    # One read and one insert per model, however many instances; objects
+    # whose tracked fields did not change get no revision. Objects in
+    # `created` are new, so they start with a snapshot and nothing is read.
+    user_id = _author_id()
+    new = [
+        Revision(
+            model=TRACKED_MODELS[type(obj)],
+            object_id=obj.pk,
+            kind=Kind.SNAPSHOT,
+            data=serialize(obj),
+            user_id=user_id,
+        )
+        for obj in created
+    ]
+    by_model = {}
+    for instance in instances:
+        by_model.setdefault(TRACKED_MODELS[type(instance)], []).append(instance)
+    for model_name, objects in by_model.items():
+        chains = _chains(model_name, [obj.pk for obj in objects])
+        for obj in objects:
+            data = serialize(obj)
+            chain = chains.get(obj.pk, [])
+            previous = fold(chain)
+            if previous is None or len(chain) >= settings.REVISION_SNAPSHOT_EVERY:
+                kind = Kind.SNAPSHOT
+            else:
+                kind = Kind.DELTA
+                data = {
+                    name: value
+                    for name, value in data.items()
+                    if name not in previous or previous[name] != value
+                }
+                if not data:
+                    continue
+            new.append(
+                Revision(
+                    model=model_name,
+                    object_id=obj.pk,
+                    kind=kind,
+                    data=data,
+                    user_id=user_id,
+                )
+            )
+    Revision.objects.bulk_create(new)
+    return new
+
+
+def record_deleted(model_name, object_ids):
+    user_id = _author_id()
+    Revision.objects.bulk_create(
+        Revision(model=model_name, object_id=pk, kind=Kind.DELETED, user_id=user_id)
+        for pk in object_ids
+    )
+
+
+def state_at(model_name, object_id, revision_id=None, at=None):
+    # (state, revision) as of a revision id or a point in time; the state is
+    # None before the first revision and after a deletion.
+    revisions = Revision.objects.all()
+    if revision_id is not None:
+        revisions = revisions.filter(pk__lte=revision_id)
+    if at is not None:
+        revisions = revisions.filter(created_at__lte=at)
+    chain = _chains(model_name, [object_id], revisions).get(object_id, [])
+    return fold(chain), chain[-1] if chain else None
+
+
+def diff(old, new):
+    old, new = old or {}, new or {}
+    return {
+        name: {"from": old.get(name), "to": new.get(name)}
+        for name in sorted(old.keys() | new.keys())
+        if old.get(name) != new.get(name)
+    }
+
+
+def compact(cutoff, limit=1000):
+    # Retention: the revisions of an object older than `cutoff` collapse into
+    # one snapshot of its state at the cutoff, or disappear if it had been
+    # deleted by then. Returns the number of revisions removed.
+    stale = (
+        Revision.objects.filter(created_at__lt=cutoff)
+        .values("model", "object_id")
+        .annotate(
+            count=Count("pk"),
+            deleted=Count("pk", filter=Q(kind=Kind.DELETED)),
+            last=Max("pk"),
+        )
+        .filter(Q(count__gt=1) | Q(deleted__gt=0))
+        .order_by()[:limit]
+    )
+    removed = 0
+    for group in stale:
+        with transaction.atomic():
+            state, last = state_at(group["model"], group["object_id"], group["last"])
+            older = Revision.objects.filter(
+                model=group["model"], object_id=group["object_id"], pk__lte=last.pk
+            )
+            if state is None:
+                removed += older.delete()[0]
+                continue
+            Revision.objects.filter(pk=last.pk).update(kind=Kind.SNAPSHOT, data=state)
+            removed += older.exclude(pk=last.pk).delete()[0]
+    return removed
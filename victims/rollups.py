@@ -0,0 +1,139 @@
+import math
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count
+
+from .models import MapCluster, Victim
+
+# Materialized views created in migration 0007. Weeks, months, provinces and
+# countries are summed from the per-day and per-city rows at query time.
+TIMELINE_VIEW = "victims_timeline_rollup"
+GEO_VIEW = "victims_geo_rollup"
+INTERVALS = ("day", "week", "month")
+GEO_LEVELS = {
+    "country": ["country"],
+    "province": ["country", "province_or_state"],
+    "city": ["country", "province_or_state", "city_of_death"],
+}
+STATUSES = Victim.VerificationStatus.values
+
+
+def refresh():
+    # CONCURRENTLY keeps the views readable while they are rebuilt.
+    with connection.cursor() as cursor:
+        for view in (TIMELINE_VIEW, GEO_VIEW):
+            cursor.execute(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {view}")
+
+
+def _where(conditions):
+    # [(sql, value), ...] -> WHERE clause for the conditions with a value.
+    used = [(sql, value) for sql, value in conditions if value]
+    if not used:
+        return "", []
+    return " WHERE " + " AND ".join(sql for sql, _ in used), [v for _, v in used]
+
+
+def _pivot(rows, key_columns):
+    # (key..., status, total) rows -> one dict per key with a count per status.
+    results = {}
+    for *key, status, total in rows:
+        entry = results.get(tuple(key))
+        if entry is None:
+            entry = dict(zip(key_columns, key))
+            entry.update({name: 0 for name in STATUSES}, total=0)
+            results[tuple(key)] = entry
+        entry[status] = total
+        entry["total"] += total
+    return list(results.values())
+
+
+def timeline(interval, start=None, end=None):
+    where, params = _where([("day >= %s", start), ("day <= %s", end)])
+    sql = (
+        "SELECT date_trunc(%s, day)::date, verification_status, sum(total)::int "
+        f"FROM {TIMELINE_VIEW}{where} "
+        "GROUP BY 1, 2 ORDER BY 1, 2"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [interval, *params])
+        return _pivot(cursor.fetchall(), ["period"])
+
+
+def geo(level, country=None, province=None):
+    columns = GEO_LEVELS[level]
+    where, params = _where(
+        [("country = %s", country), ("province_or_state = %s", province)]
+    )
+    column_list = ", ".join(columns)
+    sql = (
+        f"SELECT {column_list}, verification_status, sum(total)::int "
+        f"FROM {GEO_VIEW}{where} "
+        f"GROUP BY {column_list}, verification_status "
+        f"ORDER BY {column_list}, verification_status"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return _pivot(cursor.fetchall(), columns)
+
+
+def _project(latitude, longitude):
+    # Web Mercator, scaled to [0, 1) on both axes.
+    latitude = max(-85.0511, min(85.0511, latitude))
+    sin_lat = math.sin(math.radians(latitude))
+    x = (longitude + 180) / 360
+    y = 0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+    return x, y
+
+
+def rebuild_map_clusters():
+    # Victims only have gazetteer coordinates, so there are a few hundred
+    # distinct points at most; each zoom level merges the ones that fall in
+    # the same MAP_CLUSTER_CELL-pixel cell.
+    points = (
+        Victim.objects.filter(latitude__isnull=False)
+        .order_by()
+        .values_list("latitude", "longitude")
+        .annotate(total=Count("pk"))
+    )
+    points = [(lat, lon, total, *_project(lat, lon)) for lat, lon, total in points]
+    clusters = []
+    for zoom in range(settings.MAP_MAX_ZOOM + 1):
+        scale = 2**zoom * 256 / settings.MAP_CLUSTER_CELL
+        cells = {}
+        for lat, lon, total, x, y in points:
+            cell = cells.setdefault((int(x * scale), int(y * scale)), [0, 0.0, 0.0])
+            cell[0] += total
+            cell[1] += lat * total
+            cell[2] += lon * total
+        clusters.extend(
+            MapCluster(
+                zoom=zoom,
+                cell_x=cell_x,
+                cell_y=cell_y,
+                latitude=round(lat_sum / count, 5),
+                longitude=round(lon_sum / count, 5),
+                count=count,
+            )
+            for (cell_x, cell_y), (count, lat_sum, lon_sum) in cells.items()
+        )
+    with transaction.atomic():
+        MapCluster.objects.all().delete()
+        MapCluster.objects.bulk_create(clusters, batch_size=2000)
+    return len(clusters)
+
+
+def map_clusters(zoom, bbox=None):
+    clusters = MapCluster.objects.filter(zoom=min(zoom, settings.MAP_MAX_ZOOM))
+    if bbox:
+        west, south, east, north = bbox
+        clusters = clusters.filter(latitude__range=(south, north))
+        if west <= east:
+            clusters = clusters.filter(longitude__range=(west, east))
+        else:
+            # The box crosses the antimeridian.
+            clusters = clusters.exclude(longitude__gt=east, longitude__lt=west)
+    return [
+        [lat, lon, count]
+        for lat, lon, count in clusters.values_list("latitude", "longitude", "count")
+    ]
@@ -0,0 +1,70 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import caches
+
+from . import changes
+
+
+def normalize(query):
+    return " ".join((query or "").casefold().split())
+
+
+def change_version():
+    # The newest committed change log cursor: any write to a victim, photo,
+    # source, tag or tag link moves it once it commits, which retires every
+    # cached result at once. A bare Max("seq") could be taken by a write that
+    # is still in flight, leaving results computed before it commits cached
+    # under the key they would have after.
+    return changes.format_cursor(*changes.committed_mark())
+
+
+def ranked_ids(queryset):
+    # (ranked ids, total) for a search, or (None, total) past
+    # SEARCH_CACHE_MAX_IDS: those are paged in the database instead, so no
+    # more than the limit is ever loaded.
+    ids = list(
+        queryset.values_list("pk", flat=True)[: settings.SEARCH_CACHE_MAX_IDS + 1]
+    )
+    if len(ids) <= settings.SEARCH_CACHE_MAX_IDS:
+        return ids, len(ids)
+    return None, queryset.count()
+
+
+def cache_key(filters, version, prefix="search"):
+    filters = {
+        name: value for name, value in filters.items() if value not in ("", None, [])
+    }
+    filters["q"] = normalize(filters.get("q"))
+    digest = hashlib.sha256(
+        json.dumps(filters, sort_keys=True, default=str).encode()
+    ).hexdigest()
+    return f"{prefix}:{version}:{digest}"
+
+
+def cached_results(filters, compute):
+    # Returns ((ranked victim ids, total), {tag slug: count}) for a search,
+    # as ranked_ids() and tag_counts() give them, running compute() only on a
+    # miss. The cache itself evicts least recently used entries.
+    cache = caches["search"]
+    key = cache_key(filters, change_version())
+    results = cache.get(key)
+    if results is None:
+        results = compute()
+        cache.set(key, results, settings.SEARCH_CACHE_SECONDS)
+    return results
+
+
+def cached_tag_counts(filters, compute):
+    # {tag slug: count} for the tag picker of an unsearched list, running
+    # compute() only on a miss. Counts do not depend on the sort order, so
+    # every page and sort of one filter set shares an entry until a write.
+    filters = {name: value for name, value in filters.items() if name != "sort"}
+    cache = caches["search"]
+    key = cache_key(filters, change_version(), prefix="tag-counts")
+    counts = cache.get(key)
+    if counts is None:
+        counts = compute()
+        cache.set(key, counts, settings.SEARCH_CACHE_SECONDS)
+    return counts
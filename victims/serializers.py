@@ -1,15 +1,33 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
 from rest_framework import serializers
 
-from .models import Photo, Source, Tag, Victim
+from .models import Photo, RelatedVictim, Source, Tag, UploadSession, Victim
+from .storage import validate_new_upload
 
 
-class TagSerializer(serializers.ModelSerializer):
+class SparseFieldsetMixin:
+    # Nested relations that are only serialized when asked for via ?expand=.
+    expandable_fields = {}
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        expand = [name for name in expand or () if name in self.expandable_fields]
+        for name in expand:
+            if name not in self.fields:
+                serializer_class, options = self.expandable_fields[name]
+                self.fields[name] = serializer_class(**options)
+        if fields:
+            for name in set(self.fields) - set(fields) - set(expand):
+                self.fields.pop(name)
+
+
+class TagSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Tag
         fields = ["id", "name", "slug"]
 
 
-class PhotoSerializer(serializers.ModelSerializer):
+class PhotoSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Photo
         fields = [
@@ -24,7 +42,7 @@ class PhotoSerializer(serializers.ModelSerializer):
         read_only_fields = ["created_at"]
 
 
-class SourceSerializer(serializers.ModelSerializer):
+class SourceSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Source
         fields = [
@@ -39,9 +57,33 @@ class SourceSerializer(serializers.ModelSerializer):
         ]
 
 
-class VictimListSerializer(serializers.ModelSerializer):
+class RelatedVictimSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source="related_id")
+    full_name = serializers.CharField(source="related.full_name")
+    slug = serializers.CharField(source="related.slug")
+    city_of_death = serializers.CharField(source="related.city_of_death")
+    date_of_death = serializers.DateField(source="related.date_of_death")
+
+    class Meta:
+        model = RelatedVictim
+        fields = ["id", "full_name", "slug", "city_of_death", "date_of_death", "score"]
+
+
+RELATED_EXPANSION = (
+    RelatedVictimSerializer,
+    {"source": "related_profiles", "many": True, "read_only": True},
+)
+
+
+class VictimListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     tags = TagSerializer(many=True, read_only=True)
 
+    expandable_fields = {
+        "photos": (PhotoSerializer, {"many": True, "read_only": True}),
+        "sources": (SourceSerializer, {"many": True, "read_only": True}),
+        "related": RELATED_EXPANSION,
+    }
+
     class Meta:
         model = Victim
         fields = [
@@ -61,11 +103,13 @@ class VictimListSerializer(serializers.ModelSerializer):
         ]
 
 
-class VictimDetailSerializer(serializers.ModelSerializer):
+class VictimDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     tags = TagSerializer(many=True, read_only=True)
     photos = PhotoSerializer(many=True, read_only=True)
     sources = SourceSerializer(many=True, read_only=True)
 
+    expandable_fields = {"related": RELATED_EXPANSION}
+
     class Meta:
         model = Victim
         fields = [
@@ -80,6 +124,9 @@ class VictimDetailSerializer(serializers.ModelSerializer):
             "city_of_death",
             "province_or_state",
             "country",
+            "latitude",
+            "longitude",
+            "location_precision",
             "biography",
             "short_summary",
             "occupation",
@@ -97,4 +144,37 @@ class VictimDetailSerializer(serializers.ModelSerializer):
             "photos",
             "sources",
         ]
-        read_only_fields = ["created_at", "updated_at"]
+        read_only_fields = [
+            "latitude",
+            "longitude",
+            "location_precision",
+            "created_at",
+            "updated_at",
+        ]
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UploadSession
+        fields = [
+            "id",
+            "victim",
+            "filename",
+            "size",
+            "received",
+            "caption",
+            "photographer_credit",
+            "order_index",
+            "status",
+            "error",
+            "photo",
+            "created_at",
+        ]
+        read_only_fields = ["received", "status", "error", "photo", "created_at"]
+
+    def validate(self, attrs):
+        try:
+            validate_new_upload(attrs["filename"], attrs["size"])
+        except DjangoValidationError as exc:
+            raise serializers.ValidationError(exc.messages)
+        return attrs
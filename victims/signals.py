@@ -0,0 +1,164 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import changes, permissions, revisions, tasks
+from .models import (
+    Photo,
+    RelatedVictim,
+    Source,
+    Tag,
+    Victim,
+    VictimTag,
+    bump_cache_versions,
+    sync_tag_slugs,
+)
+
+User = get_user_model()
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def user_memberships_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith("post_"):
+        return
+    if not reverse:
+        permissions.invalidate_user(instance.pk)
+    else:
+        # Changed from the Group/Permission side: every member may be affected.
+        permissions.invalidate_all()
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, **kwargs):
+    permissions.invalidate_user(instance.pk)
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, **kwargs):
+    permissions.invalidate_all()
+
+
+def _tracked_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    action = changes.Action.CREATED if created else changes.Action.UPDATED
+    changes.record(changes.TRACKED_MODELS[sender], instance.pk, action)
+
+
+def _tracked_deleted(sender, instance, **kwargs):
+    changes.record(changes.TRACKED_MODELS[sender], instance.pk, changes.Action.DELETED)
+
+
+for _model in changes.TRACKED_MODELS:
+    post_save.connect(_tracked_saved, sender=_model, dispatch_uid=f"changes-{_model}")
+    post_delete.connect(
+        _tracked_deleted, sender=_model, dispatch_uid=f"changes-del-{_model}"
+    )
+
+
+@receiver(post_save, sender=VictimTag)
+def victim_tag_saved(sender, instance, created, raw=False, **kwargs):
+    sync_tag_slugs([instance.victim_id])
+    tasks.queue_related_profiles([instance.victim_id])
+    if created and not raw:
+        changes.record_tag_links(
+            [(instance.victim_id, instance.tag_id)], changes.Action.CREATED
+        )
+
+
+@receiver(post_delete, sender=VictimTag)
+def victim_tag_deleted(sender, instance, origin=None, **kwargs):
+    changes.record_tag_links(
+        [(instance.victim_id, instance.tag_id)], changes.Action.DELETED
+    )
+    tasks.queue_related_profiles([instance.victim_id])
+    # Queryset deletes resync in bulk (VictimTagQuerySet.delete), as do tag
+    # deletions (tag_deleted); a deleted victim needs nothing.
+    if isinstance(origin, VictimTag):
+        sync_tag_slugs([instance.victim_id])
+
+
+@receiver(m2m_changed, sender=Victim.tags.through)
+def victim_tags_added(sender, instance, action, reverse, pk_set, **kwargs):
+    # add() bulk-inserts VictimTag rows without their save signals; remove()
+    # and clear() delete through the ORM, so victim_tag_deleted covers them.
+    if action != "post_add":
+        return
+    if reverse:
+        pairs = [(victim_id, instance.pk) for victim_id in pk_set]
+    else:
+        pairs = [(instance.pk, tag_id) for tag_id in pk_set]
+    changes.record_tag_links(pairs, changes.Action.CREATED)
+    tasks.queue_related_profiles({victim_id for victim_id, _ in pairs})
+
+
+@receiver(post_save, sender=Tag)
+def tag_saved(sender, instance, created, raw=False, **kwargs):
+    # The slug may have been renamed.
+    if not created:
+        sync_tag_slugs(VictimTag.objects.filter(tag=instance).values("victim_id"))
+
+
+@receiver(post_delete, sender=Tag)
+def tag_deleted(sender, instance, **kwargs):
+    sync_tag_slugs(
+        Victim.objects.filter(tag_slugs__contains=[instance.slug]).values("pk")
+    )
+
+
+@receiver(post_save, sender=Victim)
+@receiver(post_delete, sender=Victim)
+def victim_changed(sender, raw=False, **kwargs):
+    if not raw:
+        tasks.queue_stats_refresh()
+
+
+@receiver(pre_delete, sender=Victim)
+def victim_deleting(sender, instance, **kwargs):
+    # Lists showing the victim lose it by cascade; refill them.
+    tasks.queue_related_profiles(
+        RelatedVictim.objects.filter(related=instance).values_list(
+            "victim_id", flat=True
+        )
+    )
+
+
+@receiver(post_save, sender=Photo)
+@receiver(post_delete, sender=Photo)
+@receiver(post_save, sender=Source)
+@receiver(post_delete, sender=Source)
+def victim_relation_changed(sender, instance, raw=False, **kwargs):
+    # Tag links bump the version through sync_tag_slugs.
+    if not raw:
+        bump_cache_versions([instance.victim_id])
+
+
+def _revised(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        revisions.record([], created=[instance])
+    else:
+        revisions.record([instance])
+
+
+def _revised_deleted(sender, instance, **kwargs):
+    revisions.record_deleted(revisions.TRACKED_MODELS[sender], [instance.pk])
+
+
+for _model in revisions.TRACKED_MODELS:
+    post_save.connect(_revised, sender=_model, dispatch_uid=f"revisions-{_model}")
+    post_delete.connect(
+        _revised_deleted, sender=_model, dispatch_uid=f"revisions-del-{_model}"
+    )
+
+
+@receiver(post_delete, sender=Photo)
+def photo_deleted(sender, instance, **kwargs):
+    name = instance.image.name
+    transaction.on_commit(lambda: Photo.release_file(name))
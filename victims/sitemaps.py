@@ -0,0 +1,133 @@
+import hashlib
+import os
+import uuid
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.db.models import Count, F, Max
+from django.urls import reverse
+
+from .models import Victim
+
+# Profiles are listed in chunks of SITEMAP_CHUNK_SIZE consecutive ids, so a
+# chunk's contents only change when one of its own victims does. Chunks are
+# written to SITEMAP_DIR under a name that includes a fingerprint of their
+# rows and rewritten only when that fingerprint changes.
+BATCH_SIZE = 5000
+XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8"?>\n'
+NAMESPACE = "http://www.sitemaps.org/schemas/sitemap/0.9"
+
+
+def site_url(request=None):
+    if settings.SITE_URL:
+        return settings.SITE_URL.rstrip("/")
+    return f"{request.scheme}://{request.get_host()}"
+
+
+def chunk_bounds(chunk):
+    size = settings.SITEMAP_CHUNK_SIZE
+    return chunk * size + 1, (chunk + 1) * size
+
+
+def chunks():
+    # [(chunk, number of profiles, latest updated_at)] in one grouped scan.
+    rows = (
+        Victim.objects.order_by()
+        .annotate(chunk=(F("id") - 1) / settings.SITEMAP_CHUNK_SIZE)
+        .values("chunk")
+        .annotate(count=Count("pk"), lastmod=Max("updated_at"))
+        .order_by("chunk")
+    )
+    return [(row["chunk"], row["count"], row["lastmod"]) for row in rows]
+
+
+def chunk_state(chunk):
+    low, high = chunk_bounds(chunk)
+    state = Victim.objects.filter(pk__range=(low, high)).aggregate(
+        count=Count("pk"), lastmod=Max("updated_at")
+    )
+    return state["count"], state["lastmod"]
+
+
+def fingerprint(chunk, count, lastmod, base_url):
+    # Deletions change the count, edits the latest updated_at.
+    key = f"{chunk}:{count}:{lastmod.isoformat() if lastmod else ''}:{base_url}"
+    return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+
+def _urls(chunk, base_url):
+    # Keyset pagination over the id range: constant memory and no OFFSET.
+    low, high = chunk_bounds(chunk)
+    loc = escape(base_url + reverse("victim_detail", args=["slug"]))
+    last = low - 1
+    while True:
+        batch = list(
+            Victim.objects.filter(pk__gt=last, pk__lte=high)
+            .order_by("pk")
+            .values_list("pk", "slug", "updated_at")[:BATCH_SIZE]
+        )
+        if not batch:
+            return
+        for _, slug, updated_at in batch:
+            # Slugs are URL-safe, so they can be substituted into the path.
+            yield (
+                f"<url><loc>{loc.replace('/slug/', f'/{slug}/')}</loc>"
+                f"<lastmod>{updated_at.date().isoformat()}</lastmod></url>\n"
+            )
+        last = batch[-1][0]
+
+
+def document(chunk, base_url):
+    # The chunk's <urlset>, piece by piece.
+    yield f'{XML_DECLARATION}<urlset xmlns="{NAMESPACE}">\n'
+    yield from _urls(chunk, base_url)
+    yield "</urlset>\n"
+
+
+def chunk_path(chunk, base_url):
+    # Returns (file with the chunk's current contents, whether it had to be
+    # written); older versions are removed. The path is None for an empty
+    # chunk.
+    count, lastmod = chunk_state(chunk)
+    if not count:
+        return None, False
+    directory = Path(settings.SITEMAP_DIR)
+    name = f"victims-{chunk}-{fingerprint(chunk, count, lastmod, base_url)}.xml"
+    path = directory / name
+    if path.exists():
+        return path, False
+    directory.mkdir(parents=True, exist_ok=True)
+    tmp_path = directory / f".{name}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as handle:
+        handle.writelines(document(chunk, base_url))
+    os.replace(tmp_path, path)
+    for old in directory.glob(f"victims-{chunk}-*.xml"):
+        if old != path:
+            old.unlink(missing_ok=True)
+    return path, True
+
+
+def open_chunk(chunk, base_url):
+    # chunk_path() opened for reading, or None for an empty chunk.
+    path, _ = chunk_path(chunk, base_url)
+    if path is None:
+        return None
+    try:
+        return open(path, "rb")
+    except FileNotFoundError:
+        # Replaced by another version since chunk_path() looked; write the
+        # current one again.
+        return open_chunk(chunk, base_url)
+
+
+def index(base_url):
+    lines = [f'{XML_DECLARATION}<sitemapindex xmlns="{NAMESPACE}">\n']
+    for chunk, _, lastmod in chunks():
+        loc = base_url + reverse("sitemap_chunk", args=[chunk])
+        lines.append(
+            f"<sitemap><loc>{escape(loc)}</loc>"
+            f"<lastmod>{lastmod.isoformat()}</lastmod></sitemap>\n"
+        )
+    lines.append("</sitemapindex>\n")
+    return "".join(lines)
@@ -0,0 +1,536 @@
+import datetime
+import gzip
+import json
+import os
+import re
+import shutil
+import sqlite3
+import threading
+from pathlib import Path
+
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from . import changes
+from .changes import TAG_LINK, VICTIM_FEED_FIELDS
+from .models import Photo, Source, Tag, Victim, VictimTag
+
+SCHEMA_VERSION = "3"
+VICTIM_COLUMNS = list(VICTIM_FEED_FIELDS)
+SOURCE_COLUMNS = [
+    "id",
+    "victim_id",
+    "title",
+    "url",
+    "publisher_name",
+    "publication_date",
+    "credibility_score",
+    "notes",
+]
+PHOTO_COLUMNS = [
+    "id",
+    "victim_id",
+    "image",
+    "caption",
+    "photographer_credit",
+    "order_index",
+    "created_at",
+]
+FTS_COLUMNS = ["full_name", "native_name", "short_summary", "biography"]
+BATCH_SIZE = 5000
+
+SCHEMA = f"""
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE victims ({", ".join(
+    "id INTEGER PRIMARY KEY" if name == "id" else name for name in VICTIM_COLUMNS
+)});
+CREATE UNIQUE INDEX victims_slug ON victims (slug);
+CREATE INDEX victims_full_name ON victims (full_name);
+CREATE INDEX victims_date_of_death ON victims (date_of_death);
+CREATE INDEX victims_created_at ON victims (created_at);
+CREATE INDEX victims_city ON victims (city_of_death);
+CREATE TABLE tags (id INTEGER PRIMARY KEY, name, slug UNIQUE);
+CREATE TABLE victim_tags (victim_id, tag_id, PRIMARY KEY (victim_id, tag_id));
+CREATE INDEX victim_tags_tag ON victim_tags (tag_id);
+CREATE TABLE sources ({", ".join(
+    "id INTEGER PRIMARY KEY" if name == "id" else name for name in SOURCE_COLUMNS
+)});
+CREATE INDEX sources_victim ON sources (victim_id);
+CREATE TABLE photos ({", ".join(
+    "id INTEGER PRIMARY KEY" if name == "id" else name for name in PHOTO_COLUMNS
+)});
+CREATE INDEX photos_victim ON photos (victim_id);
+CREATE VIRTUAL TABLE victims_fts USING fts5({", ".join(FTS_COLUMNS)});
+"""
+
+
+def _value(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def _insert(db, table, columns, rows):
+    sql = (
+        f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) "
+        f"VALUES ({', '.join('?' * len(columns))})"
+    )
+    batch = []
+    for row in rows:
+        batch.append([_value(value) for value in row])
+        if len(batch) >= BATCH_SIZE:
+            db.executemany(sql, batch)
+            batch = []
+    if batch:
+        db.executemany(sql, batch)
+
+
+def _chunks(ids):
+    ids = list(ids)
+    for start in range(0, len(ids), BATCH_SIZE):
+        yield ids[start : start + BATCH_SIZE]
+
+
+def _export_victims(db, victim_ids=None):
+    # victim_ids=None exports everything; otherwise only those profiles.
+    groups = [None] if victim_ids is None else _chunks(victim_ids)
+    for ids in groups:
+        victims = Victim.objects.order_by()
+        sources = Source.objects.order_by()
+        photos = Photo.objects.order_by()
+        links = VictimTag.objects.order_by()
+        if ids is not None:
+            victims = victims.filter(pk__in=ids)
+            sources = sources.filter(victim_id__in=ids)
+            photos = photos.filter(victim_id__in=ids)
+            links = links.filter(victim_id__in=ids)
+        _insert(
+            db,
+            "victims",
+            VICTIM_COLUMNS,
+            victims.values_list(*VICTIM_COLUMNS).iterator(chunk_size=BATCH_SIZE),
+        )
+        _insert(
+            db,
+            "victims_fts",
+            ["rowid", *FTS_COLUMNS],
+            victims.values_list("id", *FTS_COLUMNS).iterator(chunk_size=BATCH_SIZE),
+        )
+        _insert(
+            db,
+            "sources",
+            SOURCE_COLUMNS,
+            sources.values_list(*SOURCE_COLUMNS).iterator(chunk_size=BATCH_SIZE),
+        )
+        _insert(
+            db,
+            "photos",
+            PHOTO_COLUMNS,
+            photos.values_list(*PHOTO_COLUMNS).iterator(chunk_size=BATCH_SIZE),
+        )
+        _insert(
+            db,
+            "victim_tags",
+            ["victim_id", "tag_id"],
+            links.values_list("victim_id", "tag_id").iterator(chunk_size=BATCH_SIZE),
+        )
+
+
+def _delete_victims(db, victim_ids):
+    for ids in _chunks(victim_ids):
+        marks = ", ".join("?" * len(ids))
+        db.execute(f"DELETE FROM victims WHERE id IN ({marks})", ids)
+        db.execute(f"DELETE FROM victims_fts WHERE rowid IN ({marks})", ids)
+        for table in ("sources", "photos", "victim_tags"):
+            db.execute(f"DELETE FROM {table} WHERE victim_id IN ({marks})", ids)
+
+
+def _export_tags(db):
+    db.execute("DELETE FROM tags")
+    _insert(
+        db,
+        "tags",
+        ["id", "name", "slug"],
+        Tag.objects.values_list("id", "name", "slug"),
+    )
+
+
+def _write_meta(db, cursor):
+    meta = {
+        "schema_version": SCHEMA_VERSION,
+        "exported_at": timezone.now().isoformat(),
+        # The committed (xid, seq) change-log cursor the file is current to.
+        "last_change_cursor": changes.format_cursor(*cursor),
+    }
+    _insert(db, "meta", ["key", "value"], meta.items())
+
+
+def read_meta(path):
+    db = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        return dict(db.execute("SELECT key, value FROM meta"))
+    finally:
+        db.close()
+
+
+def export_full(path):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    tmp_path.unlink(missing_ok=True)
+    # The mark is taken before reading so that changes made during the
+    # export are picked up again by the next incremental run.
+    cursor = changes.committed_mark()
+    db = sqlite3.connect(tmp_path)
+    try:
+        db.executescript(SCHEMA)
+        with db:
+            _export_tags(db)
+            _export_victims(db)
+            _write_meta(db, cursor)
+        db.execute("VACUUM")
+    finally:
+        db.close()
+    os.replace(tmp_path, path)
+    return {"mode": "full", "victims": Victim.objects.count()}
+
+
+def export_incremental(path):
+    meta = read_meta(path)
+    if meta.get("schema_version") != SCHEMA_VERSION:
+        # Columns changed since this file was written; start over.
+        return export_full(path)
+    # Only entries already committed are read, stopping before any
+    # transaction still in flight, so one that commits after this run is
+    # still past the stored cursor next time.
+    cursor = changes.parse_cursor(meta.get("last_change_cursor"))
+    entries = changes.committed_after(cursor).values_list(
+        "xid", "seq", "model", "object_id"
+    )
+    changed = set()
+    child_ids = {"photo": set(), "source": set()}
+    for xid, seq, model, object_id in entries.iterator():
+        cursor = (xid, seq)
+        if model in ("victim", TAG_LINK):
+            changed.add(object_id)
+        elif model in child_ids:
+            child_ids[model].add(object_id)
+
+    db = sqlite3.connect(path)
+    try:
+        with db:
+            # Deleted photos and sources are dropped by id; their profiles are
+            # re-exported below along with everything else that changed.
+            for model, table in (("photo", "photos"), ("source", "sources")):
+                for ids in _chunks(child_ids[model]):
+                    marks = ", ".join("?" * len(ids))
+                    changed.update(
+                        row[0]
+                        for row in db.execute(
+                            f"SELECT victim_id FROM {table} WHERE id IN ({marks})", ids
+                        )
+                    )
+                    db.execute(f"DELETE FROM {table} WHERE id IN ({marks})", ids)
+            changed.update(
+                Photo.objects.filter(pk__in=child_ids["photo"]).values_list(
+                    "victim_id", flat=True
+                )
+            )
+            changed.update(
+                Source.objects.filter(pk__in=child_ids["source"]).values_list(
+                    "victim_id", flat=True
+                )
+            )
+            _delete_victims(db, changed)
+            _export_victims(db, changed)
+            _export_tags(db)
+            _write_meta(db, cursor)
+    finally:
+        db.close()
+    return {"mode": "incremental", "victims": len(changed)}
+
+
+def compress(path):
+    target = Path(f"{path}.gz")
+    with open(path, "rb") as source, gzip.open(target, "wb", compresslevel=6) as out:
+        shutil.copyfileobj(source, out, 1024 * 1024)
+    return target
+
+
+class SnapshotRelation:
+    def __init__(self, items):
+        self.items = items
+
+    def all(self):
+        return self.items
+
+    def first(self):
+        return self.items[0] if self.items else None
+
+    def exists(self):
+        return bool(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+class SnapshotImage:
+    def __init__(self, name):
+        self.name = name
+
+    @property
+    def url(self):
+        return default_storage.url(self.name)
+
+    def __str__(self):
+        return self.name
+
+
+class SnapshotRecord:
+    def __init__(self, row):
+        self.__dict__.update(dict(row))
+
+    @property
+    def pk(self):
+        return self.id
+
+
+class SnapshotVictim(SnapshotRecord):
+    def __init__(self, row):
+        super().__init__(row)
+        self.tags = SnapshotRelation([])
+        self.photos = SnapshotRelation([])
+        self.sources = SnapshotRelation([])
+        for name in ("date_of_birth", "date_of_death"):
+            value = getattr(self, name, None)
+            if value:
+                setattr(self, name, datetime.date.fromisoformat(value))
+        if isinstance(getattr(self, "social_links", None), str):
+            self.social_links = json.loads(self.social_links)
+
+    def get_verification_status_display(self):
+        return Victim.VerificationStatus(self.verification_status).label
+
+    def __str__(self):
+        return self.full_name
+
+
+def fts_query(term):
+    words = re.findall(r"\w+", term)
+    return " ".join(f'"{word}"*' for word in words)
+
+
+class SnapshotQuery:
+    # Lazy, sliceable result set so Django's Paginator can page through it.
+    def __init__(self, archive, where="", params=(), order="full_name", relations=()):
+        self.archive = archive
+        self.where = where
+        self.params = list(params)
+        self.order = order
+        self.relations = relations
+
+    def count(self):
+        sql = f"SELECT COUNT(*) FROM victims {self.where}"
+        return self.archive.execute(sql, self.params).fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start = index.start or 0
+            limit = -1 if index.stop is None else index.stop - start
+            sql = (
+                f"SELECT * FROM victims {self.where} ORDER BY {self.order} "
+                "LIMIT ? OFFSET ?"
+            )
+            rows = self.archive.execute(sql, [*self.params, limit, start]).fetchall()
+            victims = [SnapshotVictim(row) for row in rows]
+            self.archive.attach(victims, self.relations)
+            return victims
+        return self[index : index + 1][0]
+
+
+class SnapshotArchive:
+    SORTS = {
+        "alpha": "full_name",
+        "age": "age",
+        "date": "date_of_death DESC",
+        "recent": "created_at DESC",
+    }
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.local = threading.local()
+
+    def connection(self):
+        # A full export swaps in a new file with os.replace(); a connection
+        # opened on the old one keeps reading it, so reconnect whenever the
+        # inode or modification time moves.
+        stat = os.stat(self.path)
+        version = (stat.st_ino, stat.st_mtime_ns)
+        db = getattr(self.local, "db", None)
+        if db is not None and self.local.version != version:
+            db.close()
+            db = None
+        if db is None:
+            db = sqlite3.connect(
+                f"file:{self.path}?mode=ro", uri=True, check_same_thread=False
+            )
+            db.row_factory = sqlite3.Row
+            self.local.db = db
+            self.local.version = version
+        return db
+
+    def execute(self, sql, params=()):
+        return self.connection().execute(sql, params)
+
+    def meta(self):
+        return dict(self.execute("SELECT key, value FROM meta").fetchall())
+
+    def attach(self, victims, relations=("tags", "photos", "sources")):
+        if not victims:
+            return
+        by_id = {victim.id: victim for victim in victims}
+        marks = ", ".join("?" * len(by_id))
+        ids = list(by_id)
+        grouped = {relation: {} for relation in relations}
+        if "tags" in relations:
+            rows = self.execute(
+                "SELECT vt.victim_id, t.* FROM victim_tags vt "
+                f"JOIN tags t ON t.id = vt.tag_id WHERE vt.victim_id IN ({marks}) "
+                "ORDER BY t.name",
+                ids,
+            )
+            for row in rows:
+                grouped["tags"].setdefault(row["victim_id"], []).append(
+                    SnapshotRecord(row)
+                )
+        if "photos" in relations:
+            rows = self.execute(
+                f"SELECT * FROM photos WHERE victim_id IN ({marks}) "
+                "ORDER BY order_index, created_at",
+                ids,
+            )
+            for row in rows:
+                photo = SnapshotRecord(row)
+                photo.image = SnapshotImage(photo.image)
+                grouped["photos"].setdefault(row["victim_id"], []).append(photo)
+        if "sources" in relations:
+            rows = self.execute(
+                f"SELECT * FROM sources WHERE victim_id IN ({marks}) "
+                "ORDER BY publication_date DESC, title",
+                ids,
+            )
+            for row in rows:
+                source = SnapshotRecord(row)
+                if source.publication_date:
+                    source.publication_date = datetime.date.fromisoformat(
+                        source.publication_date
+                    )
+                grouped["sources"].setdefault(row["victim_id"], []).append(source)
+        for relation, items in grouped.items():
+            for victim_id, victim in by_id.items():
+                setattr(victim, relation, SnapshotRelation(items.get(victim_id, [])))
+
+    def get(self, slug):
+        row = self.execute("SELECT * FROM victims WHERE slug = ?", [slug]).fetchone()
+        if row is None:
+            return None
+        victim = SnapshotVictim(row)
+        self.attach([victim])
+        return victim
+
+    def get_by_id(self, pk):
+        row = self.execute("SELECT * FROM victims WHERE id = ?", [pk]).fetchone()
+        if row is None:
+            return None
+        victim = SnapshotVictim(row)
+        self.attach([victim])
+        return victim
+
+    def recent(self, limit=6):
+        return SnapshotQuery(self, order="created_at DESC", relations=("photos",))[
+            :limit
+        ]
+
+    def verified_count(self):
+        return SnapshotQuery(
+            self, "WHERE verification_status = ?", [Victim.VerificationStatus.VERIFIED]
+        ).count()
+
+    def tags(self):
+        return [
+            SnapshotRecord(row)
+            for row in self.execute(
+                "SELECT tags.*, count(victim_tags.victim_id) AS victim_count "
+                "FROM tags LEFT JOIN victim_tags ON victim_tags.tag_id = tags.id "
+                "GROUP BY tags.id ORDER BY name"
+            )
+        ]
+
+    def suggest(self, query, limit=8):
+        rows = self.execute(
+            "SELECT full_name FROM victims WHERE full_name LIKE ? LIMIT ?",
+            [f"%{query}%", limit],
+        )
+        return [row[0] for row in rows]
+
+    def search(self, filters, relations=("tags", "photos")):
+        clauses, params = [], []
+        q = filters.get("q")
+        if q and fts_query(q):
+            clauses.append(
+                "id IN (SELECT rowid FROM victims_fts WHERE victims_fts MATCH ?)"
+            )
+            params.append(fts_query(q))
+        if filters.get("city"):
+            clauses.append("city_of_death LIKE ?")
+            params.append(f"%{filters['city']}%")
+        if filters.get("verification_status"):
+            clauses.append("verification_status = ?")
+            params.append(filters["verification_status"])
+        if filters.get("age_min") is not None:
+            clauses.append("age >= ?")
+            params.append(filters["age_min"])
+        if filters.get("age_max") is not None:
+            clauses.append("age <= ?")
+            params.append(filters["age_max"])
+        tagged = (
+            "SELECT vt.victim_id FROM victim_tags vt "
+            "JOIN tags t ON t.id = vt.tag_id WHERE t.slug IN ({})"
+        )
+        tags = filters.get("tag") or []
+        if tags:
+            marks = ", ".join("?" * len(tags))
+            if filters.get("tag_mode") == "any":
+                clauses.append(f"id IN ({tagged.format(marks)})")
+            else:
+                clauses.append(
+                    f"id IN ({tagged.format(marks)} "
+                    f"GROUP BY vt.victim_id HAVING count(*) = {len(tags)})"
+                )
+            params.extend(tags)
+        excluded = filters.get("exclude_tag") or []
+        if excluded:
+            marks = ", ".join("?" * len(excluded))
+            clauses.append(f"id NOT IN ({tagged.format(marks)})")
+            params.extend(excluded)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        order = self.SORTS.get(filters.get("sort") or "recent", self.SORTS["recent"])
+        return SnapshotQuery(self, where, params, f"{order}, id", relations)
+
+
+_archives = {}
+
+
+def get_archive(path):
+    path = str(path)
+    if path not in _archives:
+        _archives[path] = SnapshotArchive(path)
+    return _archives[path]
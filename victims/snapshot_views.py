@@ -0,0 +1,156 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.paginator import Paginator
+from django.http import Http404, HttpResponse, JsonResponse
+from django.shortcuts import redirect, render
+from django_ratelimit.decorators import ratelimit
+
+from . import submission_queue
+from .forms import QueuedSubmissionForm, VictimFilterForm
+from .snapshot import get_archive
+
+# Views that answer from the SQLite snapshot when SNAPSHOT_READ_ONLY is on or
+# the database is unavailable. They mirror the public pages and the read-only
+# victim API without touching PostgreSQL.
+
+
+def _archive():
+    return get_archive(settings.SNAPSHOT_PATH)
+
+
+def available():
+    return Path(settings.SNAPSHOT_PATH).exists()
+
+
+def exported_at():
+    return _archive().meta().get("exported_at")
+
+
+def home(request):
+    archive = _archive()
+    context = {
+        "recent": archive.recent(6),
+        "verified_count": archive.verified_count(),
+    }
+    return render(request, "victims/home.html", context)
+
+
+def victim_list(request):
+    form = VictimFilterForm(request.GET)
+    filters = form.cleaned_data if form.is_valid() else {}
+    paginator = Paginator(_archive().search(filters), 12)
+    context = {
+        "form": form,
+        "page_obj": paginator.get_page(request.GET.get("page")),
+        "tags": _archive().tags(),
+        "selected_tags": filters.get("tag", []),
+        "excluded_tags": filters.get("exclude_tag", []),
+        # Snapshot records have no cache_version to key fragments on.
+        "fragment_ttl": 0,
+    }
+    return render(request, "victims/victim_list.html", context)
+
+
+def victim_detail(request, slug):
+    victim = _archive().get(slug)
+    if victim is None:
+        raise Http404
+    context = {"victim": victim, "fragment_ttl": 0}
+    return render(request, "victims/victim_detail.html", context)
+
+
+def name_suggest(request):
+    query = request.GET.get("q", "").strip()
+    if not query:
+        return JsonResponse({"results": []})
+    return JsonResponse({"results": _archive().suggest(query)})
+
+
+def _victim_data(request, victim):
+    data = {
+        key: value
+        for key, value in vars(victim).items()
+        if key not in ("tags", "photos", "sources")
+    }
+    data["tags"] = [
+        {key: value for key, value in vars(tag).items() if key != "victim_id"}
+        for tag in victim.tags
+    ]
+    data["photos"] = [
+        vars(photo) | {"image": request.build_absolute_uri(photo.image.url)}
+        for photo in victim.photos
+    ]
+    data["sources"] = [vars(source) for source in victim.sources]
+    return data
+
+
+def api_victim_list(request):
+    form = VictimFilterForm(request.GET)
+    filters = form.cleaned_data if form.is_valid() else {}
+    filters["q"] = filters.get("q") or request.GET.get("search")
+    paginator = Paginator(
+        _archive().search(filters, relations=("tags", "photos", "sources")),
+        settings.REST_FRAMEWORK["PAGE_SIZE"],
+    )
+    page = paginator.get_page(request.GET.get("page"))
+    return JsonResponse(
+        {
+            "count": paginator.count,
+            "next": page.next_page_number() if page.has_next() else None,
+            "previous": page.previous_page_number() if page.has_previous() else None,
+            "results": [_victim_data(request, victim) for victim in page],
+        },
+        json_dumps_params={"ensure_ascii": False},
+    )
+
+
+def api_victim_detail(request, pk):
+    victim = _archive().get_by_id(pk)
+    if victim is None:
+        raise Http404
+    return JsonResponse(
+        _victim_data(request, victim), json_dumps_params={"ensure_ascii": False}
+    )
+
+
+@ratelimit(key="ip", rate="5/h", block=True)
+def submit_correction(request, slug=None):
+    if request.method == "POST":
+        form = QueuedSubmissionForm(request.POST, initial={"victim": slug})
+        if form.is_valid():
+            submission_queue.enqueue({**form.cleaned_data, "victim": slug or ""})
+            messages.success(
+                request,
+                "Thank you. Your submission has been saved and will be reviewed "
+                "once the archive is back online.",
+            )
+            return redirect("victim_list")
+    else:
+        form = QueuedSubmissionForm(initial={"victim": slug})
+    return render(request, "victims/submit_correction.html", {"form": form})
+
+
+def unavailable(request):
+    return HttpResponse(
+        "The archive is running in read-only mode.",
+        status=503,
+        content_type="text/plain",
+    )
+
+
+VIEWS = {
+    "home": home,
+    "victim_list": victim_list,
+    "victim_detail": victim_detail,
+    "name_suggest": name_suggest,
+    "victim-list": api_victim_list,
+    "victim-detail": api_victim_detail,
+    "submit_correction": submit_correction,
+    "submit_correction_for_victim": submit_correction,
+}
+# Views in VIEWS that also accept POST.
+WRITABLE = {"submit_correction", "submit_correction_for_victim"}
+# Views that never query the database and keep working as they are.
+PASSTHROUGH = {"disclaimer", "metrics", "profiles", "profile_download"}
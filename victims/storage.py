@@ -0,0 +1,204 @@
+import hashlib
+import io
+import os
+
+from django.conf import settings
+from django.contrib.postgres.fields import ArrayField
+from django.core.exceptions import ValidationError
+from django.core.files.storage import FileSystemStorage
+from django.db.models import Func, IntegerField, Value
+from PIL import Image, UnidentifiedImageError
+
+MAX_PHOTO_WIDTH = 2000
+PHOTO_PREFIX = "victims/photos"
+ALLOWED_FORMATS = {"JPEG", "PNG", "WEBP"}
+ALLOWED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp"}
+
+
+class ContentAddressedStorageMixin:
+    # Photo names are derived from a SHA-256 of their bytes (photo_upload_to),
+    # so a file that already exists under that name holds the same content and
+    # is reused instead of being written again.
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def _save(self, name, content):
+        if self.exists(name):
+            return name
+        return super()._save(name, content)
+
+
+class ContentAddressedFileSystemStorage(
+    ContentAddressedStorageMixin, FileSystemStorage
+):
+    pass
+
+
+def photo_storage():
+    if settings.USE_S3:
+        from storages.backends.s3 import S3Storage
+
+        class ContentAddressedS3Storage(ContentAddressedStorageMixin, S3Storage):
+            pass
+
+        return ContentAddressedS3Storage()
+    return ContentAddressedFileSystemStorage()
+
+
+def content_address(digest, extension):
+    return f"{PHOTO_PREFIX}/{digest[:2]}/{digest[2:4]}/{digest}{extension}"
+
+
+def photo_upload_to(instance, filename):
+    extension = os.path.splitext(filename)[1].lower()
+    return content_address(instance.content_hash, extension)
+
+
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def perceptual_hash(image):
+    # 64-bit difference hash: compares neighbouring pixels of a 9x8 greyscale
+    # thumbnail, so re-encodes, resizes and small edits land a few bits apart.
+    pixels = image.convert("L").resize((9, 8), Image.LANCZOS).tobytes()
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (left > right)
+    # Stored in a signed bigint column.
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def prepare_photo(content):
+    # Returns the downscaled bytes with their SHA-256 and dHash.
+    content.seek(0)
+    data = content.read()
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    if image.width > MAX_PHOTO_WIDTH:
+        ratio = MAX_PHOTO_WIDTH / image.width
+        resized = image.resize(
+            (MAX_PHOTO_WIDTH, int(image.height * ratio)), Image.LANCZOS
+        )
+        buffer = io.BytesIO()
+        resized.save(buffer, format=image.format, optimize=True, quality=85)
+        data, image = buffer.getvalue(), resized
+    return data, sha256(data), perceptual_hash(image)
+
+
+def validate_new_upload(filename, size):
+    if os.path.splitext(filename)[1].lower() not in ALLOWED_EXTENSIONS:
+        raise ValidationError("Only JPEG, PNG and WebP images are accepted.")
+    if size > settings.UPLOAD_MAX_BYTES:
+        raise ValidationError(
+            f"Image file size must be under {settings.UPLOAD_MAX_BYTES} bytes."
+        )
+
+
+def check_image_header(path):
+    # Reads only the header: Image.open does not decode pixel data, so this
+    # catches decompression bombs before the rest of the file arrives.
+    try:
+        with Image.open(path) as image:
+            width, height, image_format = image.width, image.height, image.format
+    except Image.DecompressionBombError as exc:
+        raise ValidationError(str(exc))
+    except (UnidentifiedImageError, OSError):
+        return None
+    if image_format not in ALLOWED_FORMATS:
+        raise ValidationError("Only JPEG, PNG and WebP images are accepted.")
+    if width * height > settings.UPLOAD_MAX_PIXELS:
+        raise ValidationError(
+            f"Image is {width}x{height}; at most {settings.UPLOAD_MAX_PIXELS} "
+            "pixels are accepted."
+        )
+    return width, height
+
+
+class HammingDistance(Func):
+    output_field = IntegerField()
+
+    def __init__(self, expression, value, **extra):
+        super().__init__(expression, Value(value), **extra)
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler,
+            connection,
+            template="bit_count((%(expressions)s)::bit(64))",
+            arg_joiner=" # ",
+            **extra_context,
+        )
+
+
+# Near-duplicate candidates are prefiltered on 8-bit bands of the dHash: two
+# hashes within PERCEPTUAL_BANDS - 1 bits agree on at least one whole band.
+PERCEPTUAL_BANDS = 8
+
+
+def perceptual_bands(value):
+    # Band i is stored as i * 256 + its value, so one array holds all bands
+    # and overlap (&&) matches a band only against the same band.
+    return [
+        band * 256 + ((value >> band * 8) & 255) for band in range(PERCEPTUAL_BANDS)
+    ]
+
+
+class PerceptualBands(Func):
+    # perceptual_bands() in SQL, for the generated Photo.perceptual_bands.
+    output_field = ArrayField(IntegerField())
+
+    def as_sql(self, compiler, connection, **extra_context):
+        template = "ARRAY[%s]" % ", ".join(
+            f"{band * 256} + ((%(expressions)s >> {band * 8}) & 255)::integer"
+            for band in range(PERCEPTUAL_BANDS)
+        )
+        return super().as_sql(compiler, connection, template=template, **extra_context)
+
+
+def _segments(distance):
+    # Two hashes within `distance` bits agree exactly on at least one of
+    # distance + 1 disjoint segments, so only hashes sharing a segment value
+    # need comparing.
+    count = min(64, distance + 1)
+    bounds = [round(64 * index / count) for index in range(count + 1)]
+    return list(zip(bounds, bounds[1:]))
+
+
+def find_near_duplicates(items, distance):
+    # Maps each photo pk to the earliest older photo within `distance` bits,
+    # given (pk, perceptual_hash) pairs.
+    by_hash = {}
+    for pk, value in sorted(items):
+        by_hash.setdefault(value & (1 << 64) - 1, []).append(pk)
+    buckets = {}
+    for value in by_hash:
+        for start, end in _segments(distance):
+            key = (start, (value >> start) & ((1 << (end - start)) - 1))
+            buckets.setdefault(key, []).append(value)
+
+    similar = {}
+    for values in buckets.values():
+        for index, value in enumerate(values):
+            for other in values[index + 1 :]:
+                if (value ^ other).bit_count() <= distance:
+                    similar.setdefault(value, set()).add(other)
+                    similar.setdefault(other, set()).add(value)
+
+    matches = {}
+    for value, pks in by_hash.items():
+        first_similar = min(
+            (by_hash[other][0] for other in similar.get(value, ())), default=None
+        )
+        for pk in pks:
+            candidates = [
+                candidate
+                for candidate in (pks[0], first_similar)
+                if candidate is not None and candidate < pk
+            ]
+            if candidates:
+                matches[pk] = min(candidates)
+    return matches
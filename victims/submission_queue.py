@@ -0,0 +1,55 @@
+import json
+import os
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+
+from .forms import SubmissionForm
+from .models import Victim
+
+# Corrections sent while the database is unavailable are written here as one
+# JSON file each and replayed by `manage.py replay_submissions`.
+
+
+def queue_dir():
+    return Path(settings.SUBMISSION_QUEUE_DIR)
+
+
+def enqueue(data):
+    directory = queue_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    name = f"{time.time_ns()}-{uuid.uuid4().hex}.json"
+    tmp_path = directory / f".{name}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as handle:
+        json.dump(data, handle, ensure_ascii=False)
+        handle.flush()
+        os.fsync(handle.fileno())
+    # Renamed into place so replay never reads a half-written file.
+    os.replace(tmp_path, directory / name)
+    return directory / name
+
+
+def pending():
+    directory = queue_dir()
+    return sorted(directory.glob("*.json")) if directory.exists() else []
+
+
+def replay():
+    # Returns (number saved, {path: errors}); files that fail validation are
+    # kept for a moderator to look at.
+    saved, failed = 0, {}
+    for path in pending():
+        with open(path, encoding="utf-8") as handle:
+            data = json.load(handle)
+        slug = data.pop("victim", "")
+        victim = Victim.objects.filter(slug=slug).first() if slug else None
+        form = SubmissionForm({**data, "victim": victim.pk if victim else ""})
+        if not form.is_valid():
+            failed[path] = form.errors.get_json_data()
+            continue
+        form.save()
+        path.unlink()
+        saved += 1
+    return saved, failed
@@ -0,0 +1,343 @@
+import csv
+import datetime
+import io
+import multiprocessing
+import random
+
+from django.core.files.base import ContentFile
+from django.db import connection, connections, transaction
+from django.utils import timezone
+from PIL import Image
+
+from . import changes, revisions, tasks
+from .models import Photo, Source, Tag, Victim, VictimTag, update_search_vectors
+from .storage import content_address, prepare_photo
+
+# (Latin, Persian) pairs so generated profiles exercise both scripts in search.
+MALE_NAMES = [
+    ("Amir", "امیر"),
+    ("Reza", "رضا"),
+    ("Hamid", "حمید"),
+    ("Kian", "کیان"),
+    ("Mohsen", "محسن"),
+    ("Majid", "مجید"),
+    ("Javad", "جواد"),
+    ("Mehdi", "مهدی"),
+    ("Ali", "علی"),
+    ("Hossein", "حسین"),
+    ("Saeed", "سعید"),
+    ("Navid", "نوید"),
+    ("Pouya", "پویا"),
+    ("Arman", "آرمان"),
+    ("Behnam", "بهنام"),
+]
+FEMALE_NAMES = [
+    ("Parisa", "پریسا"),
+    ("Neda", "ندا"),
+    ("Sara", "سارا"),
+    ("Mahsa", "مهسا"),
+    ("Nika", "نیکا"),
+    ("Hadis", "حدیث"),
+    ("Ghazaleh", "غزاله"),
+    ("Minoo", "مینو"),
+    ("Sarina", "سارینا"),
+    ("Hananeh", "حنانه"),
+    ("Zahra", "زهرا"),
+    ("Maryam", "مریم"),
+    ("Fatemeh", "فاطمه"),
+    ("Leila", "لیلا"),
+    ("Shirin", "شیرین"),
+]
+LAST_NAMES = [
+    ("Rahimi", "رحیمی"),
+    ("Hosseini", "حسینی"),
+    ("Moradi", "مرادی"),
+    ("Karimi", "کریمی"),
+    ("Ahmadi", "احمدی"),
+    ("Jafari", "جعفری"),
+    ("Mohammadi", "محمدی"),
+    ("Rezaei", "رضایی"),
+    ("Hashemi", "هاشمی"),
+    ("Sadeghi", "صادقی"),
+    ("Ebrahimi", "ابراهیمی"),
+    ("Kazemi", "کاظمی"),
+    ("Amini", "امینی"),
+    ("Najafi", "نجفی"),
+    ("Rostami", "رستمی"),
+    ("Azizi", "عزیزی"),
+    ("Bagheri", "باقری"),
+    ("Ghorbani", "قربانی"),
+    ("Safari", "صفری"),
+    ("Nouri", "نوری"),
+    ("Heidari", "حیدری"),
+    ("Soltani", "سلطانی"),
+]
+# (city, province, relative weight): heavier where protests were most deadly.
+CITIES = [
+    ("Tehran", "Tehran", 30),
+    ("Zahedan", "Sistan and Baluchestan", 10),
+    ("Karaj", "Alborz", 6),
+    ("Mashhad", "Razavi Khorasan", 5),
+    ("Isfahan", "Isfahan", 5),
+    ("Shiraz", "Fars", 5),
+    ("Tabriz", "East Azerbaijan", 4),
+    ("Sanandaj", "Kurdistan", 5),
+    ("Saqqez", "Kurdistan", 3),
+    ("Mahabad", "West Azerbaijan", 3),
+    ("Urmia", "West Azerbaijan", 2),
+    ("Piranshahr", "West Azerbaijan", 2),
+    ("Bukan", "West Azerbaijan", 2),
+    ("Javanrud", "Kermanshah", 3),
+    ("Kermanshah", "Kermanshah", 3),
+    ("Ahvaz", "Khuzestan", 4),
+    ("Izeh", "Khuzestan", 2),
+    ("Rasht", "Gilan", 3),
+    ("Amol", "Mazandaran", 2),
+    ("Bandar Abbas", "Hormozgan", 1),
+    ("Ardabil", "Ardabil", 1),
+    ("Qazvin", "Qazvin", 1),
+    ("Arak", "Markazi", 1),
+    ("Zanjan", "Zanjan", 1),
+]
+# (centre, spread in days, relative weight) for the major protest waves, plus a
+# uniform background so every year is represented.
+DEATH_WAVES = [
+    (datetime.date(2009, 6, 20), 20, 8),
+    (datetime.date(2017, 12, 31), 10, 5),
+    (datetime.date(2019, 11, 17), 6, 30),
+    (datetime.date(2022, 10, 15), 40, 45),
+]
+BACKGROUND_RANGE = (datetime.date(2009, 1, 1), datetime.date(2025, 12, 31))
+OCCUPATIONS = [
+    ("Student", "student", 30),
+    ("Worker", "worker", 20),
+    ("Teacher", "teacher", 6),
+    ("Shopkeeper", "", 10),
+    ("Nurse", "", 4),
+    ("Engineer", "", 5),
+    ("Athlete", "athlete", 3),
+    ("Artist", "artist", 3),
+    ("Journalist", "journalist", 2),
+    ("", "", 17),
+]
+TAG_NAMES = ["student", "journalist", "worker", "teacher", "athlete", "artist", "minor"]
+PUBLISHERS = [
+    "Iran Human Rights",
+    "Amnesty International",
+    "HRANA",
+    "Hengaw",
+    "Haalvsh",
+    "Community Archive",
+]
+VERIFICATION_WEIGHTS = [
+    (Victim.VerificationStatus.VERIFIED, 35),
+    (Victim.VerificationStatus.PENDING, 25),
+    (Victim.VerificationStatus.UNVERIFIED, 40),
+]
+PLACEHOLDER_COUNT = 4
+
+
+def _weighted(rng, items):
+    return rng.choices(items, weights=[item[-1] for item in items])[0]
+
+
+def ensure_tags():
+    for name in TAG_NAMES:
+        Tag.objects.get_or_create(slug=name, defaults={"name": name})
+    return {tag.slug: tag.pk for tag in Tag.objects.filter(slug__in=TAG_NAMES)}
+
+
+def ensure_placeholder_photos():
+    # Stored content-addressed like real uploads; returns (name, sha256, dHash).
+    storage = Photo._meta.get_field("image").storage
+    placeholders = []
+    for index in range(PLACEHOLDER_COUNT):
+        buffer = io.BytesIO()
+        shade = 60 + index * 40
+        Image.new("RGB", (320, 400), (shade, shade, shade)).save(buffer, "JPEG")
+        data, digest, phash = prepare_photo(ContentFile(buffer.getvalue()))
+        name = content_address(digest, ".jpg")
+        if not storage.exists(name):
+            storage.save(name, ContentFile(data))
+        placeholders.append((name, digest, phash))
+    return placeholders
+
+
+def death_date(rng):
+    if rng.random() < 0.15:
+        start, end = BACKGROUND_RANGE
+        return start + datetime.timedelta(days=rng.randint(0, (end - start).days))
+    centre, spread, _ = _weighted(rng, DEATH_WAVES)
+    return centre + datetime.timedelta(days=round(rng.gauss(0, spread)))
+
+
+def build_victim(rng, index):
+    gender = rng.choice(["male", "female"])
+    first, first_fa = rng.choice(MALE_NAMES if gender == "male" else FEMALE_NAMES)
+    last, last_fa = rng.choice(LAST_NAMES)
+    city, province, _ = _weighted(rng, CITIES)
+    occupation, occupation_tag, _ = _weighted(rng, OCCUPATIONS)
+    age = None if rng.random() < 0.1 else max(6, min(85, round(rng.gauss(27, 10))))
+    died = death_date(rng)
+    tags = {occupation_tag} if occupation_tag else set()
+    if age is not None and age < 18:
+        tags.add("minor")
+    victim = Victim(
+        full_name=f"{first} {last}",
+        native_name=f"{first_fa} {last_fa}",
+        slug=f"{first}-{last}-{index}".lower(),
+        gender=gender,
+        age=age,
+        date_of_birth=(
+            died - datetime.timedelta(days=age * 365 + rng.randint(0, 364))
+            if age is not None and rng.random() < 0.5
+            else None
+        ),
+        date_of_death=died,
+        city_of_death=city,
+        province_or_state=province,
+        country="Iran",
+        occupation=occupation,
+        short_summary=f"{first} was killed in {city} on {died:%B %d, %Y}.",
+        biography=(
+            f"{first} {last} ({first_fa} {last_fa}) lived in {city}, {province}. "
+            f"Family and friends remember {first} for courage and kindness."
+        ),
+        verification_status=_weighted(rng, VERIFICATION_WEIGHTS)[0],
+        confidence_score=rng.randint(20, 100),
+    )
+    victim.locate()
+    victim.tag_slugs = sorted(tags)
+    return victim, tags
+
+
+def _copy_rows(table, columns, rows):
+    if not rows:
+        return
+    if connection.vendor != "postgresql":
+        with connection.cursor() as cursor:
+            placeholders = ", ".join(["%s"] * len(columns))
+            cursor.executemany(
+                f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+                rows,
+            )
+        return
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(["\\N" if value is None else value for value in row])
+    buffer.seek(0)
+    with connection.cursor() as cursor:
+        cursor.cursor.copy_expert(
+            f"COPY {table} ({', '.join(columns)}) FROM STDIN "
+            "WITH (FORMAT csv, NULL '\\N')",
+            buffer,
+        )
+
+
+def generate_batch(seed, offset, size, tag_ids, placeholders):
+    # Each batch has its own RNG derived from (seed, offset), so the output is
+    # identical no matter how batches are spread across workers.
+    rng = random.Random(f"{seed}:{offset}")
+    now = timezone.now()
+    with transaction.atomic():
+        built = [build_victim(rng, offset + i) for i in range(size)]
+        victims = Victim.objects.bulk_create([victim for victim, _ in built])
+        links, sources, photos = [], [], []
+        for victim, (_, tag_slugs) in zip(victims, built):
+            for slug in tag_slugs:
+                links.append((victim.pk, tag_ids[slug]))
+            for n in range(
+                rng.choices([0, 1, 2, 3, 4], weights=[15, 35, 25, 15, 10])[0]
+            ):
+                published = victim.date_of_death + datetime.timedelta(
+                    days=rng.randint(0, 60)
+                )
+                sources.append(
+                    (
+                        victim.pk,
+                        f"Report on {victim.full_name}",
+                        f"https://example.org/reports/{victim.slug}/{n}",
+                        rng.choice(PUBLISHERS),
+                        published,
+                        rng.randint(1, 5),
+                        "",
+                    )
+                )
+            for n in range(rng.choices([0, 1, 2, 3], weights=[40, 40, 15, 5])[0]):
+                name, digest, phash = rng.choice(placeholders)
+                photos.append((victim.pk, name, "", "", n, now, digest, phash))
+        _copy_rows(VictimTag._meta.db_table, ["victim_id", "tag_id"], links)
+        _copy_rows(
+            Source._meta.db_table,
+            [
+                "victim_id",
+                "title",
+                "url",
+                "publisher_name",
+                "publication_date",
+                "credibility_score",
+                "notes",
+            ],
+            sources,
+        )
+        _copy_rows(
+            Photo._meta.db_table,
+            [
+                "victim_id",
+                "image",
+                "caption",
+                "photographer_credit",
+                "order_index",
+                "created_at",
+                "content_hash",
+                "perceptual_hash",
+            ],
+            photos,
+        )
+        update_search_vectors([victim.pk for victim in victims])
+        _record_created(victims, links)
+    return size
+
+
+def _record_created(victims, links):
+    # bulk_create and COPY skip the save signals, so the change log,
+    # revisions and follow-up jobs they would have written are added in bulk.
+    victim_ids = [victim.pk for victim in victims]
+    created = {
+        Victim: victims,
+        Source: list(Source.objects.filter(victim_id__in=victim_ids)),
+        Photo: list(Photo.objects.filter(victim_id__in=victim_ids)),
+    }
+    revisions.record([], created=[obj for objs in created.values() for obj in objs])
+    for model, objs in created.items():
+        changes.record_many(
+            changes.TRACKED_MODELS[model],
+            [obj.pk for obj in objs],
+            changes.Action.CREATED,
+        )
+    changes.record_tag_links(links, changes.Action.CREATED)
+    tasks.queue_related_profiles(victim_ids)
+    tasks.queue_stats_refresh()
+
+
+def _worker(args):
+    try:
+        return generate_batch(*args)
+    finally:
+        connections.close_all()
+
+
+def generate(count, *, seed=0, start=0, batch_size=5000, workers=1):
+    tag_ids = ensure_tags()
+    placeholders = ensure_placeholder_photos()
+    batches = [
+        (seed, offset, min(batch_size, start + count - offset), tag_ids, placeholders)
+        for offset in range(start, start + count, batch_size)
+    ]
+    if workers <= 1 or len(batches) == 1:
+        return sum(generate_batch(*batch) for batch in batches)
+    # Forked workers must not share the parent's database socket.
+    connections.close_all()
+    with multiprocessing.get_context("fork").Pool(workers) as pool:
+        return sum(pool.imap_unordered(_worker, batches))
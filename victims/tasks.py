@@ -0,0 +1,146 @@
+import datetime
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+
+from . import changes, related, revisions, rollups, snapshot
+from .jobs import enqueue, enqueue_many, handler
+from .metrics import PHOTO_PROCESSING
+from .models import Photo, bump_cache_versions, lock_photo_file, update_search_vectors
+from .storage import content_address, prepare_photo
+
+
+@handler("victims.search_vectors")
+def refresh_search_vectors(victim_ids):
+    update_search_vectors(victim_ids)
+    # Related profiles compare search vectors, so they follow the update.
+    queue_related_profiles(victim_ids)
+
+
+def queue_search_vectors(victim_ids):
+    victim_ids = list(victim_ids)
+    if len(victim_ids) == 1:
+        # Repeated edits to one profile collapse into a single queued job.
+        enqueue(
+            "victims.search_vectors",
+            {"victim_ids": victim_ids},
+            priority=10,
+            unique_key=f"search-vector:{victim_ids[0]}",
+        )
+    elif victim_ids:
+        enqueue("victims.search_vectors", {"victim_ids": victim_ids}, priority=10)
+
+
+@handler("victims.related")
+def refresh_related_profiles(victim_ids):
+    related.refresh(victim_ids)
+
+
+def queue_related_profiles(victim_ids):
+    victim_ids = list(victim_ids)
+    if len(victim_ids) == 1:
+        enqueue(
+            "victims.related",
+            {"victim_ids": victim_ids},
+            unique_key=f"related:{victim_ids[0]}",
+        )
+    elif victim_ids:
+        enqueue("victims.related", {"victim_ids": victim_ids})
+
+
+@handler("stats.refresh")
+def refresh_stats():
+    rollups.refresh()
+    rollups.rebuild_map_clusters()
+
+
+def queue_stats_refresh():
+    # Delayed and keyed so a burst of edits triggers a single refresh.
+    enqueue(
+        "stats.refresh",
+        delay=settings.STATS_REFRESH_DELAY,
+        unique_key="stats-refresh",
+    )
+
+
+@handler("snapshot.refresh")
+def refresh_snapshot():
+    # Keeps the read-only fallback close to the live archive, then schedules
+    # the next run.
+    path = Path(settings.SNAPSHOT_PATH)
+    if path.exists():
+        snapshot.export_incremental(path)
+    else:
+        snapshot.export_full(path)
+    queue_snapshot_refresh()
+
+
+def queue_snapshot_refresh():
+    if settings.SNAPSHOT_REFRESH_INTERVAL:
+        enqueue(
+            "snapshot.refresh",
+            delay=settings.SNAPSHOT_REFRESH_INTERVAL,
+            unique_key="snapshot-refresh",
+        )
+
+
+@handler("revisions.compact")
+def compact_revisions():
+    if settings.REVISION_RETENTION_DAYS:
+        cutoff = timezone.now() - datetime.timedelta(
+            days=settings.REVISION_RETENTION_DAYS
+        )
+        while revisions.compact(cutoff):
+            pass
+    queue_revision_compaction()
+
+
+def queue_revision_compaction():
+    enqueue("revisions.compact", delay=24 * 3600, unique_key="revisions-compact")
+
+
+@handler("photos.process")
+def process_photo(photo_id):
+    # Resizes the stored original, re-files it under the hash of the resized
+    # bytes and flags near-duplicates. Safe to repeat: an already processed
+    # photo hashes to its current name.
+    photo = Photo.objects.filter(pk=photo_id).first()
+    if photo is None:
+        return
+    storage = photo.image.storage
+    original = photo.image.name
+    with PHOTO_PROCESSING.time():
+        with storage.open(original) as handle:
+            data, digest, phash = prepare_photo(handle)
+    name = original
+    if digest != photo.content_hash:
+        extension = os.path.splitext(original)[1].lower()
+        name = content_address(digest, extension)
+        lock_photo_file(name)
+        name = storage.save(name, ContentFile(data))
+    photo.content_hash, photo.perceptual_hash = digest, phash
+    near_duplicate = photo.find_near_duplicate()
+    # Guarded on the file name in case the photo was replaced meanwhile.
+    updated = Photo.objects.filter(pk=photo.pk, image=original).update(
+        image=name,
+        content_hash=digest,
+        perceptual_hash=phash,
+        near_duplicate_of=near_duplicate,
+    )
+    if updated:
+        bump_cache_versions([photo.victim_id])
+        photo.image = name
+        revisions.record([photo])
+        # .update() skips post_save, so the feed entry is written here.
+        changes.record("photo", photo.pk, changes.Action.UPDATED)
+    if name != original:
+        unused = name if not updated else original
+        transaction.on_commit(lambda: Photo.release_file(unused))
+
+
+def queue_photo_processing(photo_ids):
+    enqueue_many("photos.process", [{"photo_id": pk} for pk in photo_ids])
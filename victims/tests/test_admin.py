@@ -0,0 +1,42 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from victims import jobs
+from victims.admin_utils import EstimatedCountPaginator
+from victims.models import AuditLog, Victim
+
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
+
+@override_settings(STORAGES=STORAGES)
+class VictimAdminTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_superuser("admin", password="x")
+        self.client.force_login(user)
+        for name in ["Parisa Rahimi", "Amir Hosseini"]:
+            Victim.objects.create(
+                full_name=name,
+                city_of_death="Tehran",
+                province_or_state="Tehran",
+                country="Iran",
+            )
+        jobs.run_pending()
+
+    def test_search_uses_prefix_full_text_match(self):
+        url = reverse("admin:victims_victim_changelist")
+        response = self.client.get(url, {"q": "Pari"}, secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [v.full_name for v in response.context["cl"].result_list],
+            ["Parisa Rahimi"],
+        )
+
+    def test_filtered_changelist_counts_exactly(self):
+        paginator = EstimatedCountPaginator(
+            AuditLog.objects.filter(action="create"), 20
+        )
+        self.assertEqual(paginator.count, 0)
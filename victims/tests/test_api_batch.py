@@ -0,0 +1,198 @@
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from victims import jobs
+from victims.api import SourceViewSet, VictimViewSet
+from victims.models import ChangeLogEntry, Revision, Source, Victim
+
+
+class BatchWriteTests(APITestCase):
+    def setUp(self):
+        self.client.force_authenticate(
+            get_user_model().objects.create_superuser("admin", password="x")
+        )
+        self.victim = Victim.objects.create(
+            full_name="Neda A.",
+            city_of_death="Tehran",
+            province_or_state="Tehran",
+            country="Iran",
+        )
+
+    def batch(self, name, mode, items, **extra):
+        return self.client.post(
+            reverse(f"{name}-batch"),
+            {"mode": mode, "items": items, **extra},
+            format="json",
+        )
+
+    def victim_item(self, full_name, **fields):
+        return {
+            "full_name": full_name,
+            "city_of_death": "Zahedan",
+            "province_or_state": "Sistan and Baluchestan",
+            "country": "Iran",
+            **fields,
+        }
+
+    def test_victim_upsert_reports_each_item(self):
+        items = [
+            {"slug": self.victim.slug, "short_summary": "Updated"},
+            self.victim_item("Neda A."),
+            self.victim_item("Khodanur L.", slug="khodanur"),
+            {"full_name": "Missing fields"},
+        ]
+        # Includes reading the updated victim's revision chain and inserting
+        # the new revisions, and checking whether the named new victim hit a
+        # conflict.
+        with self.assertNumQueries(14):
+            response = self.batch("victim", "upsert", items)
+        self.assertEqual(response.status_code, 200, response.data)
+        statuses = [result["status"] for result in response.data["results"]]
+        self.assertEqual(statuses, ["updated", "created", "created", "error"])
+        self.assertIn("city_of_death", response.data["results"][3]["errors"])
+
+        self.victim.refresh_from_db()
+        self.assertEqual(self.victim.short_summary, "Updated")
+        created = Victim.objects.get(pk=response.data["results"][1]["id"])
+        self.assertEqual(created.slug, "neda-a-2")
+        self.assertIsNone(created.search_vector)
+        jobs.run_pending()
+        created.refresh_from_db()
+        self.assertIsNotNone(created.search_vector)
+        self.assertEqual(ChangeLogEntry.objects.filter(model="victim").count(), 4)
+
+    def test_source_upsert_is_keyed_on_victim_and_url(self):
+        Source.objects.create(
+            victim=self.victim,
+            title="Old title",
+            url="https://example.org/a",
+            publisher_name="Archive",
+        )
+        items = [
+            {
+                "victim": self.victim.pk,
+                "url": url,
+                "title": "New title",
+                "publisher_name": "Archive",
+            }
+            for url in ("https://example.org/a", "https://example.org/b")
+        ]
+        response = self.batch("source", "upsert", items)
+        self.assertEqual(
+            [result["status"] for result in response.data["results"]],
+            ["updated", "created"],
+        )
+        self.assertEqual(
+            list(self.victim.sources.order_by("url").values_list("title", flat=True)),
+            ["New title", "New title"],
+        )
+
+    def test_source_keys_are_normalised_before_matching(self):
+        Source.objects.create(
+            victim=self.victim,
+            title="Old title",
+            url="https://example.org/a",
+            publisher_name="Archive",
+        )
+        items = [
+            {
+                "victim": str(self.victim.pk),
+                "url": " https://example.org/a ",
+                "title": "New title",
+                "publisher_name": "Archive",
+            },
+            {
+                "victim": self.victim.pk,
+                "url": "https://example.org/a",
+                "title": "Repeated",
+                "publisher_name": "Archive",
+            },
+        ]
+        response = self.batch("source", "upsert", items)
+        results = response.data["results"]
+        self.assertEqual(results[0]["status"], "updated")
+        self.assertEqual(
+            results[1]["errors"], "Duplicate of an earlier item in this batch."
+        )
+        self.assertEqual(
+            list(self.victim.sources.values_list("title", flat=True)), ["New title"]
+        )
+
+    def test_source_upsert_updates_rows_inserted_since_the_lookup(self):
+        existing = Source.objects.create(
+            victim=self.victim,
+            title="Old title",
+            url="https://example.org/a",
+            publisher_name="Archive",
+        )
+        # As if another batch created the row after this one read the table.
+        raced = Source(
+            victim=self.victim,
+            title="New title",
+            url="https://example.org/a",
+            publisher_name="Archive",
+        )
+        merged = SourceViewSet().perform_batch_write(
+            Source, [(0, raced)], [], ["publisher_name", "title"]
+        )
+        self.assertEqual(merged, {existing.pk})
+        self.assertEqual(raced.pk, existing.pk)
+        existing.refresh_from_db()
+        self.assertEqual(existing.title, "New title")
+        self.assertEqual(self.victim.sources.count(), 1)
+        self.assertEqual(
+            ChangeLogEntry.objects.filter(model="source").latest("seq").action,
+            ChangeLogEntry.Action.UPDATED,
+        )
+        self.assertEqual(
+            Revision.objects.filter(model="source").latest("pk").data["title"],
+            "New title",
+        )
+
+    def test_victim_upsert_updates_a_slug_created_since_the_lookup(self):
+        existing = Victim.objects.create(
+            full_name="Khodanur L.",
+            slug="khodanur",
+            city_of_death="Tehran",
+            province_or_state="Tehran",
+            country="Iran",
+        )
+        raced = Victim(**self.victim_item("Khodanur L.", slug="khodanur"))
+        unnamed = Victim(**self.victim_item("Khodanur L."))
+        fields = ["city_of_death", "country", "full_name", "province_or_state"]
+        mark = ChangeLogEntry.objects.latest("seq").seq
+        merged = VictimViewSet().perform_batch_write(
+            Victim, [(0, raced), (1, unnamed)], [], fields
+        )
+        self.assertEqual(merged, {existing.pk})
+        existing.refresh_from_db()
+        self.assertEqual(existing.city_of_death, "Zahedan")
+        self.assertEqual(existing.cache_version, 2)
+        # A generated slug never takes over an existing victim.
+        self.assertEqual(unnamed.slug, "khodanur-l")
+        self.assertEqual(
+            dict(
+                ChangeLogEntry.objects.filter(seq__gt=mark).values_list(
+                    "object_id", "action"
+                )
+            ),
+            {
+                existing.pk: ChangeLogEntry.Action.UPDATED,
+                unnamed.pk: ChangeLogEntry.Action.CREATED,
+            },
+        )
+
+    def test_atomic_batch_writes_nothing_on_error(self):
+        response = self.batch(
+            "victim",
+            "create",
+            [self.victim_item("Mohsen S."), {"full_name": "Incomplete"}],
+            atomic=True,
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Victim.objects.filter(full_name="Mohsen S.").exists())
+
+    def test_update_mode_rejects_unknown_items(self):
+        response = self.batch("victim", "update", [{"slug": "nobody", "age": 20}])
+        self.assertEqual(response.data["results"][0]["errors"], "Not found.")
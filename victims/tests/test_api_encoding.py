@@ -0,0 +1,62 @@
+import gzip
+
+import brotli
+import msgpack
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from victims.middleware import negotiate_encoding
+from victims.models import Victim
+from victims.tests.test_snapshot import STORAGES
+
+
+class ApiEncodingTests(APITestCase):
+    def setUp(self):
+        for index in range(20):
+            Victim.objects.create(
+                full_name=f"Victim {index}",
+                city_of_death="Tehran",
+                province_or_state="Tehran",
+                country="Iran",
+                short_summary="Remembered for peaceful advocacy and community support.",
+            )
+
+    def test_msgpack_renderer(self):
+        response = self.client.get(
+            reverse("victim-list"), HTTP_ACCEPT="application/msgpack"
+        )
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+        self.assertEqual(msgpack.unpackb(response.content)["count"], 20)
+
+    def test_large_responses_are_compressed(self):
+        url = reverse("victim-list")
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip, br")
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertIn(b'"count":20', brotli.decompress(response.content))
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn(b'"count":20', gzip.decompress(response.content))
+        self.assertIn("Accept-Encoding", response["Vary"])
+
+    @override_settings(STORAGES=STORAGES)
+    def test_browsable_api_html_is_not_compressed(self):
+        response = self.client.get(
+            reverse("victim-list"),
+            {"search": "Victim"},
+            HTTP_ACCEPT="text/html",
+            HTTP_ACCEPT_ENCODING="gzip, br",
+        )
+        self.assertTrue(response["Content-Type"].startswith("text/html"))
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+    def test_tiny_responses_are_not_compressed(self):
+        response = self.client.get(
+            reverse("name_suggest"), {"q": "Victim 1"}, HTTP_ACCEPT_ENCODING="br"
+        )
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+    def test_negotiation_respects_quality_values(self):
+        self.assertEqual(negotiate_encoding("br;q=0.5, gzip"), "gzip")
+        self.assertIsNone(negotiate_encoding("identity"))
+        self.assertEqual(negotiate_encoding("*"), "br")
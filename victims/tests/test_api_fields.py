@@ -0,0 +1,46 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from victims.models import Source, Tag, Victim
+
+
+class SparseFieldsetTests(APITestCase):
+    def setUp(self):
+        self.victim = Victim.objects.create(
+            full_name="Neda A.",
+            city_of_death="Tehran",
+            province_or_state="Tehran",
+            country="Iran",
+            biography="A long biography.",
+        )
+        self.victim.tags.add(Tag.objects.create(name="Student", slug="student"))
+        Source.objects.create(
+            victim=self.victim,
+            title="Report",
+            url="https://example.org/report",
+            publisher_name="Archive",
+        )
+
+    def test_fields_limits_output_columns_and_prefetches(self):
+        url = reverse("victim-list")
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url, {"fields": "id,full_name,slug"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data["results"][0]), {"id", "full_name", "slug"})
+        self.assertEqual(len(captured), 2)  # count + page, no prefetches
+        self.assertNotIn("biography", captured.captured_queries[-1]["sql"])
+
+    def test_expand_adds_nested_relations_to_list(self):
+        response = self.client.get(
+            reverse("victim-list"), {"fields": "slug", "expand": "sources"}
+        )
+        result = response.data["results"][0]
+        self.assertEqual(set(result), {"slug", "sources"})
+        self.assertEqual(result["sources"][0]["title"], "Report")
+
+    def test_default_retrieve_is_unchanged(self):
+        response = self.client.get(reverse("victim-detail", args=[self.victim.pk]))
+        self.assertIn("photos", response.data)
+        self.assertEqual(response.data["tags"][0]["slug"], "student")
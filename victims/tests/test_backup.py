@@ -0,0 +1,61 @@
+import json
+import os
+import tempfile
+from pathlib import Path
+
+from django.test import SimpleTestCase
+
+from victims.backup import MANIFEST, backup_media, rotate
+
+
+class MediaBackupTests(SimpleTestCase):
+    def setUp(self):
+        self.media_root = Path(tempfile.mkdtemp())
+        self.root = Path(tempfile.mkdtemp())
+        self.photos = self.media_root / "victims" / "photos"
+        self.photos.mkdir(parents=True)
+
+    def write_backup(self, name):
+        media, copied, _ = backup_media(self.root, self.media_root)
+        (self.root / name).mkdir()
+        (self.root / name / MANIFEST).write_text(json.dumps({"media": media}))
+        return media, copied
+
+    def test_media_is_stored_once_by_content(self):
+        (self.photos / "a.jpg").write_bytes(b"photo")
+        (self.photos / "copy.jpg").write_bytes(b"photo")
+        media, copied = self.write_backup("20240101_000000")
+        self.assertEqual(copied, 1)
+        self.assertEqual(
+            media["victims/photos/a.jpg"]["sha256"],
+            media["victims/photos/copy.jpg"]["sha256"],
+        )
+
+        (self.photos / "b.jpg").write_bytes(b"another photo")
+        media, copied = self.write_backup("20240102_000000")
+        self.assertEqual(copied, 1)
+        self.assertEqual(len(media), 3)
+
+    def test_unchanged_files_reuse_previous_hashes(self):
+        path = self.photos / "a.jpg"
+        path.write_bytes(b"photo")
+        self.write_backup("20240101_000000")
+        # Same size and mtime: the stale hash is trusted rather than re-read.
+        stat = path.stat()
+        path.write_bytes(b"PHOTO")
+        os.utime(path, (stat.st_atime, stat.st_mtime))
+        media, copied = self.write_backup("20240102_000000")
+        self.assertEqual(copied, 0)
+
+    def test_rotate_removes_old_backups_and_orphaned_blobs(self):
+        (self.photos / "a.jpg").write_bytes(b"old photo")
+        self.write_backup("20240101_000000")
+        (self.photos / "a.jpg").unlink()
+        (self.photos / "b.jpg").write_bytes(b"new photo")
+        self.write_backup("20240102_000000")
+        self.write_backup("20240103_000000")
+
+        removed, orphaned = rotate(self.root, keep=2)
+        self.assertEqual(removed, ["20240101_000000"])
+        self.assertEqual(orphaned, 1)
+        self.assertEqual(len(list((self.root / "media-store").glob("*/*"))), 1)
@@ -0,0 +1,50 @@
+from types import SimpleNamespace
+
+from django.core.cache import caches
+from django.test import SimpleTestCase, TestCase
+
+from victims.benchmarking import compare, measure
+
+
+def _report(median_ms, queries):
+    return {
+        "results": {
+            "10000": {
+                "victim_list": {"median_ms": median_ms, "queries": queries},
+            }
+        }
+    }
+
+
+class BenchmarkCompareTests(SimpleTestCase):
+    def test_flags_slowdown_and_extra_queries(self):
+        regressions = compare(_report(40.0, 6), _report(20.0, 5))
+        self.assertEqual(len(regressions), 2)
+        self.assertIn("queries 5 -> 6", regressions[0])
+        self.assertIn("median 20.0ms -> 40.0ms", regressions[1])
+
+    def test_ignores_jitter_below_floor(self):
+        self.assertEqual(compare(_report(3.0, 5), _report(1.0, 5)), [])
+
+
+class MeasureTests(TestCase):
+    def test_cold_runs_clear_every_cache(self):
+        class Client:
+            def __init__(self):
+                self.cold = []
+
+            def get(self, url, secure):
+                self.cold.append(
+                    [cache.get("primed") is None for cache in caches.all()]
+                )
+                for cache in caches.all():
+                    cache.set("primed", True)
+                return SimpleNamespace(status_code=200)
+
+        client = Client()
+        measure(client, "/", repeat=2)
+        self.assertEqual(len(caches.all()), 3)
+        self.assertEqual(client.cold[1:], [[True] * 3] * 2)
+        client = Client()
+        measure(client, "/", repeat=2, warm_cache=True)
+        self.assertEqual(client.cold[1:], [[False] * 3] * 2)
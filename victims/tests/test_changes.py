@@ -0,0 +1,130 @@
+import threading
+from contextlib import ExitStack, contextmanager
+
+from django.db import connection, transaction
+from django.urls import reverse
+from rest_framework.test import APITestCase, APITransactionTestCase
+
+from victims import changes
+from victims.models import Source, Tag, Victim
+
+
+class ChangeFeedTests(APITestCase):
+    def create_victim(self, name):
+        return Victim.objects.create(
+            full_name=name,
+            city_of_death="Tehran",
+            province_or_state="Tehran",
+            country="Iran",
+        )
+
+    def fetch(self, since=0, limit=None):
+        params = {"since": since}
+        if limit:
+            params["limit"] = limit
+        response = self.client.get(reverse("change_feed"), params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_feed_reports_upserts_links_and_tombstones(self):
+        victim = self.create_victim("Neda A.")
+        tag = Tag.objects.create(name="Student", slug="student")
+        victim.tags.add(tag)
+        source = Source.objects.create(
+            victim=victim,
+            title="Report",
+            url="https://example.org/report",
+            publisher_name="Archive",
+        )
+        page = self.fetch()
+        by_model = {item["model"]: item for item in page["results"]}
+        self.assertEqual(by_model["victim"]["data"]["full_name"], "Neda A.")
+        self.assertNotIn("family_contact_private", by_model["victim"]["data"])
+        self.assertEqual(
+            by_model["victimtag"]["data"], {"victim": victim.pk, "tag": tag.pk}
+        )
+        self.assertEqual(by_model["source"]["id"], source.pk)
+
+        cursor = page["next_cursor"]
+        victim.delete()
+        page = self.fetch(cursor)
+        tombstones = {(item["model"], item["action"]) for item in page["results"]}
+        self.assertIn(("victim", "deleted"), tombstones)
+        self.assertIn(("source", "deleted"), tombstones)
+        self.assertIn(("victimtag", "deleted"), tombstones)
+        self.assertEqual(self.fetch(page["next_cursor"])["results"], [])
+
+    def test_feed_is_keyset_paginated_and_collapses_repeats(self):
+        victim = self.create_victim("Neda A.")
+        victim.short_summary = "Updated"
+        victim.save()
+        self.create_victim("Amir H.")
+        page = self.fetch(limit=2)
+        self.assertTrue(page["has_more"])
+        self.assertEqual(len(page["results"]), 1)
+        self.assertEqual(page["results"][0]["action"], "updated")
+        page = self.fetch(page["next_cursor"], limit=2)
+        self.assertFalse(page["has_more"])
+        self.assertEqual(page["results"][0]["data"]["full_name"], "Amir H.")
+
+
+@contextmanager
+def held_open(work):
+    # Runs work() in another connection's transaction, which stays open
+    # until the block exits.
+    done, release = threading.Event(), threading.Event()
+
+    def run():
+        try:
+            with transaction.atomic():
+                work()
+                done.set()
+                release.wait(10)
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    done.wait(10)
+    try:
+        yield
+    finally:
+        release.set()
+        thread.join()
+
+
+class ConcurrentChangeFeedTests(APITransactionTestCase):
+    # Entries are recorded directly: saving a victim takes row locks that
+    # would serialize the two transactions.
+    def record(self, object_id):
+        changes.record("victim", object_id, changes.Action.DELETED)
+
+    def ids(self, page):
+        return [item["id"] for item in page["results"]]
+
+    def slow_transaction(self, object_id):
+        return held_open(lambda: self.record(object_id))
+
+    def test_entries_committed_out_of_order_are_not_skipped(self):
+        # The slow transaction takes its sequence number first but commits
+        # last; the fast one is held back until it does.
+        with self.slow_transaction(1):
+            self.record(2)
+            page = changes.feed((0, 0), 10)
+            self.assertEqual(page["results"], [])
+        page = changes.feed((0, 0), 10)
+        self.assertEqual(self.ids(page), [1, 2])
+
+        # Here the fast transaction got its transaction id first, so it is
+        # served while the slow one is still open; the slow entry sorts after
+        # the cursor when it commits.
+        with ExitStack() as slow:
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT pg_current_xact_id()")
+                slow.enter_context(self.slow_transaction(3))
+                self.record(4)
+            page = changes.feed(changes.parse_cursor(page["next_cursor"]), 10)
+            self.assertEqual(self.ids(page), [4])
+        page = changes.feed(changes.parse_cursor(page["next_cursor"]), 10)
+        self.assertEqual(self.ids(page), [3])
@@ -0,0 +1,133 @@
+import io
+import tempfile
+from pathlib import Path
+
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import OperationalError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from victims import changes, health, tasks
+from victims.models import Job, Submission, Victim
+from victims.tests.test_changes import held_open
+from victims.tests.test_snapshot import STORAGES
+
+
+def refuse(execute, sql, params, many, context):
+    raise OperationalError("could not connect to server")
+
+
+class DegradedModeTests(TestCase):
+    def setUp(self):
+        directory = Path(tempfile.mkdtemp())
+        self.victim = Victim.objects.create(
+            full_name="Mahsa Amini",
+            city_of_death="Tehran",
+            province_or_state="Tehran",
+            country="Iran",
+        )
+        call_command(
+            "export_snapshot",
+            "--output",
+            str(directory / "archive.sqlite3"),
+            stdout=io.StringIO(),
+        )
+        settings = override_settings(
+            SNAPSHOT_PATH=str(directory / "archive.sqlite3"),
+            SUBMISSION_QUEUE_DIR=str(directory / "submissions"),
+            STORAGES=STORAGES,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.addCleanup(health.reset)
+        for cache in caches.all():
+            cache.clear()
+
+    def test_public_pages_switch_to_the_snapshot_and_back(self):
+        with connection.execute_wrapper(refuse):
+            listing = self.client.get(reverse("victim_list"))
+            detail = self.client.get(reverse("victim_detail", args=[self.victim.slug]))
+            api = self.client.get(reverse("victim-list"))
+            admin = self.client.get("/admin/")
+        self.assertContains(listing, "Mahsa Amini")
+        self.assertContains(listing, "temporarily read-only")
+        self.assertContains(detail, "Mahsa Amini")
+        self.assertEqual(api.json()["count"], 1)
+        self.assertEqual(admin.status_code, 503)
+
+        # Until the next health check the database is left alone.
+        with self.assertNumQueries(0):
+            self.assertContains(self.client.get("/"), "temporarily read-only")
+        with self.settings(SNAPSHOT_FALLBACK_RETRY=0):
+            response = self.client.get(reverse("victim_list"))
+        self.assertNotContains(response, "temporarily read-only")
+
+    def test_worker_keeps_the_snapshot_fresh(self):
+        Victim.objects.create(
+            full_name="Nika Shakarami",
+            city_of_death="Tehran",
+            province_or_state="Tehran",
+            country="Iran",
+        )
+        tasks.refresh_snapshot()
+        self.assertTrue(Job.objects.filter(name="snapshot.refresh").exists())
+        with connection.execute_wrapper(refuse):
+            self.assertContains(self.client.get(reverse("victim_list")), "Nika")
+
+    def test_corrections_are_queued_to_disk_and_replayed(self):
+        data = {"details": "Date of death is 16 September.", "source_urls": ""}
+        with connection.execute_wrapper(refuse):
+            url = reverse("submit_correction_for_victim", args=[self.victim.slug])
+            self.assertContains(self.client.get(url), "temporarily read-only")
+            response = self.client.post(url, data)
+        self.assertRedirects(
+            response, reverse("victim_list"), fetch_redirect_response=False
+        )
+        self.assertFalse(Submission.objects.exists())
+
+        out = io.StringIO()
+        call_command("replay_submissions", stdout=out)
+        self.assertIn("Replayed 1 submissions", out.getvalue())
+        submission = Submission.objects.get()
+        self.assertEqual(submission.victim, self.victim)
+        self.assertEqual(
+            submission.proposed_data["details"], "Date of death is 16 September."
+        )
+
+
+class SnapshotRefreshTests(TransactionTestCase):
+    def edit(self, victim, summary):
+        Victim.objects.filter(pk=victim.pk).update(short_summary=summary)
+        changes.record("victim", victim.pk, changes.Action.UPDATED)
+
+    def test_refresh_picks_up_edits_committed_after_a_run(self):
+        path = Path(tempfile.mkdtemp()) / "archive.sqlite3"
+        slow, fast = (
+            Victim.objects.create(
+                full_name=name,
+                city_of_death="Tehran",
+                province_or_state="Tehran",
+                country="Iran",
+            )
+            for name in ("Slow Victim", "Fast Victim")
+        )
+
+        def refresh():
+            # As the worker runs it: inside the job's transaction.
+            with transaction.atomic():
+                tasks.refresh_snapshot()
+
+        with override_settings(SNAPSHOT_PATH=str(path), STORAGES=STORAGES):
+            refresh()
+            with held_open(lambda: self.edit(slow, "Committed late")):
+                self.edit(fast, "Committed early")
+                refresh()
+            refresh()
+            self.addCleanup(health.reset)
+            for cache in caches.all():
+                cache.clear()
+            with connection.execute_wrapper(refuse):
+                listing = self.client.get(reverse("victim_list"))
+        self.assertContains(listing, "Committed late")
+        self.assertContains(listing, "Committed early")
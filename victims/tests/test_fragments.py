@@ -0,0 +1,63 @@
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from victims.models import Source, Tag, Victim
+from victims.tests.test_snapshot import STORAGES
+
+
+@override_settings(STORAGES=STORAGES)
+class FragmentCacheTests(TestCase):
+    def setUp(self):
+        caches["default"].clear()
+        caches["fragments"].clear()
+        self.victim = Victim.objects.create(
+            full_name="Mahsa Amini",
+            city_of_death="Tehran",
+            province_or_state="Tehran",
+            country="Iran",
+        )
+        self.other = Victim.objects.create(
+            full_name="Nika Shakarami",
+            city_of_death="Tehran",
+            province_or_state="Tehran",
+            country="Iran",
+        )
+
+    def test_versions_are_bumped_by_related_changes(self):
+        versions = [self.victim.cache_version]
+        self.victim.short_summary = "Updated"
+        self.victim.save()
+        versions.append(self.victim.cache_version)
+        source = Source.objects.create(
+            victim=self.victim, title="Report", url="https://example.com/report"
+        )
+        self.victim.tags.add(Tag.objects.create(name="Student", slug="student"))
+        source.delete()
+        self.victim.refresh_from_db()
+        versions.append(self.victim.cache_version)
+        self.assertEqual(versions, [1, 2, 5])
+
+    def test_profile_sections_are_served_from_cache(self):
+        url = reverse("victim_detail", args=[self.victim.slug])
+        self.client.get(url)
+        # The victim and its related profiles.
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertContains(response, "Sources pending.")
+
+        Source.objects.create(
+            victim=self.victim, title="Witness report", url="https://example.com/w"
+        )
+        self.assertContains(self.client.get(url), "Witness report")
+
+    def test_list_only_loads_relations_for_changed_cards(self):
+        url = reverse("victim_list")
+        self.client.get(url, {"sort": "alpha"})
+        self.victim.tags.add(Tag.objects.create(name="Student", slug="student"))
+        # Another filter combination, so the page itself is not cached. The
+        # tag write also retired the cached tag counts: one query for the
+        # change version and one to recount.
+        with self.assertNumQueries(7):
+            response = self.client.get(url, {"sort": "age"})
+        self.assertContains(response, '<span class="badge bg-tag">Student</span>')
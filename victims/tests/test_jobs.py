@@ -0,0 +1,95 @@
+import datetime
+import time
+
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from victims import jobs
+from victims.models import Job
+
+calls = []
+
+
+@jobs.handler("tests.record")
+def record(value):
+    calls.append(value)
+
+
+@jobs.handler("tests.fail", max_attempts=2)
+def fail():
+    raise RuntimeError("boom")
+
+
+@jobs.handler("tests.slow")
+def slow(seconds, timeout):
+    # Outlives the lock timeout, then looks for stale jobs as a worker would.
+    time.sleep(seconds)
+    calls.append(jobs.requeue_stale(timeout=timeout))
+
+
+@override_settings(JOB_RETRY_DELAY=10, JOB_RETRY_MAX_DELAY=60)
+class JobQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_jobs_run_by_priority_and_are_removed(self):
+        jobs.enqueue("tests.record", {"value": "low"})
+        jobs.enqueue("tests.record", {"value": "high"}, priority=5)
+        jobs.enqueue("tests.record", {"value": "later"}, priority=9, delay=60)
+        self.assertEqual(jobs.run_pending(), 2)
+        self.assertEqual(calls, ["high", "low"])
+        self.assertEqual(
+            list(Job.objects.values_list("payload", flat=True)), [{"value": "later"}]
+        )
+
+    def test_unique_key_collapses_queued_duplicates(self):
+        self.assertIsNotNone(jobs.enqueue("tests.record", {"value": 1}, unique_key="k"))
+        self.assertIsNone(jobs.enqueue("tests.record", {"value": 2}, unique_key="k"))
+        jobs.run_pending()
+        self.assertEqual(calls, [1])
+        self.assertIsNotNone(jobs.enqueue("tests.record", {"value": 3}, unique_key="k"))
+
+    def test_failures_back_off_then_dead_letter(self):
+        job = jobs.enqueue("tests.fail")
+        jobs.run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.Status.QUEUED, 1))
+        self.assertGreater(job.run_at, timezone.now() + datetime.timedelta(seconds=7))
+        self.assertIn("RuntimeError: boom", job.last_error)
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        jobs.run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.Status.DEAD, 2))
+        self.assertEqual(jobs.run_pending(), 0)
+
+        self.assertEqual(jobs.retry(Job.objects.all()), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.Status.QUEUED, 0))
+
+    def test_jobs_orphaned_by_a_dead_worker_are_requeued(self):
+        job = jobs.enqueue("tests.record", {"value": "x"})
+        self.assertEqual(jobs.claim("gone"), [job])
+        self.assertEqual(jobs.claim("other"), [])
+        Job.objects.filter(pk=job.pk).update(
+            locked_at=timezone.now() - datetime.timedelta(hours=1)
+        )
+        self.assertEqual(jobs.requeue_stale(timeout=60), (1, 0))
+        jobs.run_pending()
+        self.assertEqual(calls, ["x"])
+
+    def test_unknown_jobs_are_refused(self):
+        with self.assertRaises(ValueError):
+            jobs.enqueue("tests.missing")
+
+
+class JobHeartbeatTests(TransactionTestCase):
+    def setUp(self):
+        calls.clear()
+
+    @override_settings(JOB_HEARTBEAT_INTERVAL=0.05)
+    def test_long_runs_keep_their_lock(self):
+        jobs.enqueue("tests.slow", {"seconds": 0.5, "timeout": 0.2})
+        self.assertEqual(jobs.run_pending(), 1)
+        self.assertEqual(calls, [(0, 0)])
+        self.assertFalse(Job.objects.exists())
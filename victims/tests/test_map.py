@@ -0,0 +1,97 @@
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from victims import gazetteer, rollups
+from victims.models import ChangeLogEntry, MapCluster, Victim
+
+
+def make_victim(city, province="", country="Iran", **fields):
+    return Victim.objects.create(
+        full_name=f"Victim in {city}",
+        city_of_death=city,
+        province_or_state=province,
+        country=country,
+        **fields,
+    )
+
+
+class GazetteerTests(TestCase):
+    def test_resolves_names_aliases_and_persian_spellings(self):
+        tehran = gazetteer.resolve("Tehran", "Tehran", "Iran")
+        self.assertEqual(tehran[2], "city")
+        self.assertAlmostEqual(tehran[0], 35.69, places=1)
+        self.assertEqual(
+            gazetteer.resolve("Bandar-e Abbas", "", "Iran")[:2],
+            gazetteer.resolve("بندرعباس", "هرمزگان", "ایران")[:2],
+        )
+        # Arabic kaf/yeh variants and zero-width non-joiners are normalized.
+        self.assertEqual(gazetteer.resolve("كرج", "البرز", "")[2], "city")
+
+    def test_falls_back_to_province_then_gives_up(self):
+        self.assertEqual(
+            gazetteer.resolve("Unknown village", "Kurdistan Province", "Iran")[2],
+            "province",
+        )
+        self.assertIsNone(gazetteer.resolve("Unknown", "Nowhere", "Iran"))
+        self.assertIsNone(gazetteer.resolve("Tehran", "", "Canada"))
+
+    def test_victims_are_located_on_save(self):
+        victim = make_victim("Zahedan", "Sistan and Baluchestan")
+        self.assertEqual(victim.location_precision, "city")
+        victim.city_of_death, victim.country = "Toronto", "Canada"
+        victim.save()
+        victim.refresh_from_db()
+        self.assertIsNone(victim.latitude)
+        self.assertEqual(victim.location_precision, "")
+
+
+class MapClusterTests(APITestCase):
+    def setUp(self):
+        for city, province, count in [
+            ("Tehran", "Tehran", 3),
+            ("Karaj", "Alborz", 2),
+            ("Zahedan", "Sistan and Baluchestan", 1),
+        ]:
+            for _ in range(count):
+                make_victim(city, province)
+        make_victim("Somewhere", "Unknown")
+        rollups.rebuild_map_clusters()
+
+    def test_clusters_merge_when_zoomed_out_and_split_when_zoomed_in(self):
+        far = self.client.get(reverse("map_clusters"), {"zoom": 1}).data
+        self.assertEqual([cluster[2] for cluster in far["clusters"]], [6])
+        near = self.client.get(reverse("map_clusters"), {"zoom": 9}).data
+        self.assertEqual(sorted(cluster[2] for cluster in near["clusters"]), [1, 2, 3])
+        beyond = self.client.get(reverse("map_clusters"), {"zoom": 30})
+        self.assertEqual(beyond.data["zoom"], 12)
+        self.assertIn("max-age=", beyond["Cache-Control"])
+
+    def test_bbox_limits_clusters(self):
+        response = self.client.get(
+            reverse("map_clusters"), {"zoom": 9, "bbox": "59,25,63,32"}
+        )
+        self.assertEqual([cluster[2] for cluster in response.data["clusters"]], [1])
+        bad = self.client.get(reverse("map_clusters"), {"bbox": "1,2,3"})
+        self.assertEqual(bad.status_code, 400)
+
+    def test_geocode_command_backfills_rows(self):
+        Victim.objects.update(latitude=None, longitude=None, location_precision="")
+        MapCluster.objects.all().delete()
+        versions = dict(Victim.objects.values_list("pk", "cache_version"))
+        call_command("geocode_victims", stdout=open("/dev/null", "w"))
+        self.assertEqual(Victim.objects.filter(latitude__isnull=False).count(), 6)
+        self.assertTrue(MapCluster.objects.filter(zoom=0).exists())
+        self.assertEqual(
+            ChangeLogEntry.objects.filter(model="victim", action="updated").count(), 6
+        )
+        for pk, version in Victim.objects.filter(latitude__isnull=False).values_list(
+            "pk", "cache_version"
+        ):
+            self.assertEqual(version, versions[pk] + 1)
+        # A second run finds nothing to move.
+        call_command("geocode_victims", stdout=open("/dev/null", "w"))
+        self.assertEqual(
+            ChangeLogEntry.objects.filter(model="victim", action="updated").count(), 6
+        )
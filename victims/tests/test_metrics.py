@@ -0,0 +1,34 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from victims.models import Victim
+
+
+class MetricsEndpointTests(TestCase):
+    def setUp(self):
+        Victim.objects.create(
+            full_name="Neda A.",
+            city_of_death="Tehran",
+            province_or_state="Tehran",
+            country="Iran",
+        )
+
+    def test_metrics_exposes_request_histograms(self):
+        self.client.get(reverse("victim-list"))
+        response = self.client.get(reverse("metrics"), REMOTE_ADDR="127.0.0.1")
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn("memorial_request_latency_seconds_bucket", body)
+        self.assertIn('url_name="victim-list"', body)
+        self.assertIn("memorial_db_queries_per_request", body)
+
+    def test_metrics_rejects_unknown_clients(self):
+        response = self.client.get(reverse("metrics"), REMOTE_ADDR="203.0.113.9")
+        self.assertEqual(response.status_code, 403)
+
+    def test_metrics_allows_staff(self):
+        user = get_user_model().objects.create_user("ops", password="x", is_staff=True)
+        self.client.force_login(user)
+        response = self.client.get(reverse("metrics"), REMOTE_ADDR="203.0.113.9")
+        self.assertEqual(response.status_code, 200)
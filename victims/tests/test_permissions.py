@@ -0,0 +1,62 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.db.models import F
+from django.test import TestCase
+
+from victims.models import AuthCacheVersion
+from victims.permissions import group_names, is_moderator
+
+
+class PermissionCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.moderators = Group.objects.create(name="Moderator")
+        self.user = get_user_model().objects.create_user("mod", password="x")
+
+    def fresh_user(self):
+        return get_user_model().objects.get(pk=self.user.pk)
+
+    def test_group_lookup_is_cached_per_request_and_across_requests(self):
+        self.user.groups.add(self.moderators)
+        user = self.fresh_user()
+        # The cache versions, then the groups.
+        with self.assertNumQueries(2):
+            self.assertTrue(is_moderator(user))
+            self.assertTrue(is_moderator(user))
+        user = self.fresh_user()
+        with self.assertNumQueries(1):
+            self.assertTrue(is_moderator(user))
+
+    def test_membership_change_invalidates(self):
+        self.assertEqual(group_names(self.fresh_user()), frozenset())
+        self.user.groups.add(self.moderators)
+        self.assertTrue(is_moderator(self.fresh_user()))
+        self.user.groups.remove(self.moderators)
+        self.assertFalse(is_moderator(self.fresh_user()))
+
+    def test_group_permission_change_invalidates_permissions(self):
+        self.user.groups.add(self.moderators)
+        self.assertFalse(self.fresh_user().has_perm("victims.change_victim"))
+        self.moderators.permissions.add(
+            Permission.objects.get(codename="change_victim")
+        )
+        user = self.fresh_user()
+        with self.assertNumQueries(3):
+            self.assertTrue(user.has_perm("victims.change_victim"))
+        user = self.fresh_user()
+        with self.assertNumQueries(1):
+            self.assertTrue(user.has_perm("victims.change_victim"))
+
+    def test_invalidation_from_another_process_retires_cached_entries(self):
+        self.assertFalse(is_moderator(self.fresh_user()))
+        # Another worker changes the membership: its signals only reach the
+        # shared database, never this process's cache.
+        self.user.groups.through.objects.bulk_create(
+            [self.user.groups.through(user=self.user, group=self.moderators)]
+        )
+        self.assertFalse(is_moderator(self.fresh_user()))
+        AuthCacheVersion.objects.filter(scope=f"user:{self.user.pk}").update(
+            version=F("version") + 1
+        )
+        self.assertTrue(is_moderator(self.fresh_user()))
@@ -0,0 +1,136 @@
+import io
+import tempfile
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from victims import jobs
+from victims.models import ChangeLogEntry, Photo, Victim
+from victims.storage import find_near_duplicates, perceptual_bands
+
+
+def jpeg(color=(120, 40, 40), size=(64, 48), name="photo.jpg"):
+    buffer = io.BytesIO()
+    image = Image.new("RGB", size, color)
+    # A gradient gives the perceptual hash something to work with.
+    for x in range(size[0]):
+        image.putpixel((x, 0), (x * 4 % 256, 0, 0))
+    image.save(buffer, "JPEG")
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/jpeg")
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ContentAddressedPhotoTests(TestCase):
+    def setUp(self):
+        self.victims = [
+            Victim.objects.create(
+                full_name=name,
+                city_of_death="Tehran",
+                province_or_state="Tehran",
+                country="Iran",
+            )
+            for name in ("Sarina E.", "Hadis N.")
+        ]
+
+    def test_identical_uploads_share_one_file(self):
+        first = Photo.objects.create(victim=self.victims[0], image=jpeg())
+        second = Photo.objects.create(victim=self.victims[1], image=jpeg(name="x.jpg"))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertIn(first.content_hash, first.image.name)
+        jobs.run_pending()
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(second.near_duplicate_of, first)
+
+        storage = first.image.storage
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(storage.exists(second.image.name))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(storage.exists(second.image.name))
+
+    def test_large_uploads_are_resized_by_the_processing_job(self):
+        photo = Photo.objects.create(
+            victim=self.victims[0], image=jpeg(size=(2400, 1200))
+        )
+        original = photo.image.name
+        self.assertIsNone(photo.perceptual_hash)
+        with self.captureOnCommitCallbacks(execute=True):
+            jobs.run_pending()
+        photo.refresh_from_db()
+        self.assertNotEqual(photo.image.name, original)
+        self.assertIn(photo.content_hash, photo.image.name)
+        self.assertIsNotNone(photo.perceptual_hash)
+        with Image.open(photo.image.path) as stored:
+            self.assertEqual(stored.size, (2000, 1000))
+        self.assertFalse(photo.image.storage.exists(original))
+        self.assertTrue(
+            ChangeLogEntry.objects.filter(
+                model="photo", object_id=photo.pk, action="updated"
+            ).exists()
+        )
+
+    def test_dedupe_command_merges_existing_files(self):
+        storage = Photo._meta.get_field("image").storage
+        names = [
+            storage.save(f"victims/photos/2024/01/{name}.jpg", jpeg())
+            for name in ("a", "b")
+        ]
+        Photo.objects.bulk_create(
+            Photo(victim=victim, image=name)
+            for victim, name in zip(self.victims, names)
+        )
+        call_command("dedupe_photos", stdout=io.StringIO())
+
+        first, second = Photo.objects.order_by("pk")
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(second.near_duplicate_of, first)
+        self.assertFalse(any(storage.exists(name) for name in names))
+        self.assertTrue(storage.exists(first.image.name))
+
+    def test_dedupe_command_skips_unreadable_files(self):
+        storage = Photo._meta.get_field("image").storage
+        data = jpeg().read()
+        name = storage.save(
+            "victims/photos/2024/01/truncated.jpg",
+            SimpleUploadedFile("truncated.jpg", data[: len(data) // 2]),
+        )
+        photo = Photo.objects.create(victim=self.victims[0], image=name)
+        out, err = io.StringIO(), io.StringIO()
+        call_command("dedupe_photos", stdout=out, stderr=err)
+        self.assertIn("1 missing or unreadable", out.getvalue())
+        self.assertIn(f"Skipped {name}", err.getvalue())
+        photo.refresh_from_db()
+        self.assertEqual((photo.image.name, photo.content_hash), (name, ""))
+
+
+class NearDuplicateTests(TestCase):
+    def test_matches_point_to_the_earliest_similar_photo(self):
+        base = 0b1011 << 40
+        items = [(1, base), (2, base ^ 0b111), (3, base), (4, base ^ (0xFF << 8))]
+        matches = find_near_duplicates(items, distance=6)
+        self.assertEqual(matches, {2: 1, 3: 1})
+
+    def test_photos_are_matched_through_their_hash_bands(self):
+        victim = Victim.objects.create(
+            full_name="Kian P.",
+            city_of_death="Izeh",
+            province_or_state="Khuzestan",
+            country="Iran",
+        )
+        base = -0x1234_5678_9ABC_DEF0
+        photos = Photo.objects.bulk_create(
+            Photo(victim=victim, image=f"{index}.jpg", perceptual_hash=value)
+            for index, value in enumerate([base, base ^ 0x0101_0101_0101, base ^ 0b111])
+        )
+        for photo in photos:
+            photo.refresh_from_db()
+            self.assertEqual(
+                photo.perceptual_bands, perceptual_bands(photo.perceptual_hash)
+            )
+        # Six bits apart but in six different bands: still found.
+        self.assertEqual(photos[1].find_near_duplicate(), photos[0])
+        self.assertEqual(photos[0].find_near_duplicate(), photos[2])
@@ -0,0 +1,99 @@
+import json
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from victims import profiling
+from victims.models import Victim
+from victims.tests.test_snapshot import STORAGES
+
+
+def busy_loop(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+class SamplerTests(SimpleTestCase):
+    def test_samples_are_folded_into_counted_stacks(self):
+        sampler = profiling.Sampler(threading.get_ident(), 0.001)
+        sampler.start()
+        busy_loop(0.1)
+        sampler.stop()
+        lines = sampler.folded().splitlines()
+        self.assertTrue(lines)
+        stack, count = lines[0].rsplit(" ", 1)
+        self.assertGreater(int(count), 0)
+        self.assertTrue(
+            any(
+                "victims/tests/test_profiling.py:busy_loop" in line.split(";")[-1]
+                for line in lines
+            )
+        )
+
+
+@override_settings(STORAGES=STORAGES, PROFILER_INTERVAL=0.001)
+class ProfilerMiddlewareTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        self.enterContext(override_settings(PROFILER_DIR=directory.name))
+        self.victim = Victim.objects.create(
+            full_name="Mahsa A.",
+            city_of_death="Tehran",
+            province_or_state="Tehran",
+            country="Iran",
+        )
+        self.url = reverse("victim_detail", args=[self.victim.slug])
+
+    def test_staff_header_profiles_a_request(self):
+        self.assertNotIn("X-Profile-Id", self.client.get(self.url, HTTP_X_PROFILE="1"))
+        staff = get_user_model().objects.create_user("staff", is_staff=True)
+        self.client.force_login(staff)
+        self.assertNotIn("X-Profile-Id", self.client.get(self.url))
+
+        response = self.client.get(self.url, HTTP_X_PROFILE="1")
+        capture_id = response["X-Profile-Id"]
+        capture = json.loads((self.directory / f"{capture_id}.json").read_text())
+        self.assertEqual(capture["view"], "victim_detail")
+        self.assertEqual(capture["status"], 200)
+        self.assertTrue(
+            any("victims_victim" in query["sql"] for query in capture["queries"])
+        )
+        self.assertIn(
+            "victims/victim_detail.html",
+            [template["name"] for template in capture["templates"]],
+        )
+        self.assertTrue((self.directory / f"{capture_id}.folded").exists())
+
+        listing = self.client.get(reverse("profiles"))
+        self.assertContains(listing, "victim_detail")
+        self.assertContains(listing, reverse("profile_download", args=[capture_id]))
+        download = self.client.get(reverse("profile_timeline", args=[capture_id]))
+        self.assertEqual(json.loads(b"".join(download.streaming_content)), capture)
+
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse("profiles")).status_code, 403)
+        download = self.client.get(reverse("profile_download", args=[capture_id]))
+        self.assertEqual(download.status_code, 403)
+
+    @override_settings(PROFILER_SAMPLE_RATE=1.0, PROFILER_MAX_FILES=2)
+    def test_sampled_requests_rotate_old_captures(self):
+        ids = [self.client.get(self.url)["X-Profile-Id"] for _ in range(3)]
+        self.assertEqual(
+            sorted(path.name for path in self.directory.iterdir()),
+            sorted(
+                f"{capture_id}{suffix}"
+                for capture_id in ids[1:]
+                for suffix in (".folded", ".json")
+            ),
+        )
+        slowest = profiling.slowest_by_view(1)
+        self.assertEqual(list(slowest), ["victim_detail"])
+        self.assertEqual(len(slowest["victim_detail"]), 1)
@@ -0,0 +1,69 @@
+import tempfile
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from victims import query_plans
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        query_plans.seed()
+
+    def test_hot_queries_use_their_indexes(self):
+        results = query_plans.run_checks()
+        self.assertEqual(len(results), len(query_plans.hot_queries()))
+        failing = [name for name, (problems, _) in results.items() if problems]
+        self.assertEqual(
+            failing,
+            [],
+            "\n" + query_plans.report(results, query_plans.recorded_shapes()),
+        )
+
+    def test_recorded_shapes_cover_every_hot_query(self):
+        self.assertEqual(
+            set(query_plans.recorded_shapes()),
+            {query.name for query in query_plans.hot_queries()},
+        )
+
+
+class PlanCheckTests(SimpleTestCase):
+    def test_reports_scans_cost_and_query_count_with_a_diff(self):
+        plan = {
+            "Node Type": "Limit",
+            "Total Cost": 250.0,
+            "Plans": [
+                {
+                    "Node Type": "Seq Scan",
+                    "Relation Name": "victims_victim",
+                    "Total Cost": 240.0,
+                }
+            ],
+        }
+        query = query_plans.HotQuery(
+            "victim_list", None, indexes=(("victims_victim", ("created_at",)),)
+        )
+        indexes = {"victims_victim_pkey": ("victims_victim", ("id",))}
+        problems = query_plans.check(query, plan, 2, indexes)
+        self.assertEqual(
+            problems,
+            [
+                "no index scan on victims_victim(created_at)",
+                "sequential scan on victims_victim",
+                "cost 250.0 over 100.0",
+                "2 queries, expected 1",
+            ],
+        )
+        text = query_plans.report(
+            {"victim_list": (problems, query_plans.shape(plan))},
+            {
+                "victim_list": [
+                    "Limit",
+                    "  Index Scan using victims_vic_created_b26ddc_idx "
+                    "on victims_victim",
+                ]
+            },
+        )
+        self.assertIn("-  Index Scan using", text)
+        self.assertIn("+  Seq Scan on victims_victim", text)
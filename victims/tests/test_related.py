@@ -0,0 +1,77 @@
+import datetime
+
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from victims import jobs
+from victims.models import RelatedVictim, Tag, Victim
+from victims.tests.test_snapshot import STORAGES
+
+
+def related_names(victim):
+    return [
+        link.related.full_name
+        for link in RelatedVictim.objects.filter(victim=victim).select_related(
+            "related"
+        )
+    ]
+
+
+@override_settings(STORAGES=STORAGES, RELATED_PROFILES_COUNT=2)
+class RelatedProfileTests(APITestCase):
+    def make_victim(self, name, city="Tehran", day=20, biography=""):
+        return Victim.objects.create(
+            full_name=name,
+            city_of_death=city,
+            province_or_state=city,
+            country="Iran",
+            date_of_death=datetime.date(2022, 9, day),
+            biography=biography,
+        )
+
+    def setUp(self):
+        self.mahsa = self.make_victim("Mahsa A.", biography="Student from Saqqez")
+        self.nika = self.make_victim("Nika S.", day=21, biography="Student, Saqqez")
+        self.hadis = self.make_victim("Hadis N.", city="Karaj", day=21)
+        self.khodanur = self.make_victim("Khodanur L.", city="Zahedan", day=30)
+        student = Tag.objects.create(name="Student", slug="student")
+        self.mahsa.tags.add(student)
+        self.khodanur.tags.add(student)
+        jobs.run_pending()
+
+    def test_profiles_are_ranked_on_place_date_tags_and_text(self):
+        self.assertEqual(related_names(self.mahsa), ["Nika S.", "Khodanur L."])
+        self.assertEqual(related_names(self.hadis), ["Nika S.", "Mahsa A."])
+
+        response = self.client.get(reverse("victim_detail", args=[self.mahsa.slug]))
+        self.assertContains(response, "Related profiles")
+        self.assertContains(response, f'href="/victims/{self.nika.slug}/"')
+
+        url = reverse("victim-detail", args=[self.mahsa.pk])
+        with self.assertNumQueries(5):
+            response = self.client.get(url, {"expand": "related"})
+        self.assertEqual(
+            [item["slug"] for item in response.data["related"]],
+            [self.nika.slug, self.khodanur.slug],
+        )
+        self.assertNotIn("related", self.client.get(url).data)
+
+    def test_edits_refresh_the_profile_and_the_lists_showing_it(self):
+        self.nika.city_of_death = "Zahedan"
+        self.nika.date_of_death = datetime.date(2022, 9, 1)
+        self.nika.biography = ""
+        self.nika.save()
+        jobs.run_pending()
+        self.assertNotIn("Nika S.", related_names(self.mahsa))
+        self.assertEqual(related_names(self.nika)[0], "Khodanur L.")
+
+        self.khodanur.delete()
+        jobs.run_pending()
+        self.assertEqual(related_names(self.mahsa), ["Hadis N."])
+
+    def test_new_profiles_join_the_lists_of_their_candidates(self):
+        self.make_victim("Armita G.", biography="Student from Saqqez")
+        jobs.run_pending()
+        self.assertIn("Armita G.", related_names(self.mahsa))
+        self.assertIn("Armita G.", related_names(self.nika))
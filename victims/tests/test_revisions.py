@@ -0,0 +1,121 @@
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from victims import revisions
+from victims.models import Revision, Source, Victim
+
+
+class RevisionTests(APITestCase):
+    def setUp(self):
+        self.victim = Victim.objects.create(
+            full_name="Neda A.",
+            city_of_death="Tehran",
+            province_or_state="Tehran",
+            country="Iran",
+        )
+
+    def edit(self, **fields):
+        for name, value in fields.items():
+            setattr(self.victim, name, value)
+        self.victim.save()
+
+    def history(self):
+        return list(Revision.objects.filter(model="victim", object_id=self.victim.pk))
+
+    @override_settings(REVISION_SNAPSHOT_EVERY=3)
+    def test_deltas_hold_changed_fields_between_snapshots(self):
+        self.edit(age=22)
+        self.edit(age=22)
+        self.edit(occupation="Student", date_of_death=datetime.date(2022, 9, 20))
+        self.edit(age=23)
+        kinds = [revision.kind for revision in self.history()]
+        self.assertEqual(kinds, ["snapshot", "delta", "delta", "snapshot"])
+        self.assertEqual(
+            self.history()[2].data,
+            {"occupation": "Student", "date_of_death": "2022-09-20"},
+        )
+
+        first, second, third, _ = self.history()
+        state, revision = revisions.state_at("victim", self.victim.pk, third.pk)
+        self.assertEqual(revision, third)
+        self.assertEqual(state["age"], 22)
+        self.assertEqual(state["date_of_death"], "2022-09-20")
+        with self.assertNumQueries(1):
+            state, _ = revisions.state_at("victim", self.victim.pk, second.pk)
+        self.assertEqual((state["age"], state["occupation"]), (22, ""))
+        state, _ = revisions.state_at("victim", self.victim.pk)
+        self.assertEqual(state, revisions.serialize(self.victim))
+
+    def test_moderators_can_browse_and_diff_history(self):
+        self.edit(age=22)
+        Revision.objects.update(created_at=timezone.now() - datetime.timedelta(days=2))
+        self.edit(age=23, occupation="Student")
+        first, second, third = self.history()
+        url = reverse("victim-history", args=[self.victim.pk])
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        user = get_user_model().objects.create_superuser("mod", password="x")
+        self.client.force_authenticate(user)
+        self.client.patch(
+            reverse("victim-detail", args=[self.victim.pk]), {"age": 24}, format="json"
+        )
+        page = self.client.get(url).data
+        self.assertEqual(page["results"][0]["user"], "mod")
+        self.assertEqual(page["results"][0]["fields"], ["age"])
+        yesterday = (timezone.now() - datetime.timedelta(days=1)).isoformat()
+        response = self.client.get(url, {"at": yesterday})
+        self.assertEqual(response.data["revision"], second.pk)
+        self.assertEqual(response.data["data"]["age"], 22)
+
+        url = reverse("victim-diff", args=[self.victim.pk])
+        response = self.client.get(url, {"from": first.pk, "to": third.pk})
+        self.assertEqual(
+            response.data["changes"],
+            {
+                "age": {"from": None, "to": 23},
+                "occupation": {"from": "", "to": "Student"},
+            },
+        )
+        source = Source.objects.create(
+            victim=self.victim, title="Report", url="https://example.org/r"
+        )
+        other = Revision.objects.get(model="source", object_id=source.pk)
+        self.assertEqual(self.client.get(url, {"from": other.pk}).status_code, 400)
+
+        # History outlives the victim.
+        self.victim.delete()
+        response = self.client.get(url, {"from": third.pk})
+        self.assertEqual(response.data["changes"]["full_name"]["to"], None)
+
+    def test_compaction_keeps_the_state_at_the_cutoff(self):
+        self.edit(age=22)
+        self.edit(occupation="Student")
+        cutoff = timezone.now()
+        self.edit(age=23)
+        Revision.objects.filter(created_at__lt=cutoff).update(
+            created_at=cutoff - datetime.timedelta(days=1)
+        )
+        gone = Victim.objects.create(
+            full_name="Removed", city_of_death="Tehran", province_or_state="Tehran"
+        )
+        gone_id = gone.pk
+        gone.delete()
+        Revision.objects.filter(model="victim", object_id=gone_id).update(
+            created_at=cutoff - datetime.timedelta(days=1)
+        )
+
+        self.assertEqual(revisions.compact(cutoff), 4)
+        kinds = [revision.kind for revision in self.history()]
+        self.assertEqual(kinds, ["snapshot", "delta"])
+        state, _ = revisions.state_at("victim", self.victim.pk, self.history()[0].pk)
+        self.assertEqual((state["age"], state["occupation"]), (22, "Student"))
+        state, _ = revisions.state_at("victim", self.victim.pk)
+        self.assertEqual(state["age"], 23)
+        self.assertFalse(
+            Revision.objects.filter(model="victim", object_id=gone_id).exists()
+        )
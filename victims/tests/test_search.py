@@ -0,0 +1,99 @@
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from victims import jobs, search
+from victims.models import Victim
+from victims.tests.test_snapshot import STORAGES
+
+
+@override_settings(STORAGES=STORAGES)
+class SearchCacheTests(TestCase):
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        for index in range(14):
+            Victim.objects.create(
+                full_name=f"Amini {index}",
+                biography="Amini" if index == 3 else "",
+                city_of_death="Tehran",
+                province_or_state="Tehran",
+                country="Iran",
+            )
+        jobs.run_pending()
+
+    def search(self, q, **params):
+        caches["default"].clear()
+        response = self.client.get(reverse("victim_list"), {"q": q, **params})
+        self.assertEqual(response.status_code, 200)
+        return [victim.full_name for victim in response.context["page_obj"]]
+
+    def test_key_ignores_case_and_spacing(self):
+        self.assertEqual(
+            search.cache_key({"q": "Mahsa  AMINI", "city": ""}, 7),
+            search.cache_key({"q": " mahsa amini"}, 7),
+        )
+        self.assertNotEqual(
+            search.cache_key({"q": "amini"}, 7), search.cache_key({"q": "amini"}, 8)
+        )
+
+    def test_pages_reuse_the_ranked_ids(self):
+        first = self.search("amini")
+        # Ranked, not by recency: the biography mention scores higher.
+        self.assertEqual(first[0], "Amini 3")
+        self.assertEqual(len(first), 12)
+        # Change version, the page's victims with their tags and photos, and
+        # the tag picker; no search query.
+        with self.assertNumQueries(5):
+            second = self.search("  AMINI ", page=2)
+        self.assertEqual(len(second), 2)
+        self.assertFalse(set(first) & set(second))
+
+    @override_settings(SEARCH_CACHE_MAX_IDS=5)
+    def test_large_result_sets_are_paged_in_the_database(self):
+        first = self.search("amini")
+        self.assertEqual(first[0], "Amini 3")
+        with CaptureQueriesContext(connection) as captured:
+            second = self.search("amini", page=2)
+        self.assertEqual(len(second), 2)
+        self.assertFalse(set(first) & set(second))
+        # The count and tag picker come from the cache; only the page is
+        # ranked, and no id list is loaded.
+        searches = [query["sql"] for query in captured if "@@" in query["sql"]]
+        self.assertEqual(len(searches), 1)
+        self.assertIn("OFFSET 12", searches[0])
+
+    def test_writes_retire_cached_results(self):
+        self.search("amini", page=2)
+        Victim.objects.create(
+            full_name="Amini 14",
+            city_of_death="Tehran",
+            province_or_state="Tehran",
+            country="Iran",
+        )
+        jobs.run_pending()
+        self.assertEqual(len(self.search("amini", page=2)), 3)
+
+    def test_list_tag_counts_are_cached_across_pages_and_sorts(self):
+        def counted(**params):
+            caches["default"].clear()
+            with CaptureQueriesContext(connection) as captured:
+                response = self.client.get(reverse("victim_list"), params)
+            scans = sum("unnest" in query["sql"] for query in captured)
+            return response.context["tags"], scans
+
+        Victim.objects.first().tags.create(name="Student", slug="student")
+        tags, scans = counted(city="tehran")
+        self.assertEqual(
+            [(tag.slug, tag.victim_count) for tag in tags], [("student", 1)]
+        )
+        self.assertEqual(scans, 1)
+        self.assertEqual(counted(city="tehran", page=2, sort="alpha")[1], 0)
+        self.assertEqual(counted(city="karaj")[1], 1)
+
+        Victim.objects.last().tags.add(tags[0])
+        tags, scans = counted(city="tehran")
+        self.assertEqual(scans, 1)
+        self.assertEqual(tags[0].victim_count, 2)
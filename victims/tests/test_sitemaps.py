@@ -0,0 +1,91 @@
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from victims import sitemaps
+from victims.models import Victim
+
+
+def make_victim(name):
+    return Victim.objects.create(
+        full_name=name,
+        city_of_death="Tehran",
+        province_or_state="Tehran",
+        country="Iran",
+    )
+
+
+@override_settings(SITEMAP_CHUNK_SIZE=2, SITE_URL="https://example.org")
+class SitemapTests(TestCase):
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        settings = override_settings(SITEMAP_DIR=str(self.directory))
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.victims = [make_victim(f"Victim {index}") for index in range(5)]
+
+    def chunk_of(self, victim):
+        return (victim.pk - 1) // 2
+
+    def test_index_lists_one_entry_per_id_range(self):
+        response = self.client.get(reverse("sitemap_index"))
+        self.assertEqual(response["Content-Type"], "application/xml")
+        chunks = {self.chunk_of(victim) for victim in self.victims}
+        body = response.content.decode()
+        self.assertEqual(body.count("<sitemap>"), len(chunks))
+        for chunk in chunks:
+            self.assertIn(f"https://example.org/sitemaps/victims-{chunk}.xml", body)
+
+    def test_chunks_are_written_once_and_rewritten_when_they_change(self):
+        victim = self.victims[0]
+        chunk = self.chunk_of(victim)
+        response = self.client.get(reverse("sitemap_chunk", args=[chunk]))
+        body = b"".join(response.streaming_content).decode()
+        self.assertIn(f"https://example.org/victims/{victim.slug}/", body)
+        self.assertEqual(sitemaps.chunk_path(chunk, "https://example.org")[1], False)
+
+        # Editing a profile in another chunk leaves this one alone.
+        self.victims[-1].save()
+        self.assertEqual(sitemaps.chunk_path(chunk, "https://example.org")[1], False)
+        victim.full_name = "Victim renamed"
+        victim.save()
+        path, written = sitemaps.chunk_path(chunk, "https://example.org")
+        self.assertTrue(written)
+        self.assertIn(victim.slug, path.read_text())
+        self.assertEqual(len(list(self.directory.glob(f"victims-{chunk}-*"))), 1)
+
+    def test_empty_chunks_are_not_found(self):
+        response = self.client.get(reverse("sitemap_chunk", args=[1000]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_chunks_replaced_while_being_opened_are_written_again(self):
+        chunk = self.chunk_of(self.victims[0])
+        chunk_path = sitemaps.chunk_path
+
+        def replaced(*args):
+            path, written = chunk_path(*args)
+            if not calls:
+                path.unlink()
+            calls.append(path)
+            return path, written
+
+        calls = []
+        with mock.patch("victims.sitemaps.chunk_path", replaced):
+            response = self.client.get(reverse("sitemap_chunk", args=[chunk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            self.victims[0].slug, b"".join(response.streaming_content).decode()
+        )
+        self.assertEqual(len(calls), 2)
+
+    @override_settings(SITE_URL="", ALLOWED_HOSTS=["example.org", "example.net"])
+    def test_without_a_site_url_chunks_are_built_per_request(self):
+        url = reverse("sitemap_chunk", args=[self.chunk_of(self.victims[0])])
+        for host in ("example.org", "example.net"):
+            response = self.client.get(url, HTTP_HOST=host)
+            body = b"".join(response.streaming_content).decode()
+            self.assertIn(f"http://{host}/victims/{self.victims[0].slug}/", body)
+        self.assertEqual(list(self.directory.iterdir()), [])
@@ -0,0 +1,171 @@
+import io
+import sqlite3
+import tempfile
+from pathlib import Path
+
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from victims import changes
+from victims.models import Source, Tag, Victim
+from victims.snapshot import (
+    SnapshotArchive,
+    export_full,
+    export_incremental,
+    read_meta,
+)
+from victims.tests.test_changes import held_open
+
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
+
+class SnapshotTests(TestCase):
+    def setUp(self):
+        self.path = Path(tempfile.mkdtemp()) / "archive.sqlite3"
+        self.victim = Victim.objects.create(
+            full_name="Mahsa Amini",
+            city_of_death="Tehran",
+            province_or_state="Tehran",
+            country="Iran",
+            biography="A young woman from Saqqez.",
+            family_contact_private="private phone number",
+            verification_status=Victim.VerificationStatus.VERIFIED,
+        )
+        self.victim.tags.add(Tag.objects.create(name="Student", slug="student"))
+        Source.objects.create(
+            victim=self.victim,
+            title="Report",
+            url="https://example.org/report",
+            publisher_name="Archive",
+        )
+
+    def export(self, *args):
+        call_command(
+            "export_snapshot", "--output", str(self.path), *args, stdout=io.StringIO()
+        )
+
+    def rows(self, sql):
+        db = sqlite3.connect(self.path)
+        try:
+            return db.execute(sql).fetchall()
+        finally:
+            db.close()
+
+    def test_export_contains_public_fields_and_search_index(self):
+        self.export("--gzip")
+        self.assertTrue(Path(f"{self.path}.gz").exists())
+        columns = [row[1] for row in self.rows("PRAGMA table_info(victims)")]
+        self.assertIn("biography", columns)
+        self.assertNotIn("family_contact_private", columns)
+        self.assertEqual(
+            self.rows("SELECT rowid FROM victims_fts WHERE victims_fts MATCH 'saqq*'"),
+            [(self.victim.pk,)],
+        )
+        self.assertEqual(self.rows("SELECT COUNT(*) FROM sources"), [(1,)])
+        self.assertEqual(self.rows("SELECT COUNT(*) FROM victim_tags"), [(1,)])
+
+    def test_incremental_export_applies_updates_and_deletions(self):
+        self.export()
+        other = Victim.objects.create(
+            full_name="Nika Shakarami",
+            city_of_death="Tehran",
+            province_or_state="Tehran",
+            country="Iran",
+        )
+        self.victim.short_summary = "Updated summary"
+        self.victim.save()
+        self.victim.sources.all().delete()
+        self.export("--incremental")
+
+        self.assertEqual(
+            self.rows("SELECT full_name, short_summary FROM victims ORDER BY id"),
+            [("Mahsa Amini", "Updated summary"), ("Nika Shakarami", "")],
+        )
+        self.assertEqual(self.rows("SELECT COUNT(*) FROM sources"), [(0,)])
+
+        other.delete()
+        self.export("--incremental")
+        self.assertEqual(self.rows("SELECT COUNT(*) FROM victims"), [(1,)])
+        self.assertEqual(
+            self.rows(
+                "SELECT COUNT(*) FROM victims_fts WHERE victims_fts MATCH 'nika'"
+            ),
+            [(0,)],
+        )
+        self.assertNotEqual(read_meta(self.path)["last_change_cursor"], "0-0")
+
+    def test_read_only_mode_serves_pages_without_postgres(self):
+        self.export()
+        with override_settings(
+            SNAPSHOT_READ_ONLY=True, SNAPSHOT_PATH=str(self.path), STORAGES=STORAGES
+        ):
+            with self.assertNumQueries(0):
+                detail = self.client.get(
+                    reverse("victim_detail", args=[self.victim.slug])
+                )
+                listing = self.client.get(reverse("victim_list"), {"q": "saqqez"})
+                api = self.client.get(reverse("victim-list"), {"tag": "student"})
+                narrowed = self.client.get(
+                    reverse("victim-list"), {"tag": "student,minor"}
+                )
+                widened = self.client.get(
+                    reverse("victim-list"), {"tag": "student,minor", "tag_mode": "any"}
+                )
+                admin = self.client.get("/admin/")
+        self.assertContains(detail, "Mahsa Amini")
+        self.assertContains(detail, "Report")
+        self.assertNotContains(detail, "private phone number")
+        self.assertContains(listing, "Mahsa Amini")
+        self.assertEqual(api.json()["count"], 1)
+        self.assertEqual(api.json()["results"][0]["tags"][0]["slug"], "student")
+        self.assertEqual(narrowed.json()["count"], 0)
+        self.assertEqual(widened.json()["count"], 1)
+        self.assertEqual(admin.status_code, 503)
+
+    def test_archive_reconnects_after_a_full_export_replaces_the_file(self):
+        self.export()
+        archive = SnapshotArchive(self.path)
+        self.assertEqual(archive.get(self.victim.slug).short_summary, "")
+        self.victim.short_summary = "Updated summary"
+        self.victim.save()
+        self.export()
+        self.assertEqual(archive.get(self.victim.slug).short_summary, "Updated summary")
+
+
+class ConcurrentSnapshotTests(TransactionTestCase):
+    def edit(self, victim, summary):
+        # A bare update and its feed entry: saving would take row locks that
+        # serialize the two transactions.
+        Victim.objects.filter(pk=victim.pk).update(short_summary=summary)
+        changes.record("victim", victim.pk, changes.Action.UPDATED)
+
+    def test_edits_committed_after_an_export_are_picked_up_next_run(self):
+        path = Path(tempfile.mkdtemp()) / "archive.sqlite3"
+        slow, fast = (
+            Victim.objects.create(
+                full_name=name,
+                city_of_death="Tehran",
+                province_or_state="Tehran",
+                country="Iran",
+            )
+            for name in ("Slow", "Fast")
+        )
+        export_full(path)
+        # The slow edit takes the lower sequence number but commits after
+        # an export has already seen the fast one.
+        with held_open(lambda: self.edit(slow, "Late")):
+            self.edit(fast, "Early")
+            export_incremental(path)
+        export_incremental(path)
+        db = sqlite3.connect(path)
+        try:
+            rows = db.execute(
+                "SELECT full_name, short_summary FROM victims ORDER BY id"
+            ).fetchall()
+        finally:
+            db.close()
+        self.assertEqual(rows, [("Slow", "Late"), ("Fast", "Early")])
@@ -0,0 +1,94 @@
+import datetime
+
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from victims import jobs, rollups
+from victims.models import Job, Victim
+
+
+class StatsRollupTests(APITestCase):
+    def setUp(self):
+        rows = [
+            ("Tehran", "Tehran", datetime.date(2022, 9, 21), "verified"),
+            ("Tehran", "Tehran", datetime.date(2022, 9, 22), "pending"),
+            (
+                "Zahedan",
+                "Sistan and Baluchestan",
+                datetime.date(2022, 9, 30),
+                "verified",
+            ),
+            (
+                "Zahedan",
+                "Sistan and Baluchestan",
+                datetime.date(2022, 10, 2),
+                "verified",
+            ),
+            ("Mahabad", "West Azerbaijan", None, "unverified"),
+        ]
+        for index, (city, province, died, status) in enumerate(rows):
+            Victim.objects.create(
+                full_name=f"Victim {index}",
+                city_of_death=city,
+                province_or_state=province,
+                country="Iran",
+                date_of_death=died,
+                verification_status=status,
+            )
+        rollups.refresh()
+
+    def test_timeline_rolls_days_up_to_months(self):
+        response = self.client.get(reverse("stats_timeline"), {"interval": "month"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [
+                (row["period"], row["total"], row["verified"])
+                for row in response.data["results"]
+            ],
+            [(datetime.date(2022, 9, 1), 3, 2), (datetime.date(2022, 10, 1), 1, 1)],
+        )
+        response = self.client.get(
+            reverse("stats_timeline"),
+            {"interval": "day", "from": "2022-09-22", "to": "2022-09-30"},
+        )
+        self.assertEqual(len(response.data["results"]), 2)
+        bad = self.client.get(reverse("stats_timeline"), {"interval": "year"})
+        self.assertEqual(bad.status_code, 400)
+
+    def test_geo_counts_by_level_and_status(self):
+        response = self.client.get(reverse("stats_geo"), {"level": "province"})
+        by_province = {
+            row["province_or_state"]: (row["total"], row["unverified"])
+            for row in response.data["results"]
+        }
+        self.assertEqual(
+            by_province,
+            {
+                "Sistan and Baluchestan": (2, 0),
+                "Tehran": (2, 0),
+                "West Azerbaijan": (1, 1),
+            },
+        )
+        response = self.client.get(reverse("stats_geo"), {"level": "country"})
+        self.assertEqual(response.data["results"][0]["total"], 5)
+
+    def test_responses_are_cacheable_and_revalidate(self):
+        response = self.client.get(reverse("stats_geo"))
+        self.assertIn("max-age=", response["Cache-Control"])
+        self.assertIn("public", response["Cache-Control"])
+        again = self.client.get(
+            reverse("stats_geo"), HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+        self.assertEqual(again.status_code, 304)
+
+    def test_edits_queue_one_delayed_refresh(self):
+        Job.objects.all().delete()
+        victim = Victim.objects.first()
+        victim.verification_status = "verified"
+        victim.save()
+        Victim.objects.last().delete()
+        self.assertEqual(Job.objects.filter(name="stats.refresh").count(), 1)
+        Job.objects.update(run_at=datetime.datetime(2000, 1, 1, tzinfo=datetime.UTC))
+        jobs.run_pending()
+        response = self.client.get(reverse("stats_geo"), {"level": "country"})
+        self.assertEqual(response.data["results"][0]["total"], 4)
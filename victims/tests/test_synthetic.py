@@ -0,0 +1,58 @@
+import tempfile
+
+from django.test import TestCase, override_settings
+
+from victims import jobs, synthetic
+from victims.models import ChangeLogEntry, Photo, RelatedVictim, Revision, Victim
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class SyntheticDataTests(TestCase):
+    def test_generation_is_reproducible_from_seed(self):
+        synthetic.generate(20, seed=3, batch_size=8)
+        first = list(
+            Victim.objects.order_by("slug").values_list(
+                "slug", "native_name", "date_of_death"
+            )
+        )
+        Victim.objects.all().delete()
+        synthetic.generate(20, seed=3, batch_size=8)
+        second = list(
+            Victim.objects.order_by("slug").values_list(
+                "slug", "native_name", "date_of_death"
+            )
+        )
+        self.assertEqual(len(first), 20)
+        self.assertEqual(first, second)
+        self.assertTrue(all(native for _, native, _ in first))
+
+    def test_search_vector_is_populated(self):
+        synthetic.generate(5, seed=1)
+        self.assertFalse(Victim.objects.filter(search_vector__isnull=True).exists())
+
+    def test_generated_rows_are_logged_like_saved_ones(self):
+        synthetic.generate(10, seed=2)
+        for model_name, model in (("victim", Victim), ("photo", Photo)):
+            ids = set(model.objects.values_list("pk", flat=True))
+            self.assertEqual(
+                set(
+                    ChangeLogEntry.objects.filter(model=model_name).values_list(
+                        "object_id", flat=True
+                    )
+                ),
+                ids,
+            )
+            self.assertEqual(
+                set(
+                    Revision.objects.filter(model=model_name).values_list(
+                        "object_id", flat=True
+                    )
+                ),
+                ids,
+            )
+        self.assertEqual(
+            ChangeLogEntry.objects.filter(model="victimtag").count(),
+            Victim.tags.through.objects.count(),
+        )
+        jobs.run_pending()
+        self.assertTrue(RelatedVictim.objects.exists())
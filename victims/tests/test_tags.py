@@ -0,0 +1,73 @@
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from victims.models import Tag, Victim, VictimTag
+from victims.tests.test_snapshot import STORAGES
+
+
+class TagFilterTests(APITestCase):
+    def setUp(self):
+        self.student, self.protester, self.minor = (
+            Tag.objects.create(name=name.title(), slug=name)
+            for name in ("student", "protester", "minor")
+        )
+        self.both = Victim.objects.create(full_name="Both")
+        self.both.tags.add(self.student, self.protester)
+        self.student_only = Victim.objects.create(full_name="Student only")
+        self.student_only.tags.add(self.student, self.minor)
+        self.untagged = Victim.objects.create(full_name="Untagged")
+
+    def names(self, **params):
+        response = self.client.get(reverse("victim-list"), params)
+        self.assertEqual(response.status_code, 200)
+        return sorted(row["full_name"] for row in response.json()["results"])
+
+    def test_tag_slugs_follow_tag_changes(self):
+        self.both.refresh_from_db()
+        self.assertEqual(self.both.tag_slugs, ["protester", "student"])
+        self.both.tags.remove(self.protester)
+        self.both.refresh_from_db()
+        self.assertEqual(self.both.tag_slugs, ["student"])
+
+        self.student.slug = "pupil"
+        self.student.save()
+        self.minor.delete()
+        self.student_only.refresh_from_db()
+        self.assertEqual(self.student_only.tag_slugs, ["pupil"])
+
+        VictimTag.objects.create(victim=self.untagged, tag=self.protester)
+        self.untagged.refresh_from_db()
+        self.assertEqual(self.untagged.tag_slugs, ["protester"])
+
+    def test_all_any_and_exclude_modes(self):
+        self.assertEqual(self.names(tag="student,protester"), ["Both"])
+        self.assertEqual(
+            self.names(tag="protester,minor", tag_mode="any"),
+            ["Both", "Student only"],
+        )
+        self.assertEqual(
+            self.names(exclude_tag="protester"), ["Student only", "Untagged"]
+        )
+        self.assertEqual(self.names(tag="student", exclude_tag="minor"), ["Both"])
+
+    def test_counts_reflect_the_filtered_set(self):
+        response = self.client.get(reverse("tag-counts"), {"exclude_tag": "minor"})
+        self.assertEqual(
+            {row["slug"]: row["count"] for row in response.json()},
+            {"minor": 0, "protester": 1, "student": 1},
+        )
+        response = self.client.get(reverse("tag-counts"), {"tag_mode": "some"})
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(STORAGES=STORAGES)
+    def test_list_page_accepts_repeated_tags(self):
+        response = self.client.get(
+            reverse("victim_list"), {"tag": ["student", "minor"]}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [victim.full_name for victim in response.context["page_obj"]],
+            ["Student only"],
+        )
+        self.assertEqual(response.context["selected_tags"], ["student", "minor"])
@@ -0,0 +1,136 @@
+import io
+import struct
+import tempfile
+import zlib
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.test import override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework.test import APITestCase
+
+from victims.models import Photo, UploadSession, Victim
+from victims.uploads import ChunkError, append_chunk, attach_uploads
+
+
+def jpeg_bytes(size=(120, 80)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, (90, 30, 30)).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+def png_header(width, height):
+    # The start of a PNG whose IHDR claims the given dimensions; the pixel
+    # data never needs to arrive for it to be rejected.
+    def chunk(kind, payload):
+        body = kind + payload
+        return (
+            struct.pack(">I", len(payload)) + body + struct.pack(">I", zlib.crc32(body))
+        )
+
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    idat = zlib.compress(b"\0" * 1000)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", ihdr) + chunk(b"IDAT", idat)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), UPLOAD_TEMP_DIR=tempfile.mkdtemp())
+class ChunkedUploadTests(APITestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("volunteer", password="x")
+        self.user.user_permissions.add(Permission.objects.get(codename="add_photo"))
+        self.client.force_authenticate(self.user)
+        self.victim = Victim.objects.create(
+            full_name="Neda A.",
+            city_of_death="Tehran",
+            province_or_state="Tehran",
+            country="Iran",
+        )
+
+    def start(self, data, filename="photo.jpg"):
+        response = self.client.post(
+            reverse("upload-list"),
+            {"victim": self.victim.pk, "filename": filename, "size": len(data)},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data["id"]
+
+    def put(self, upload_id, data, start, total):
+        return self.client.put(
+            reverse("upload-chunk", args=[upload_id]),
+            data=data,
+            content_type="application/octet-stream",
+            HTTP_CONTENT_RANGE=f"bytes {start}-{start + len(data) - 1}/{total}",
+        )
+
+    def test_chunks_resume_and_complete_in_batch(self):
+        data = jpeg_bytes()
+        ids = []
+        for _ in range(2):
+            upload_id = self.start(data)
+            half = len(data) // 2
+            self.assertEqual(
+                self.put(upload_id, data[:half], 0, len(data)).status_code, 200
+            )
+            # A retried or out-of-order chunk is refused with the offset to resume from.
+            response = self.put(upload_id, data[half + 10 :], half + 10, len(data))
+            self.assertEqual(response.status_code, 409)
+            self.assertEqual(response.data["received"], half)
+            response = self.put(upload_id, data[half:], half, len(data))
+            self.assertEqual(response.data["status"], "complete")
+            ids.append(upload_id)
+
+        response = self.client.post(
+            reverse("upload-complete"), {"ids": ids}, format="json"
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(len(response.data["attached"]), 2)
+        photos = list(self.victim.photos.all())
+        self.assertEqual(len(photos), 2)
+        self.assertEqual(photos[0].image.name, photos[1].image.name)
+        self.assertTrue(photos[0].content_hash)
+
+    def test_stale_sessions_are_reloaded_under_the_row_lock(self):
+        # Each request works on the row as it is once locked, not as it was
+        # read: a chunk or completion that raced another one is refused.
+        data = jpeg_bytes()
+        upload_id = self.start(data)
+        stale = UploadSession.objects.get(pk=upload_id)
+        self.assertEqual(self.put(upload_id, data, 0, len(data)).status_code, 200)
+        with self.assertRaises(ChunkError) as raised:
+            append_chunk(
+                stale, io.BytesIO(data), f"bytes 0-{len(data) - 1}/{len(data)}"
+            )
+        self.assertEqual(raised.exception.status, 409)
+        self.assertEqual(stale.status, UploadSession.Status.COMPLETE)
+
+        first = list(UploadSession.objects.filter(pk=upload_id))
+        second = list(UploadSession.objects.filter(pk=upload_id))
+        self.assertEqual(attach_uploads(first), {})
+        self.assertEqual(attach_uploads(second), {second[0].pk: "Upload is attached."})
+        self.assertEqual(second[0].photo_id, first[0].photo_id)
+        self.assertEqual(Photo.objects.count(), 1)
+
+    def test_oversized_dimensions_are_rejected_from_the_header(self):
+        header = png_header(8000, 8000)
+        total = len(header) + 1_000_000
+        upload_id = self.start(b"x" * total, filename="bomb.png")
+        response = self.put(upload_id, header, 0, total)
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(
+            UploadSession.objects.get(pk=upload_id).status,
+            UploadSession.Status.REJECTED,
+        )
+        self.assertFalse(Photo.objects.exists())
+
+    def test_uploads_require_photo_permission(self):
+        self.client.force_authenticate(
+            get_user_model().objects.create_user("visitor", password="x")
+        )
+        response = self.client.post(
+            reverse("upload-list"),
+            {"victim": self.victim.pk, "filename": "a.jpg", "size": 10},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 403)
@@ -0,0 +1,188 @@
+import os
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image, UnidentifiedImageError
+
+from . import changes, revisions
+from .models import Photo, UploadSession, bump_cache_versions, lock_photo_file
+from .storage import check_image_header, content_address, sha256
+from .tasks import queue_photo_processing
+
+READ_BLOCK = 64 * 1024
+# Enough for PIL to read the dimensions of any JPEG/PNG/WebP we accept; if
+# the header is still unreadable after this many bytes the file is rejected.
+HEADER_BYTES = 256 * 1024
+CONTENT_RANGE = re.compile(r"^bytes (\d+)-(\d+)/(\d+)$")
+
+
+class ChunkError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def part_path(session):
+    return Path(settings.UPLOAD_TEMP_DIR) / f"{session.pk}.part"
+
+
+def parse_content_range(header, session):
+    match = CONTENT_RANGE.match(header or "")
+    if not match:
+        raise ChunkError("Content-Range must look like 'bytes start-end/total'.")
+    start, end, total = (int(value) for value in match.groups())
+    if total != session.size or end < start or end >= total:
+        raise ChunkError("Content-Range does not match the upload size.")
+    if start != session.received:
+        # The client lost track of the offset; it should resume from ours.
+        raise ChunkError("Chunk does not start at the current offset.", status=409)
+    return start, end
+
+
+def _reject(session, message):
+    part_path(session).unlink(missing_ok=True)
+    session.status = UploadSession.Status.REJECTED
+    session.error = message[:255]
+    session.save(update_fields=["status", "error", "updated_at"])
+
+
+def append_chunk(session, stream, content_range):
+    # The session row stays locked while the chunk is written, so concurrent
+    # PUTs for one upload run one after the other and each checks its range
+    # against the offset the previous one stored. What a failed chunk saved
+    # is still committed.
+    error = None
+    with transaction.atomic():
+        session.refresh_from_db(from_queryset=UploadSession.objects.select_for_update())
+        try:
+            _write_chunk(session, stream, content_range)
+        except ChunkError as exc:
+            error = exc
+    if error is not None:
+        raise error
+    return session
+
+
+def _write_chunk(session, stream, content_range):
+    if session.status != UploadSession.Status.UPLOADING:
+        raise ChunkError(f"Upload is {session.status}.", status=409)
+    start, end = parse_content_range(content_range, session)
+    expected = end - start + 1
+    path = part_path(session)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    written = 0
+    with open(path, "r+b" if path.exists() else "wb") as part:
+        part.seek(start)
+        part.truncate()
+        while written < expected:
+            block = stream.read(min(READ_BLOCK, expected - written))
+            if not block:
+                break
+            part.write(block)
+            written += len(block)
+    if written != expected:
+        # Keep what arrived before the connection dropped; the client resumes
+        # from the offset reported back.
+        session.received = start + written
+        session.save(update_fields=["received", "updated_at"])
+        raise ChunkError("Chunk body is shorter than its Content-Range.")
+    session.received = end + 1
+
+    try:
+        if check_image_header(path) is None and (
+            session.received >= min(HEADER_BYTES, session.size)
+        ):
+            raise ValidationError("File is not a readable image.")
+    except ValidationError as exc:
+        _reject(session, exc.messages[0])
+        raise ChunkError(exc.messages[0], status=422)
+
+    if session.received == session.size:
+        session.status = UploadSession.Status.COMPLETE
+    session.save(update_fields=["received", "status", "updated_at"])
+
+
+def _load_complete(session):
+    path = part_path(session)
+    with Image.open(path) as image:
+        image.verify()
+    data = path.read_bytes()
+    return data, sha256(data)
+
+
+def attach_uploads(sessions):
+    # Stores every complete session's file and creates the Photo rows with a
+    # single bulk insert; resizing and near-duplicate checks are queued as
+    # jobs. Returns {session id: error}.
+    storage = Photo._meta.get_field("image").storage
+    errors, ready = {}, []
+    with transaction.atomic():
+        # Locked and re-read so that a session completed by two requests at
+        # once is attached by the first and reported as attached to the other.
+        current = (
+            UploadSession.objects.select_for_update()
+            .order_by("pk")
+            .in_bulk([session.pk for session in sessions])
+        )
+        for session in sessions:
+            if session.pk not in current:
+                errors[session.pk] = "Not found."
+                continue
+            session.status = current[session.pk].status
+            session.photo_id = current[session.pk].photo_id
+            if session.status != UploadSession.Status.COMPLETE:
+                errors[session.pk] = f"Upload is {session.status}."
+                continue
+            try:
+                data, digest = _load_complete(session)
+            except (OSError, SyntaxError, UnidentifiedImageError, ValueError) as exc:
+                _reject(session, f"Image could not be decoded: {exc}")
+                errors[session.pk] = session.error
+                continue
+            extension = os.path.splitext(session.filename)[1].lower()
+            name = content_address(digest, extension)
+            lock_photo_file(name)
+            name = storage.save(name, ContentFile(data))
+            photo = Photo(
+                victim_id=session.victim_id,
+                image=name,
+                caption=session.caption,
+                photographer_credit=session.photographer_credit,
+                order_index=session.order_index,
+                content_hash=digest,
+            )
+            ready.append((session, photo))
+        if not ready:
+            return errors
+
+        photos = Photo.objects.bulk_create([photo for _, photo in ready])
+        queue_photo_processing([photo.pk for photo in photos])
+        bump_cache_versions({photo.victim_id for photo in photos})
+        revisions.record([], created=photos)
+        for session, photo in ready:
+            session.photo = photo
+            session.status = UploadSession.Status.ATTACHED
+        UploadSession.objects.bulk_update(
+            [session for session, _ in ready], ["photo", "status"]
+        )
+        changes.record_many(
+            "photo", [photo.pk for photo in photos], changes.Action.CREATED
+        )
+    for session, _ in ready:
+        part_path(session).unlink(missing_ok=True)
+    return errors
+
+
+def purge_stale(cutoff):
+    stale = UploadSession.objects.filter(updated_at__lt=cutoff)
+    count = 0
+    for session in stale.iterator():
+        part_path(session).unlink(missing_ok=True)
+        count += 1
+    stale.delete()
+    return count
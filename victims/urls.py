@@ -13,5 +13,21 @@ urlpatterns = [
         name="submit_correction_for_victim",
     ),
     path("disclaimer/", views.disclaimer, name="disclaimer"),
+    path("sitemap.xml", views.sitemap_index, name="sitemap_index"),
+    path("sitemaps/victims-<int:chunk>.xml", views.sitemap_chunk, name="sitemap_chunk"),
+    path("metrics", views.metrics, name="metrics"),
+    path("profiles/", views.profiles, name="profiles"),
+    path(
+        "profiles/<slug:capture_id>.folded",
+        views.profile_download,
+        {"suffix": ".folded"},
+        name="profile_download",
+    ),
+    path(
+        "profiles/<slug:capture_id>.json",
+        views.profile_download,
+        {"suffix": ".json"},
+        name="profile_timeline",
+    ),
     path("api/", include("victims.api_urls")),
 ]
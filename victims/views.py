@@ -1,16 +1,49 @@
+from django.conf import settings
 from django.contrib import messages
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.core.cache import caches
+from django.core.cache.utils import make_template_fragment_key
+from django.core.exceptions import PermissionDenied
 from django.core.paginator import Paginator
 from django.db import connection
-from django.db.models import F, Q
-from django.http import JsonResponse
+from django.db.models import F, Q, prefetch_related_objects
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    JsonResponse,
+    StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.cache import patch_cache_control
 from django.views.decorators.cache import cache_page
 from django.views.decorators.http import require_GET
 from django_ratelimit.decorators import ratelimit
-from django.contrib.postgres.search import SearchQuery, SearchRank
 
+from . import metrics as metrics_registry
+from . import profiling, search, sitemaps
+from .filters import filter_tags, tag_counts
 from .forms import SubmissionForm, VictimFilterForm
-from .models import Tag, Victim
+from .models import RelatedVictim, Tag, Victim
+
+# victim_detail's cached sections and the relation each one renders.
+PROFILE_SECTIONS = {
+    "victim_gallery": "photos",
+    "victim_sources": "sources",
+    "victim_tags": "tags",
+}
+
+
+def _uncached(victims, fragments):
+    # (victim, fragment) pairs, with fragments named as in the templates'
+    # {% cache %} tags, that are not cached for the victim's current version.
+    keys = {}
+    for victim in victims:
+        for name in fragments:
+            vary_on = [victim.pk, victim.cache_version]
+            keys[make_template_fragment_key(name, vary_on)] = (victim, name)
+    cached = caches["fragments"].get_many(keys)
+    return [pair for key, pair in keys.items() if key not in cached]
 
 
 @require_GET
@@ -29,14 +62,16 @@ def home(request):
 @cache_page(60)
 def victim_list(request):
     form = VictimFilterForm(request.GET)
-    victims = Victim.objects.all().prefetch_related("tags", "photos")
+    victims = Victim.objects.all()
+    q = None
     if form.is_valid():
         q = form.cleaned_data.get("q")
         city = form.cleaned_data.get("city")
         verification_status = form.cleaned_data.get("verification_status")
         age_min = form.cleaned_data.get("age_min")
         age_max = form.cleaned_data.get("age_max")
-        tag = form.cleaned_data.get("tag")
+        tags = form.cleaned_data.get("tag")
+        exclude_tags = form.cleaned_data.get("exclude_tag")
         sort = form.cleaned_data.get("sort")
 
         if q:
@@ -60,8 +95,9 @@ def victim_list(request):
             victims = victims.filter(age__gte=age_min)
         if age_max is not None:
             victims = victims.filter(age__lte=age_max)
-        if tag:
-            victims = victims.filter(tags__slug=tag)
+        victims = filter_tags(
+            victims, tags, form.cleaned_data.get("tag_mode") or "all", exclude_tags
+        )
 
         if sort == "alpha":
             victims = victims.order_by("full_name")
@@ -69,28 +105,109 @@ def victim_list(request):
             victims = victims.order_by("age")
         elif sort == "date":
             victims = victims.order_by("-date_of_death")
-        else:
+        elif sort or not q:
             victims = victims.order_by("-created_at")
 
-    paginator = Paginator(victims, 12)
     page = request.GET.get("page")
-    page_obj = paginator.get_page(page)
-    tags = Tag.objects.all()
+    if q:
+        # Searches are ranked once and their ids cached, so other pages and
+        # repeat searches are primary-key lookups.
+        (ids, total), counts = search.cached_results(
+            form.cleaned_data,
+            lambda: (search.ranked_ids(victims), tag_counts(victims)),
+        )
+        if ids is None:
+            # Too many to keep: rank just the page in the database, with the
+            # id as a tie-breaker so pages do not overlap.
+            paginator = Paginator(victims.order_by(*victims.query.order_by, "-pk"), 12)
+            paginator.count = total
+            page_obj = paginator.get_page(page)
+            page_obj.object_list = list(page_obj.object_list)
+        else:
+            page_obj = Paginator(ids, 12).get_page(page)
+            found = Victim.objects.order_by().in_bulk(page_obj.object_list)
+            page_obj.object_list = [
+                found[pk] for pk in page_obj.object_list if pk in found
+            ]
+    else:
+        page_obj = Paginator(victims, 12).get_page(page)
+        page_obj.object_list = list(page_obj.object_list)
+        # Counts for the tag picker, within the current filters.
+        counts = search.cached_tag_counts(
+            form.cleaned_data if form.is_valid() else {}, lambda: tag_counts(victims)
+        )
+    # Relations are only loaded for cards that have to be rendered.
+    missing = _uncached(page_obj, ["victim_card"])
+    prefetch_related_objects([victim for victim, _ in missing], "tags", "photos")
+    tags = list(Tag.objects.all())
+    for tag in tags:
+        tag.victim_count = counts.get(tag.slug, 0)
+    filters = form.cleaned_data if form.is_valid() else {}
 
     context = {
         "form": form,
         "page_obj": page_obj,
         "tags": tags,
+        "selected_tags": filters.get("tag", []),
+        "excluded_tags": filters.get("exclude_tag", []),
+        "fragment_ttl": settings.FRAGMENT_CACHE_SECONDS,
     }
     return render(request, "victims/victim_list.html", context)
 
 
 @require_GET
 def victim_detail(request, slug):
-    victim = get_object_or_404(
-        Victim.objects.prefetch_related("photos", "sources", "tags"), slug=slug
+    victim = get_object_or_404(Victim, slug=slug)
+    prefetch_related_objects(
+        [victim],
+        *(PROFILE_SECTIONS[name] for _, name in _uncached([victim], PROFILE_SECTIONS)),
+    )
+    # Precomputed by the "victims.related" job; one scan of (victim, rank).
+    related = (
+        RelatedVictim.objects.filter(victim=victim)
+        .select_related("related")
+        .only(
+            "related__slug",
+            "related__full_name",
+            "related__city_of_death",
+            "related__date_of_death",
+        )
+    )
+    context = {
+        "victim": victim,
+        "related": related,
+        "fragment_ttl": settings.FRAGMENT_CACHE_SECONDS,
+    }
+    return render(request, "victims/victim_detail.html", context)
+
+
+@require_GET
+def sitemap_index(request):
+    response = HttpResponse(
+        sitemaps.index(sitemaps.site_url(request)), content_type="application/xml"
     )
-    return render(request, "victims/victim_detail.html", {"victim": victim})
+    patch_cache_control(response, public=True, max_age=settings.SITEMAP_CACHE_SECONDS)
+    return response
+
+
+@require_GET
+def sitemap_chunk(request, chunk):
+    base_url = sitemaps.site_url(request)
+    if settings.SITE_URL:
+        handle = sitemaps.open_chunk(chunk, base_url)
+        if handle is None:
+            raise Http404
+        response = FileResponse(handle, content_type="application/xml")
+    else:
+        # Files are only kept for the canonical origin; otherwise every Host
+        # would get, and keep replacing, its own copy of each chunk.
+        if not sitemaps.chunk_state(chunk)[0]:
+            raise Http404
+        response = StreamingHttpResponse(
+            sitemaps.document(chunk, base_url), content_type="application/xml"
+        )
+    patch_cache_control(response, public=True, max_age=settings.SITEMAP_CACHE_SECONDS)
+    return response
 
 
 @require_GET
@@ -130,3 +247,41 @@ def name_suggest(request):
         .values_list("full_name", flat=True)[:8]
     )
     return JsonResponse({"results": list(results)})
+
+
+@require_GET
+def metrics(request):
+    remote_addr = request.META.get("REMOTE_ADDR")
+    if not request.user.is_staff and remote_addr not in settings.METRICS_ALLOWED_IPS:
+        raise PermissionDenied
+    return HttpResponse(
+        metrics_registry.render_latest(),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+@require_GET
+def profiles(request):
+    # The slowest recent profiler captures of each view, or of ?view= only.
+    if not request.user.is_staff:
+        raise PermissionDenied
+    view_name = request.GET.get("view")
+    slowest = profiling.slowest_by_view(50 if view_name else 10)
+    if view_name:
+        slowest = {view_name: slowest.get(view_name, [])}
+    return render(
+        request,
+        "victims/profiles.html",
+        {"slowest": slowest, "view_name": view_name},
+    )
+
+
+@require_GET
+def profile_download(request, capture_id, suffix):
+    # The folded stacks, or the capture with its SQL and template timelines.
+    if not request.user.is_staff:
+        raise PermissionDenied
+    path = profiling.capture_path(capture_id, suffix)
+    if path is None:
+        raise Http404
+    return FileResponse(path.open("rb"), as_attachment=True, filename=path.name)